@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+محافظ فراخوانی‌های blocking روی event loop
+- فراخوانی requests و time.sleep از داخل coroutine را شناسایی و لاگ می‌کند
+- در حالت strict (اشکال‌زدایی) همان فراخوانی را با خطا متوقف می‌کند
+- مانیتور تاخیر loop برای شناسایی هر نوع blocking دیگر
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+import traceback
+
+# تنظیم لاگر
+logger = logging.getLogger(__name__)
+
+
+class BlockingCallError(RuntimeError):
+    """فراخوانی blocking روی event loop در حالت strict"""
+
+
+_installed = False
+_strict = False
+_original_sleep = time.sleep
+
+
+def _running_loop_in_this_thread():
+    """آیا این thread در حال اجرای event loop است؟"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    return loop
+
+
+def _report(name: str):
+    """گزارش (یا توقف) فراخوانی blocking"""
+    stack = "".join(traceback.format_stack(limit=8)[:-2])
+    if _strict:
+        raise BlockingCallError(f"فراخوانی blocking '{name}' روی event loop مجاز نیست")
+    logger.warning(f"🐢 فراخوانی blocking '{name}' روی event loop شناسایی شد:\n{stack}")
+
+
+def _guard(func, name: str):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _running_loop_in_this_thread() is not None:
+            _report(name)
+        return func(*args, **kwargs)
+    wrapper.__blocking_guard__ = True
+    return wrapper
+
+
+def install_blocking_guard(strict: bool = False):
+    """نصب محافظ روی requests و time.sleep"""
+    global _installed, _strict
+    _strict = strict
+    if _installed:
+        return
+    time.sleep = _guard(_original_sleep, "time.sleep")
+    try:
+        import requests
+        requests.Session.request = _guard(requests.Session.request, "requests")
+    except ImportError:
+        pass
+    _installed = True
+    logger.info(f"🛡️ محافظ فراخوانی‌های blocking فعال شد (strict={strict})")
+
+
+async def monitor_loop_lag(interval: float = 0.5, threshold: float = 0.25):
+    """
+    مانیتور تاخیر event loop
+    اگر بیدار شدن این task بیش از threshold ثانیه دیرتر از زمان مقرر باشد،
+    یعنی چیزی loop را بلوکه کرده است
+    """
+    loop = asyncio.get_running_loop()
+    main_thread = threading.current_thread().name
+    logger.info(f"⏱️ مانیتور تاخیر event loop فعال شد (threshold={threshold}s)")
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = loop.time() - expected
+        if lag > threshold:
+            logger.warning(f"🐢 event loop ({main_thread}) به مدت {lag:.2f} ثانیه بلوکه شد")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+کش خواندن فایل‌های JSON که بیشتر خوانده می‌شوند تا نوشته شوند (مثلاً mechanic_state.json)
+- هر خواندن فقط یک stat است؛ فایل فقط وقتی دوباره parse می‌شود که inode، mtime یا اندازه آن تغییر کند
+  (نوشتن درجا یا جایگزینی اتمی فایل توسط پروسه دیگر)
+- مقدار برگردانده شده بین فراخوانی‌ها مشترک است و نباید درجا تغییر داده شود
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+
+# تنظیم لاگر
+logger = logging.getLogger(__name__)
+
+# امضای فایل: (inode، mtime به نانوثانیه، اندازه)
+Signature = Tuple[int, int, int]
+
+
+def file_signature(path: str) -> Optional[Signature]:
+    """امضای فعلی فایل (None اگر فایل وجود نداشته باشد)"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class JsonFileCache:
+    """کش محتوای parse شده فایل‌های JSON با اعتبارسنجی بر اساس stat"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Signature, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def read(self, path: str, default: Any = None) -> Any:
+        """
+        محتوای فایل (از کش اگر فایل تغییر نکرده باشد)
+        فایل ناموجود default برمی‌گرداند؛ خطای parse به فراخواننده می‌رسد و کش نمی‌شود
+        """
+        path = os.path.abspath(path)
+        signature = file_signature(path)
+        if signature is None:
+            self._entries.pop(path, None)
+            return default
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == signature:
+            self.hits += 1
+            return entry[1]
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self._entries[path] = (signature, data)
+        self.misses += 1
+        logger.debug(f"📄 فایل {path} دوباره خوانده شد")
+        return data
+
+    def invalidate(self, path: str = None):
+        """حذف یک فایل (یا همه فایل‌ها) از کش"""
+        if path is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(os.path.abspath(path), None)
+
+    def stats(self) -> Dict:
+        return {'files': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+# نمونه سراسری
+_json_file_cache = JsonFileCache()
+
+
+def get_json_file_cache() -> JsonFileCache:
+    """دریافت نمونه سراسری کش فایل‌های JSON"""
+    return _json_file_cache
+
+
+def read_json_file(path: str, default: Any = None) -> Any:
+    """خواندن فایل JSON از طریق کش سراسری"""
+    return _json_file_cache.read(path, default)
@@ -8,71 +8,46 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..')))
 import logging
-import aiohttp
 from aiogram import types
 from aiogram.types import Message
 import tempfile
-import json
 from app.state_manager import get_receipt_state, set_receipt_state, clear_receipt_state
+from app.panel_client import get_panel_client
+from app.user_context import UserContext
 
 # تنظیم لاگر
 logger = logging.getLogger(__name__)
 
-# فایل state برای نگهداری وضعیت انتظار رسید
-RECEIPT_STATE_FILE = os.path.join(os.path.dirname(__file__), '../receipt_state.json')
-
-# بررسی مسیر فایل و ایجاد آن در صورت نیاز
-if not os.path.exists(RECEIPT_STATE_FILE):
-    try:
-        # ایجاد فایل خالی
-        with open(RECEIPT_STATE_FILE, 'w', encoding='utf-8') as f:
-            json.dump({}, f, ensure_ascii=False, indent=2)
-        logger.info(f"[RECEIPT_HANDLER] Created new receipt state file: {RECEIPT_STATE_FILE}")
-    except Exception as e:
-        logger.error(f"[RECEIPT_HANDLER] Error creating receipt state file: {e}")
-
-# اضافه کردن لاگ برای بررسی مسیر فایل
-logger.info(f"[RECEIPT_HANDLER] RECEIPT_STATE_FILE path: {RECEIPT_STATE_FILE}")
-logger.info(f"[RECEIPT_HANDLER] File exists: {os.path.exists(RECEIPT_STATE_FILE)}")
-
-# اضافه کردن لاگ بیشتر برای بررسی محتوای فایل
-if os.path.exists(RECEIPT_STATE_FILE):
-    try:
-        with open(RECEIPT_STATE_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            logger.info(f"[RECEIPT_HANDLER] File content: {data}")
-    except Exception as e:
-        logger.error(f"[RECEIPT_HANDLER] Error reading file: {e}")
-
 def set_receipt_waiting_state(user_id: int, order_id: int):
     """تنظیم وضعیت انتظار رسید برای کاربر"""
     set_receipt_state(user_id, order_id)
+    if _global_polling_system is not None:
+        # بررسی سفارش بدون انتظار برای پیمایش کامل بعدی
+        _global_polling_system.schedule_order(order_id, user_id)
     logger.info(f"📝 وضعیت انتظار رسید برای کاربر {user_id} و سفارش {order_id} تنظیم شد (state_manager) ")
-    logger.info(f"📝 Current states: {get_receipt_state(user_id)}")
 
 def get_receipt_waiting_state(user_id: int):
-    """دریافت وضعیت انتظار رسید کاربر"""
+    """دریافت وضعیت انتظار رسید کاربر (از حافظه، بدون خواندن فایل)"""
     return get_receipt_state(user_id)
 
 def clear_receipt_waiting_state(user_id: int):
     """پاک کردن وضعیت انتظار رسید کاربر"""
     clear_receipt_state(user_id)
     logger.info(f"🗑️ وضعیت انتظار رسید برای کاربر {user_id} پاک شد (state_manager)")
-    logger.info(f"🗑️ Current states: {get_receipt_state(user_id)}")
 
-async def receipt_photo_handler(message: Message):
+async def receipt_photo_handler(message: Message, user_ctx: UserContext = None):
     """هندلر دریافت عکس رسید پرداخت"""
     user_id = message.from_user.id
+    user_ctx = user_ctx or UserContext(user_id)
     
     try:
         # اضافه کردن لاگ برای تست
         logger.info(f"[RECEIPT_HANDLER] PHOTO HANDLER CALLED: user_id={user_id}")
         
         # بررسی اینکه آیا کاربر در انتظار ارسال رسید است
-        receipt_state = get_receipt_waiting_state(user_id)
+        receipt_state = user_ctx.receipt_state
         
         logger.info(f"[RECEIPT_HANDLER] BEFORE: user_id={user_id}, state={receipt_state}")
-        logger.info(f"[RECEIPT_HANDLER] Current states: {get_receipt_state(user_id)}")
         logger.info(f"[RECEIPT_HANDLER] TEST LOG - این لاگ باید نمایش داده شود")
         
         # بررسی وضعیت - اگر state == 'await_receipt' یا waiting_for_receipt == True
@@ -124,7 +99,7 @@ async def receipt_photo_handler(message: Message):
                 clear_receipt_waiting_state(user_id)
                 
                 # ادامه polling برای این سفارش
-                await resume_order_polling_after_receipt(order_id)
+                await resume_order_polling_after_receipt(order_id, user_id)
                 
                 logger.info(f"🔄 Polling برای سفارش {order_id} ادامه یافت")
                 logger.info(f"[RECEIPT_HANDLER] رسید با موفقیت آپلود شد")
@@ -142,13 +117,13 @@ async def receipt_photo_handler(message: Message):
         if message:
             await message.answer("❌ خطا در پردازش رسید. لطفاً مجدداً تلاش کنید.")
 
-async def receipt_text_handler(message: Message):
+async def receipt_text_handler(message: Message, user_ctx: UserContext = None):
     """هندلر پیام‌های متنی در حالت انتظار رسید"""
-    user_id = message.from_user.id
+    user_ctx = user_ctx or UserContext.for_event(message)
     
     try:
         # بررسی اینکه آیا کاربر در انتظار ارسال رسید است
-        receipt_state = get_receipt_waiting_state(user_id)
+        receipt_state = user_ctx.receipt_state
         
         if receipt_state and (receipt_state.get('waiting_for_receipt') or receipt_state.get('state') == 'await_receipt'):
             await message.answer("❌ لطفاً فقط عکس رسید پرداخت را ارسال کنید. پیام‌های متنی در این مرحله پذیرفته نمی‌شود.")
@@ -157,13 +132,13 @@ async def receipt_text_handler(message: Message):
     except Exception as e:
         logger.error(f"❌ خطا در پردازش پیام متنی: {e}")
 
-async def receipt_document_handler(message: Message):
+async def receipt_document_handler(message: Message, user_ctx: UserContext = None):
     """هندلر فایل‌های مستند در حالت انتظار رسید"""
-    user_id = message.from_user.id
+    user_ctx = user_ctx or UserContext.for_event(message)
     
     try:
         # بررسی اینکه آیا کاربر در انتظار ارسال رسید است
-        receipt_state = get_receipt_waiting_state(user_id)
+        receipt_state = user_ctx.receipt_state
         
         if receipt_state and (receipt_state.get('waiting_for_receipt') or receipt_state.get('state') == 'await_receipt'):
             await message.answer("❌ لطفاً فقط عکس رسید پرداخت را ارسال کنید. فایل‌های مستند در این مرحله پذیرفته نمی‌شود.")
@@ -180,8 +155,6 @@ async def upload_receipt_to_panel(order_id: int, file_path: str):
             logger.error("❌ PANEL_API_BASE_URL تنظیم نشده است")
             return False
         
-        url = f"{PANEL_API_BASE_URL}/telegram-bot/api/orders/{order_id}/upload_receipt"
-        
         # بررسی وجود فایل
         if not os.path.exists(file_path):
             logger.error(f"❌ فایل رسید یافت نشد: {file_path}")
@@ -192,29 +165,19 @@ async def upload_receipt_to_panel(order_id: int, file_path: str):
             file_data = f.read()
         
         # آپلود فایل به پنل
-        async with aiohttp.ClientSession() as session:
-            # تنظیم form data برای آپلود فایل
-            form_data = aiohttp.FormData()
-            form_data.add_field('receipt_image', file_data, 
-                              filename=os.path.basename(file_path), 
-                              content_type='image/jpeg')
-            
-            async with session.post(
-                url,
-                data=form_data,
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    if result.get('success'):
-                        logger.info(f"✅ رسید سفارش {order_id} با موفقیت آپلود شد")
-                        return True
-                    else:
-                        logger.error(f"❌ خطا در آپلود رسید: {result.get('message', 'نامشخص')}")
-                        return False
-                else:
-                    logger.error(f"❌ خطا در آپلود رسید: HTTP {response.status}")
-                    return False
+        status_code, result = await get_panel_client().upload_receipt(
+            order_id, file_data, os.path.basename(file_path)
+        )
+        if status_code == 200 and result is not None:
+            if result.get('success'):
+                logger.info(f"✅ رسید سفارش {order_id} با موفقیت آپلود شد")
+                return True
+            else:
+                logger.error(f"❌ خطا در آپلود رسید: {result.get('message', 'نامشخص')}")
+                return False
+        else:
+            logger.error(f"❌ خطا در آپلود رسید: HTTP {status_code}")
+            return False
                     
     except Exception as e:
         logger.error(f"❌ خطا در آپلود رسید به پنل: {e}")
@@ -234,36 +197,36 @@ def set_global_polling_system(polling_system):
     global _global_polling_system
     _global_polling_system = polling_system
 
-async def resume_order_polling_after_receipt(order_id: int):
+async def resume_order_polling_after_receipt(order_id: int, user_id: int = None):
     """ادامه polling پس از آپلود رسید"""
     try:
         global _global_polling_system
         if _global_polling_system:
-            _global_polling_system.resume_order_polling(order_id)
+            _global_polling_system.resume_order_polling(order_id, user_id)
             logger.info(f"▶️ Polling برای سفارش {order_id} ادامه یافت")
         else:
             logger.warning(f"⚠️ Polling system در دسترس نیست برای ادامه polling سفارش {order_id}")
     except Exception as e:
         logger.error(f"❌ خطا در ادامه polling برای سفارش {order_id}: {e}")
 
-def register_receipt_handlers(dp):
-    """ثبت هندلرهای مربوط به رسید"""
+def register_receipt_handlers(router):
+    """ثبت هندلرهای مربوط به رسید در جدول مسیریابی (app/update_router.py)"""
     # هندلر برای دریافت عکس (فقط زمانی که کاربر در انتظار رسید است)
-    dp.message.register(
-        receipt_photo_handler, 
-        lambda message: message.photo is not None and get_receipt_waiting_state(message.from_user.id) is not None
+    router.message_when(
+        receipt_photo_handler,
+        lambda message, ctx: message.photo is not None and ctx.receipt_state is not None
     )
     
     # هندلر برای پیام‌های متنی در حالت انتظار رسید
-    dp.message.register(
+    router.message_when(
         receipt_text_handler,
-        lambda message: message.text and get_receipt_waiting_state(message.from_user.id) is not None
+        lambda message, ctx: bool(message.text) and ctx.receipt_state is not None
     )
 
     # هندلر برای فایل‌های مستند در حالت انتظار رسید
-    dp.message.register(
+    router.message_when(
         receipt_document_handler,
-        lambda message: message.document and get_receipt_waiting_state(message.from_user.id) is not None
+        lambda message, ctx: message.document is not None and ctx.receipt_state is not None
     )
     
     logger.info("📝 هندلرهای رسید پرداخت ثبت شدند")
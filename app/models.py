@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+مدل‌های داده فشرده وضعیت گفتگو (dataclass با __slots__)
+- پیش‌نویس سفارش و آیتم‌های آن، پیش‌نویس ثبت‌نام، وضعیت کاربر
+- مراحل به صورت enum عددی
+- to_record/from_record: تبدیل سریع به/از رکورد فشرده (لیست) برای ذخیره در store
+  (رکوردهای قدیمی dict نیز هنگام بارگذاری پذیرفته می‌شوند)
+"""
+
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Dict, List, Optional
+
+
+class OrderStep(IntEnum):
+    """مراحل ثبت آیتم سفارش"""
+    PRODUCT_NAME = 1
+    QUANTITY = 2
+    WAITING_PHOTO = 3
+
+
+class RegistrationStep(IntEnum):
+    """مراحل ثبت‌نام مکانیک و مشتری"""
+    FULL_NAME = 1
+    MOBILE = 2
+    CARD_NUMBER = 3
+    SHEBA_NUMBER = 4
+    ADDRESS = 5
+    BUSINESS_LICENSE = 6
+    FIRST_NAME = 7
+    PHONE_NUMBER = 8
+    PROVINCE = 9
+    CITY = 10
+    POSTAL_CODE = 11
+
+
+def _step(enum_cls, value, default):
+    """تبدیل مقدار ذخیره شده (عدد یا نام قدیمی مثل 'product_name') به enum"""
+    if isinstance(value, int):
+        return enum_cls(value)
+    if isinstance(value, str) and value.upper() in enum_cls.__members__:
+        return enum_cls[value.upper()]
+    return default
+
+
+@dataclass(slots=True)
+class OrderItem:
+    """یک آیتم سفارش"""
+    product_name: str = ''
+    quantity: int = 0
+    photo_file_id: Optional[str] = None
+
+    @property
+    def is_complete(self) -> bool:
+        return bool(self.product_name and self.quantity)
+
+    def to_payload(self) -> Dict:
+        """آیتم در قالب API پنل"""
+        return {
+            'product_name': self.product_name,
+            'quantity': self.quantity,
+            'unit_price': 0,
+            'total_price': 0,
+            'photo': self.photo_file_id,
+        }
+
+    def to_record(self) -> list:
+        return [self.product_name, self.quantity, self.photo_file_id]
+
+    @classmethod
+    def from_record(cls, record) -> "OrderItem":
+        if isinstance(record, dict):
+            return cls(record.get('product_name', ''), record.get('quantity', 0), record.get('photo_file_id'))
+        return cls(*record)
+
+
+@dataclass(slots=True)
+class OrderDraft:
+    """پیش‌نویس سفارش در حال ثبت (و پس از ارسال: شناسه و وضعیت سفارش در پنل)"""
+    step: OrderStep = OrderStep.PRODUCT_NAME
+    current_item: OrderItem = field(default_factory=OrderItem)
+    items: List[OrderItem] = field(default_factory=list)
+    order_id: Optional[int] = None
+    status: Optional[str] = None
+
+    def commit_current_item(self) -> Optional[OrderItem]:
+        """انتقال آیتم فعلی (در صورت کامل بودن) به لیست آیتم‌ها و شروع آیتم جدید"""
+        item = self.current_item
+        self.current_item = OrderItem()
+        if not item.is_complete:
+            return None
+        self.items.append(item)
+        return item
+
+    def to_record(self) -> list:
+        return [int(self.step), self.current_item.to_record(), [item.to_record() for item in self.items],
+                self.order_id, self.status]
+
+    @classmethod
+    def from_record(cls, record) -> "OrderDraft":
+        if isinstance(record, dict):
+            return cls(
+                _step(OrderStep, record.get('step'), OrderStep.PRODUCT_NAME),
+                OrderItem.from_record(record.get('current_item') or {}),
+                [OrderItem.from_record(item) for item in record.get('items') or []],
+                record.get('order_id'),
+                record.get('status'),
+            )
+        step, current_item, items, order_id, status = record
+        return cls(OrderStep(step), OrderItem.from_record(current_item),
+                   [OrderItem.from_record(item) for item in items], order_id, status)
+
+
+@dataclass(slots=True)
+class RegistrationDraft:
+    """پیش‌نویس ثبت‌نام (مکانیک یا مشتری)"""
+    step: RegistrationStep
+    data: Dict[str, str] = field(default_factory=dict)
+
+    def to_record(self) -> list:
+        return [int(self.step), self.data]
+
+    @classmethod
+    def from_record(cls, record) -> "RegistrationDraft":
+        if isinstance(record, dict):
+            return cls(_step(RegistrationStep, record.get('step'), RegistrationStep.FULL_NAME), record.get('data') or {})
+        step, data = record
+        return cls(RegistrationStep(step), data)
+
+
+@dataclass(slots=True)
+class UserStatus:
+    """وضعیت کاربر در پنل"""
+    role: Optional[str] = None  # mechanic یا customer
+    status: Optional[str] = None  # pending / approved / rejected
+    updated_at: Optional[str] = None
+
+    def to_record(self) -> list:
+        return [self.role, self.status, self.updated_at]
+
+    @classmethod
+    def from_record(cls, record) -> "UserStatus":
+        if isinstance(record, dict):
+            return cls(record.get('role'), record.get('status'), record.get('updated_at'))
+        return cls(*record)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+دفتر سفارشات پرداخت شده‌ای که اطلاع‌رسانی شده‌اند (جلوگیری از پیام تکراری)
+- مجموعه در حافظه با جستجوی O(1)
+- هر سفارش جدید فقط یک خط به انتهای فایل log اضافه می‌کند (بدون بازنویسی کل فایل)
+- فشرده‌سازی دوره‌ای log و حذف سفارش‌های قدیمی‌تر از مدت نگهداری
+- مشترک بین مسیر webhook و سیستم polling
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from config import BotConfig
+
+# تنظیم لاگر
+logger = logging.getLogger(__name__)
+
+NOTIFIED_LEDGER_FILE = os.path.join(os.path.dirname(__file__), 'notified_orders.log')
+
+# فایل‌های قدیمی JSON (state_manager و PollingSystem) که یک بار به log منتقل می‌شوند
+LEGACY_NOTIFIED_FILES = (
+    os.path.join(os.path.dirname(__file__), 'notified_orders.json'),
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'notified_orders.json'),
+)
+
+
+class NotifiedOrdersLedger:
+    """مجموعه سفارشات اطلاع‌رسانی شده با log فقط-افزودنی"""
+
+    def __init__(self, path: str = NOTIFIED_LEDGER_FILE, retention: float = None, compact_every: int = None,
+                 legacy_files=LEGACY_NOTIFIED_FILES):
+        self.path = path
+        self.retention = retention if retention is not None else BotConfig.NOTIFIED_ORDERS_RETENTION_DAYS * 86400
+        self.compact_every = compact_every or BotConfig.NOTIFIED_LEDGER_COMPACT_EVERY
+        self.legacy_files = legacy_files
+        self.entries: Dict[str, float] = {}  # {order_id: زمان اطلاع‌رسانی}
+        self.appends_since_compact = 0
+        self.compactions = 0
+        self._log = None
+        self.load()
+
+    def __contains__(self, order_id) -> bool:
+        return self.contains(order_id)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # --- بارگذاری و فشرده‌سازی ---
+
+    def load(self):
+        """بازسازی مجموعه از log (و انتقال فایل‌های قدیمی در اولین اجرا)"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                            self.entries[str(record['order_id'])] = float(record['ts'])
+                        except (ValueError, KeyError, TypeError):
+                            # خط ناقص (مثلاً قطع برنامه حین نوشتن) نادیده گرفته می‌شود
+                            continue
+            except Exception as e:
+                logger.error(f"❌ خطا در بارگذاری سفارشات اطلاع‌رسانی شده: {e}")
+        else:
+            self._migrate_legacy()
+        self.compact()
+        logger.info(f"📋 بارگذاری {len(self.entries)} سفارش اطلاع‌رسانی شده")
+
+    def _migrate_legacy(self):
+        """انتقال لیست‌های قدیمی JSON (زمان اطلاع‌رسانی نامشخص: زمان فعلی)"""
+        now = time.time()
+        for legacy_file in self.legacy_files:
+            try:
+                if os.path.exists(legacy_file):
+                    with open(legacy_file, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    for order_id in data.get('notified_orders', []):
+                        self.entries.setdefault(str(order_id), now)
+            except Exception as e:
+                logger.error(f"❌ خطا در انتقال {legacy_file}: {e}")
+
+    def compact(self):
+        """بازنویسی اتمیک log فقط با سفارش‌های داخل مدت نگهداری"""
+        cutoff = time.time() - self.retention
+        self.entries = {order_id: ts for order_id, ts in self.entries.items() if ts >= cutoff}
+        self._close_log()
+        try:
+            tmp_file = f"{self.path}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                for order_id, ts in self.entries.items():
+                    f.write(self._record(order_id, ts))
+            os.replace(tmp_file, self.path)
+            self.compactions += 1
+        except Exception as e:
+            logger.error(f"❌ خطا در فشرده‌سازی سفارشات اطلاع‌رسانی شده: {e}")
+        self.appends_since_compact = 0
+
+    @staticmethod
+    def _record(order_id: str, ts: float) -> str:
+        return json.dumps({'order_id': order_id, 'ts': round(ts, 3)}) + '\n'
+
+    def _close_log(self):
+        if self._log is not None:
+            try:
+                self._log.close()
+            finally:
+                self._log = None
+
+    def close(self):
+        """بستن فایل log"""
+        self._close_log()
+
+    # --- دسترسی ---
+
+    def contains(self, order_id) -> bool:
+        """آیا سفارش (در مدت نگهداری) اطلاع‌رسانی شده است"""
+        ts = self.entries.get(str(order_id))
+        return ts is not None and time.time() - ts <= self.retention
+
+    def add(self, order_id) -> bool:
+        """
+        ثبت سفارش اطلاع‌رسانی شده
+        خروجی: True اگر سفارش جدید بود، False اگر قبلاً ثبت شده بود
+        """
+        if self.contains(order_id):
+            return False
+        order_id = str(order_id)
+        ts = time.time()
+        self.entries[order_id] = ts
+        try:
+            if self._log is None:
+                self._log = open(self.path, 'a', encoding='utf-8')
+            self._log.write(self._record(order_id, ts))
+            self._log.flush()
+        except Exception as e:
+            self._close_log()
+            logger.error(f"❌ خطا در ثبت سفارش اطلاع‌رسانی شده {order_id}: {e}")
+        self.appends_since_compact += 1
+        if self.appends_since_compact >= self.compact_every:
+            self.compact()
+        return True
+
+    def order_ids(self) -> List[str]:
+        """شناسه سفارشات اطلاع‌رسانی شده (قدیمی به جدید)"""
+        return [order_id for order_id, _ in sorted(self.entries.items(), key=lambda item: item[1])]
+
+    def stats(self) -> Dict:
+        return {
+            'entries': len(self.entries),
+            'appends_since_compact': self.appends_since_compact,
+            'compactions': self.compactions,
+        }
+
+
+# نمونه سراسری دفتر
+_ledger: Optional[NotifiedOrdersLedger] = None
+
+
+def get_notified_ledger() -> NotifiedOrdersLedger:
+    """دریافت نمونه سراسری دفتر سفارشات اطلاع‌رسانی شده"""
+    global _ledger
+    if _ledger is None:
+        _ledger = NotifiedOrdersLedger()
+    return _ledger
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ایندکس سفارش‌های ثبت شده در پیش‌نویس‌های سفارش (مکانیک و مشتری، مدل OrderDraft)
+- ایندکس بر اساس وضعیت و بر اساس شناسه سفارش
+- نمای سفارش‌های در انتظار به صورت افزایشی به‌روز می‌شود (بدون پیمایش همه پیش‌نویس‌ها در هر چرخه)
+- رسیدن سفارش به وضعیت نهایی، پیش‌نویس را در O(1) حذف می‌کند
+- add_listener: اطلاع از سفارش‌هایی که در انتظار می‌شوند (مثلاً برای ثبت در زمان‌بند polling)
+"""
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.state_store import StateTable
+
+# وضعیت‌هایی که پس از آن‌ها پیش‌نویس سفارش دیگر لازم نیست
+DRAFT_TERMINAL_STATUSES = frozenset({'completed', 'پرداخت شده', 'payment_confirmed'})
+
+# کلید هر پیش‌نویس: (نوع جدول، شناسه کاربر)
+DraftKey = Tuple[str, Any]
+
+
+class OrderDraftRegistry:
+    """ایندکس‌های وضعیت و شناسه سفارش روی جداول پیش‌نویس سفارش"""
+
+    def __init__(self, tables: Iterable[StateTable], terminal_statuses=DRAFT_TERMINAL_STATUSES):
+        self.tables: Dict[str, StateTable] = {table.kind: table for table in tables}
+        self.terminal_statuses = frozenset(terminal_statuses)
+        self._entries: Dict[DraftKey, Tuple[Any, Any]] = {}  # {draft: (order_id, status)}
+        self._by_status: Dict[Any, set] = {}
+        self._by_order: Dict[Any, DraftKey] = {}
+        self._pending: Dict[DraftKey, Tuple[Any, Any]] = {}  # {draft: (order_id, user_id)}
+        self._listeners = []  # فراخوانی‌ها برای سفارش در انتظار: fn(order_id, user_id)
+        for kind, table in self.tables.items():
+            table.add_listener(lambda user_id, value, kind=kind: self._on_change((kind, user_id), value))
+            for user_id, value in table.items():
+                self._on_change((kind, user_id), value)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # --- نگهداری ایندکس‌ها ---
+
+    def _on_change(self, draft: DraftKey, value):
+        """به‌روزرسانی ایندکس‌ها برای یک پیش‌نویس (value=None یعنی حذف شده)"""
+        old = self._entries.pop(draft, None)
+        if old is not None:
+            old_order_id, old_status = old
+            bucket = self._by_status.get(old_status)
+            if bucket is not None:
+                bucket.discard(draft)
+                if not bucket:
+                    del self._by_status[old_status]
+            if self._by_order.get(old_order_id) == draft:
+                del self._by_order[old_order_id]
+            self._pending.pop(draft, None)
+
+        if value is None:
+            return
+        order_id, status = value.order_id, value.status
+        if not order_id and not status:
+            # پیش‌نویس در حال تکمیل که هنوز به پنل ارسال نشده
+            return
+        self._entries[draft] = (order_id, status)
+        self._by_status.setdefault(status, set()).add(draft)
+        if order_id:
+            self._by_order[order_id] = draft
+            if status and status not in self.terminal_statuses:
+                self._pending[draft] = (order_id, draft[1])
+                for listener in self._listeners:
+                    listener(order_id, draft[1])
+
+    def add_listener(self, listener):
+        """ثبت فراخوانی برای پیش‌نویس‌هایی که (پس از تغییر) سفارش در انتظار دارند"""
+        self._listeners.append(listener)
+
+    def refresh(self):
+        """اعمال تغییرات درجای پیش‌نویس‌ها (فقط کلیدهای تغییر یافته)"""
+        for table in self.tables.values():
+            table.refresh_index()
+
+    # --- جستجو ---
+
+    def pending(self):
+        """نمای زنده سفارش‌های در انتظار: (order_id, user_id)"""
+        self.refresh()
+        return self._pending.values()
+
+    def by_order(self, order_id) -> Optional[DraftKey]:
+        """پیش‌نویس مربوط به یک سفارش: (نوع جدول، شناسه کاربر)"""
+        self.refresh()
+        return self._by_order.get(order_id)
+
+    def by_status(self, status) -> set:
+        self.refresh()
+        return set(self._by_status.get(status, ()))
+
+    def counts(self) -> Dict[Any, int]:
+        """تعداد پیش‌نویس‌ها به ازای هر وضعیت"""
+        self.refresh()
+        return {status: len(drafts) for status, drafts in self._by_status.items()}
+
+    # --- تغییر وضعیت ---
+
+    def set_status(self, user_id, order_id, status) -> bool:
+        """
+        تنظیم وضعیت سفارش کاربر در پیش‌نویس‌های او
+        در وضعیت نهایی پیش‌نویس حذف می‌شود؛ خروجی: True اگر پیش‌نویسی پیدا شد
+        """
+        found = False
+        for table in self.tables.values():
+            draft = table.get(user_id)
+            if draft is None:
+                continue
+            found = True
+            if status in self.terminal_statuses:
+                del table[user_id]
+            else:
+                draft.status = status
+                draft.order_id = order_id
+            table.refresh_index()
+        return found
+
+    def clear_terminal(self) -> int:
+        """حذف پیش‌نویس‌هایی که (با تغییر درجا) به وضعیت نهایی رسیده‌اند"""
+        self.refresh()
+        drafts = [draft for status in self.terminal_statuses for draft in self._by_status.get(status, ())]
+        for kind, user_id in drafts:
+            self.tables[kind].discard(user_id)
+        if drafts:
+            self.refresh()
+        return len(drafts)
+
+    def clear_user(self, user_id):
+        """حذف پیش‌نویس‌های سفارش کاربر"""
+        for table in self.tables.values():
+            table.discard(user_id)
+        self.refresh()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+همگام‌سازی تغییرات سفارشات از پنل
+- حالت افزایشی: فقط سفارش‌هایی که بعد از cursor (updated_since) تغییر کرده‌اند، صفحه به صفحه
+- cursor پس از پردازش هر صفحه در حافظه جلو می‌رود و در پایان همگام‌سازی یک بار (خارج از event loop) در فایل ذخیره می‌شود
+- اگر پنل cursor را پشتیبانی نکند: اسکن کامل صفحه‌بندی شده سفارشات در انتظار پرداخت (بدون سقف 50)
+
+قرارداد پنل برای حالت افزایشی:
+    GET /telegram-bot/api/orders?updated_since=<cursor>&limit=<n>
+    {"success": true, "data": [...], "next_cursor": "...", "has_more": true/false}
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import AsyncIterator, List, Optional, Tuple
+
+from config import BotConfig
+from app.panel_client import PanelClient, get_panel_client
+
+# تنظیم لاگر
+logger = logging.getLogger(__name__)
+
+ORDER_SYNC_STATE_FILE = os.path.join(os.path.dirname(__file__), 'order_sync_state.json')
+
+# وضعیتی که اسکن کامل (و اولین همگام‌سازی بدون cursor) برای آن اطلاع‌رسانی می‌کند
+FULL_SCAN_STATUS = "در انتظار پرداخت"
+
+# حداکثر تعداد صفحه در یک همگام‌سازی (محافظ در برابر حلقه بی‌پایان)
+MAX_SYNC_PAGES = 1000
+
+
+class OrderSync:
+    """دریافت صفحه به صفحه سفارشات تغییر یافته با cursor ذخیره شده"""
+
+    def __init__(self, panel_client: PanelClient = None, state_file: str = ORDER_SYNC_STATE_FILE,
+                 page_size: int = None, mode: str = None):
+        self.panel_client = panel_client
+        self.state_file = state_file
+        self.page_size = page_size or BotConfig.PANEL_ORDER_PAGE_SIZE
+        self.mode = (mode or BotConfig.PANEL_ORDER_SYNC_MODE).lower()  # 'auto' یا 'full'
+        # پشتیبانی پنل از cursor: None = نامشخص، True/False پس از اولین درخواست
+        self.cursor_supported: Optional[bool] = None if self.mode == 'auto' else False
+        self.cursor: Optional[str] = None
+        self._cursor_dirty = False  # cursor جلو رفته ولی هنوز ذخیره نشده
+        self.last_sync_stats = {}
+        self.load()
+
+    def _client(self) -> PanelClient:
+        return self.panel_client or get_panel_client()
+
+    @property
+    def is_baseline(self) -> bool:
+        """
+        اولین همگام‌سازی افزایشی (بدون cursor ذخیره شده)
+        در این حالت فقط سفارشات در انتظار پرداخت اطلاع‌رسانی می‌شوند، مانند اسکن کامل
+        """
+        return self.cursor_supported is not False and self.cursor is None
+
+    # --- ذخیره و بازیابی cursor ---
+
+    def load(self):
+        """بارگذاری cursor از فایل"""
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    self.cursor = json.load(f).get('updated_since')
+                logger.info(f"📋 cursor همگام‌سازی سفارشات: {self.cursor}")
+        except Exception as e:
+            logger.error(f"❌ خطا در بارگذاری cursor سفارشات: {e}")
+
+    def save(self):
+        """ذخیره اتمیک cursor (فایل موقت + rename)"""
+        try:
+            tmp_file = f"{self.state_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'updated_since': self.cursor}, f, ensure_ascii=False)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            logger.error(f"❌ خطا در ذخیره cursor سفارشات: {e}")
+
+    def advance(self, cursor: Optional[str]):
+        """جلو بردن cursor پس از پردازش کامل یک صفحه (ذخیره با commit)"""
+        if cursor is not None and cursor != self.cursor:
+            self.cursor = cursor
+            self._cursor_dirty = True
+
+    async def commit(self):
+        """ذخیره cursor جلو رفته در پایان همگام‌سازی (در thread جداگانه)"""
+        if self._cursor_dirty:
+            self._cursor_dirty = False
+            await asyncio.to_thread(self.save)
+
+    # --- دریافت صفحات ---
+
+    async def pages(self) -> AsyncIterator[Tuple[List[dict], Optional[str]]]:
+        """
+        صفحات سفارشات: (لیست سفارش، cursor بعد از این صفحه)
+        فراخواننده پس از پردازش هر صفحه advance(cursor) و در پایان commit() را صدا می‌زند
+        """
+        self.last_sync_stats = {'mode': 'incremental', 'pages': 0, 'orders': 0}
+        if self.cursor_supported is not False:
+            async for page in self._incremental_pages():
+                yield page
+            if self.cursor_supported:
+                return
+        self.last_sync_stats = {'mode': 'full', 'pages': 0, 'orders': 0}
+        async for page in self._full_pages():
+            yield page
+
+    async def _incremental_pages(self):
+        """صفحات سفارشات تغییر یافته از cursor فعلی"""
+        cursor = self.cursor
+        for _ in range(MAX_SYNC_PAGES):
+            try:
+                client = self._client()
+                status_code, data = await client.list_orders(
+                    updated_since=cursor or 0, limit=self.page_size, timeout=10, retry=client.background_retry_policy
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ خطا در همگام‌سازی افزایشی سفارشات: {e}")
+                return
+            if status_code != 200 or not data or not data.get('success'):
+                logger.warning(f"⚠️ خطا در همگام‌سازی افزایشی سفارشات: {status_code}")
+                return
+            if 'next_cursor' not in data:
+                if self.cursor_supported is None:
+                    logger.info("ℹ️ پنل از updated_since پشتیبانی نمی‌کند - استفاده از اسکن کامل صفحه‌بندی شده")
+                self.cursor_supported = False
+                return
+            self.cursor_supported = True
+            orders = data.get('data') or []
+            cursor = data.get('next_cursor') or cursor
+            self.last_sync_stats['pages'] += 1
+            self.last_sync_stats['orders'] += len(orders)
+            yield orders, cursor
+            if not data.get('has_more') or not orders:
+                return
+        logger.warning(f"⚠️ همگام‌سازی سفارشات پس از {MAX_SYNC_PAGES} صفحه متوقف شد")
+
+    async def _full_pages(self):
+        """اسکن کامل صفحه‌بندی شده سفارشات در انتظار پرداخت"""
+        offset = 0
+        previous_first_id = None
+        for _ in range(MAX_SYNC_PAGES):
+            try:
+                client = self._client()
+                status_code, data = await client.list_orders(
+                    status=FULL_SCAN_STATUS, limit=self.page_size, offset=offset, timeout=10,
+                    retry=client.background_retry_policy,
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ خطا در دریافت لیست سفارشات: {e}")
+                return
+            if status_code != 200 or not data or not data.get('success'):
+                logger.warning(f"⚠️ خطا در دریافت لیست سفارشات: {status_code}")
+                return
+            orders = data.get('data') or []
+            if not orders:
+                return
+            # اگر پنل offset را نادیده بگیرد، همان صفحه اول دوباره برمی‌گردد
+            if orders[0].get('id') == previous_first_id:
+                logger.warning("⚠️ پنل از offset پشتیبانی نمی‌کند - اسکن به صفحه اول محدود شد")
+                return
+            previous_first_id = orders[0].get('id')
+            self.last_sync_stats['pages'] += 1
+            self.last_sync_stats['orders'] += len(orders)
+            yield orders, None
+            if len(orders) < self.page_size:
+                return
+            offset += len(orders)
+        logger.warning(f"⚠️ اسکن سفارشات پس از {MAX_SYNC_PAGES} صفحه متوقف شد")
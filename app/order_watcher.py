@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+سرویس مرکزی پیگیری وضعیت سفارشات پس از ثبت/تایید توسط کاربر
+- مجموعه پیگیری بدون تکرار (هر سفارش فقط یک بار)
+- بررسی دسته‌ای همه سفارشات در هر دوره
+- توقف پیگیری در وضعیت نهایی یا پس از حداکثر عمر
+- مجموعه پیگیری در جدول order_watch در store وضعیت (app/state_store.py) با ذخیره دسته‌ای نگهداری می‌شود
+  و پس از راه‌اندازی مجدد بازیابی می‌شود (فایل order_watch.json قدیمی یک بار منتقل می‌شود)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from config import BotConfig
+from app.panel_client import PanelClient, get_panel_client
+from app.send_queue import get_send_queue
+from app.state_store import StateTable
+
+# تنظیم لاگر
+logger = logging.getLogger(__name__)
+
+# فایل قدیمی مجموعه پیگیری (فقط برای انتقال یک باره به store)
+WATCH_STATE_FILE = os.path.join(os.path.dirname(__file__), 'order_watch.json')
+
+# وضعیت‌هایی که پس از آن‌ها پیگیری سفارش متوقف می‌شود
+WATCH_TERMINAL_STATUSES = {'تکمیل شده', 'لغو شده', 'completed', 'rejected'}
+
+
+class OrderWatcher:
+    """پیگیری دوره‌ای وضعیت سفارشات و اطلاع‌رسانی تغییرات به کاربر"""
+
+    def __init__(self, bot=None, panel_client: PanelClient = None, state_file: str = WATCH_STATE_FILE,
+                 interval: float = None, max_age: float = None, table: StateTable = None):
+        self.bot = bot
+        self.panel_client = panel_client
+        self.state_file = state_file
+        self.interval = interval if interval is not None else BotConfig.ORDER_WATCH_INTERVAL
+        self.max_age = max_age if max_age is not None else BotConfig.ORDER_WATCH_MAX_AGE
+        # {order_id: {'user_id', 'last_status', 'added_at'}}
+        self.watched = table if table is not None else StateTable('order_watch')
+        self.is_running = False
+        self._import_legacy_file()
+        if self.watched:
+            logger.info(f"📋 بازیابی {len(self.watched)} سفارش در حال پیگیری")
+
+    def __len__(self) -> int:
+        return len(self.watched)
+
+    @property
+    def watched_count(self) -> int:
+        """تعداد سفارشات در حال پیگیری"""
+        return len(self.watched)
+
+    def _client(self) -> PanelClient:
+        return self.panel_client or get_panel_client()
+
+    # --- انتقال فایل قدیمی ---
+
+    def _import_legacy_file(self):
+        """انتقال یک باره order_watch.json قدیمی به store (فقط اگر جدول خالی باشد)"""
+        if self.watched or not os.path.exists(self.state_file):
+            return
+        try:
+            from app.file_cache import read_json_file
+            data = read_json_file(self.state_file) or {}
+            for order_id, entry in data.get('watched', {}).items():
+                self.watched[int(order_id)] = entry
+            os.replace(self.state_file, f"{self.state_file}.imported")
+            logger.info(f"📋 {len(self.watched)} سفارش در حال پیگیری از {self.state_file} منتقل شد")
+        except Exception as e:
+            logger.error(f"❌ خطا در انتقال سفارشات در حال پیگیری: {e}")
+
+    # --- مدیریت مجموعه پیگیری ---
+
+    def watch(self, order_id: int, user_id: int) -> bool:
+        """
+        شروع پیگیری سفارش
+        اگر سفارش از قبل پیگیری شود، پیگیری تکراری ایجاد نمی‌شود (False)
+        """
+        order_id = int(order_id)
+        entry = self.watched.get(order_id)
+        if entry is not None:
+            entry['user_id'] = user_id
+            logger.debug(f"👀 سفارش {order_id} از قبل در حال پیگیری است")
+            return False
+        self.watched[order_id] = {'user_id': user_id, 'last_status': None, 'added_at': time.time()}
+        logger.info(f"👀 پیگیری سفارش {order_id} برای کاربر {user_id} شروع شد ({len(self.watched)} سفارش)")
+        return True
+
+    def unwatch(self, order_id: int):
+        """توقف پیگیری سفارش"""
+        if self.watched.pop(int(order_id), None) is not None:
+            logger.info(f"⏹️ پیگیری سفارش {order_id} متوقف شد ({len(self.watched)} سفارش)")
+
+    # --- حلقه پیگیری ---
+
+    async def run(self):
+        """حلقه پیگیری دوره‌ای"""
+        self.is_running = True
+        logger.info(f"👀 سرویس پیگیری سفارشات شروع شد (فاصله {self.interval} ثانیه، {len(self.watched)} سفارش)")
+        while self.is_running:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logger.error(f"❌ خطا در حلقه پیگیری سفارشات: {e}")
+
+    def stop(self):
+        """توقف سرویس پیگیری"""
+        self.is_running = False
+
+    async def poll_once(self):
+        """یک دور بررسی دسته‌ای همه سفارشات در حال پیگیری"""
+        now = time.time()
+        expired = [order_id for order_id, entry in self.watched.items() if now - entry.get('added_at', now) > self.max_age]
+        for order_id in expired:
+            logger.info(f"⌛ پیگیری سفارش {order_id} به دلیل گذشت حداکثر زمان متوقف شد")
+            self.watched.pop(order_id, None)
+
+        if self.watched:
+            client = self._client()
+            results = await client.get_orders_batch(list(self.watched), timeout=10, retry=client.background_retry_policy)
+            for order_id, (status_code, response_data) in results.items():
+                entry = self.watched.peek(order_id)
+                if entry is None:
+                    continue
+                if status_code != 200 or not response_data or not response_data.get('success'):
+                    logger.warning(f"[BOT] Status check failed for order {order_id}: status={status_code}")
+                    continue
+                data = response_data.get('data', {})
+                current_status = data.get('status')
+                if current_status == entry.get('last_status'):
+                    continue
+                logger.info(f"[BOT] Order {order_id} status changed: {entry.get('last_status')} -> {current_status}")
+                entry['last_status'] = current_status
+                # علامت‌گذاری برای ذخیره دسته‌ای
+                self.watched[order_id] = entry
+                await self.handle_status_change(order_id, entry['user_id'], current_status, data)
+                if current_status in WATCH_TERMINAL_STATUSES:
+                    self.watched.pop(order_id, None)
+
+        logger.debug(f"👀 {len(self.watched)} سفارش در حال پیگیری")
+
+    async def handle_status_change(self, order_id: int, user_id: int, status: str, data: dict):
+        """اطلاع‌رسانی تغییر وضعیت سفارش به کاربر"""
+        if self.bot is None:
+            logger.warning(f"⚠️ ربات برای اطلاع‌رسانی وضعیت سفارش {order_id} تنظیم نشده است")
+            return
+        try:
+            if status == "در انتظار تایید کاربر":
+                # ادمین سفارش را تایید کرده و قیمت‌ها را وارد کرده
+                from handlers.order_handlers import show_order_summary_with_prices
+                await show_order_summary_with_prices(order_id, user_id, self.bot, data)
+
+            elif status == "در انتظار پرداخت":
+                # کاربر سفارش را تایید کرده
+                from handlers.order_handlers import show_payment_details
+                await show_payment_details(order_id, user_id, self.bot, data)
+
+            elif status == "در انتظار تایید پرداخت":
+                # کاربر رسید را ارسال کرده
+                await get_send_queue().send_message(self.bot, user_id, "✅ رسید پرداخت شما دریافت شد و در حال بررسی است.")
+
+            elif status == "تکمیل شده":
+                await get_send_queue().send_message(self.bot, user_id, "✅ سفارش شما با موفقیت تکمیل شد و به آدرس شما ارسال خواهد شد!")
+                logger.info(f"[BOT] Order completion notification sent to user {user_id}")
+
+            elif status == "لغو شده":
+                await get_send_queue().send_message(self.bot, user_id, "❌ سفارش شما لغو شد.")
+                logger.info(f"[BOT] Order cancellation notification sent to user {user_id}")
+        except Exception as e:
+            logger.error(f"[BOT] Exception in order status notification for {order_id}: {e}")
+
+    def stats(self) -> Dict:
+        """آمار سرویس پیگیری"""
+        return {'watched': len(self.watched), 'interval': self.interval, 'max_age': self.max_age}
+
+
+# نمونه سراسری سرویس پیگیری
+_order_watcher: Optional[OrderWatcher] = None
+
+
+def init_order_watcher(bot=None, **kwargs) -> OrderWatcher:
+    """ایجاد (یا به‌روزرسانی ربات) نمونه سراسری سرویس پیگیری"""
+    global _order_watcher
+    if _order_watcher is None:
+        _order_watcher = OrderWatcher(bot=bot, **kwargs)
+    elif bot is not None:
+        _order_watcher.bot = bot
+    return _order_watcher
+
+
+def get_order_watcher() -> OrderWatcher:
+    """دریافت نمونه سراسری سرویس پیگیری"""
+    return init_order_watcher()
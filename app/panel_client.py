@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+کلاینت مشترک و async برای ارتباط با API پنل
+یک session با اتصال‌های keep-alive برای تمام هندلرها و سیستم polling
+و یک circuit breaker برای خطای سریع در زمان قطعی پنل
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from config import BotConfig
+from app.retry import RetryPolicy
+
+# بدون تلاش مجدد (مثلاً برای درخواست آزمایشی سلامت)
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+# تنظیم لاگر
+logger = logging.getLogger(__name__)
+
+
+class PanelUnavailableError(aiohttp.ClientConnectionError):
+    """مدار باز است - درخواست بدون ارسال به پنل رد شد"""
+
+
+class CircuitBreaker:
+    """
+    circuit breaker با سه حالت:
+    - closed: درخواست‌ها عادی ارسال می‌شوند؛ پس از failure_threshold خطای پیاپی مدار باز می‌شود
+    - open: درخواست‌ها بلافاصله رد می‌شوند تا recovery_timeout ثانیه بگذرد
+    - half_open: حداکثر half_open_max_calls درخواست آزمایشی؛ موفقیت مدار را می‌بندد و خطا دوباره باز می‌کند
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.rejected = 0
+        self.transitions = {self.OPEN: 0, self.HALF_OPEN: 0, self.CLOSED: 0}
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        logger.warning(f"🔌 circuit breaker پنل: {self.state} -> {state} (خطاهای پیاپی: {self.failures})")
+        self.state = state
+        self.transitions[state] += 1
+        if state == self.OPEN:
+            self.opened_at = time.monotonic()
+        self.half_open_calls = 0
+
+    def allow(self) -> bool:
+        """آیا درخواست اجازه ارسال دارد؟"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                self.rejected += 1
+                return False
+            self._transition(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            if self.half_open_calls >= self.half_open_max_calls:
+                self.rejected += 1
+                return False
+            self.half_open_calls += 1
+        return True
+
+    @property
+    def is_open(self) -> bool:
+        """مدار باز است و هنوز زمان درخواست آزمایشی نرسیده"""
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.recovery_timeout
+
+    def release(self):
+        """آزاد کردن سهمیه درخواست آزمایشی لغو شده (بدون نتیجه)"""
+        if self.state == self.HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+    def record_success(self):
+        self.failures = 0
+        self._transition(self.CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._transition(self.OPEN)
+
+    def stats(self) -> Dict[str, Any]:
+        """آمار breaker"""
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions),
+        }
+
+
+class PanelClient:
+    """کلاینت API پنل با connection pool مشترک"""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        limit: Optional[int] = None,
+        limit_per_host: Optional[int] = None,
+        keepalive_timeout: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ):
+        """مقداردهی اولیه (session در اولین درخواست ساخته می‌شود)"""
+        self.base_url = (base_url or BotConfig.PANEL_API_BASE_URL or "").rstrip("/")
+        self.limit = limit or BotConfig.PANEL_POOL_LIMIT
+        self.limit_per_host = limit_per_host or BotConfig.PANEL_POOL_LIMIT_PER_HOST
+        self.keepalive_timeout = keepalive_timeout or BotConfig.PANEL_KEEPALIVE_TIMEOUT
+        self.timeout = timeout or BotConfig.PANEL_REQUEST_TIMEOUT
+        self.batch_size = BotConfig.PANEL_BATCH_SIZE
+        self.batch_fallback_concurrency = BotConfig.PANEL_BATCH_FALLBACK_CONCURRENCY
+        # پشتیبانی پنل از endpoint های دسته‌ای: None = نامشخص، True/False پس از اولین درخواست
+        self.batch_supported: Dict[str, Optional[bool]] = {
+            "user_status": None if BotConfig.PANEL_BATCH_ENABLED else False,
+            "orders": None if BotConfig.PANEL_BATCH_ENABLED else False,
+        }
+        self.request_count = 0  # تعداد کل درخواست‌های ارسال شده (برای گزارش کار هر چرخه)
+        self.retry_count = 0  # تعداد کل تلاش‌های مجدد
+        # سیاست تلاش مجدد پیش‌فرض (بودجه کوتاه برای هندلرهای کاربر) و سیاست کارهای پس‌زمینه (بودجه طولانی‌تر)
+        self.retry_policy = RetryPolicy(
+            max_attempts=BotConfig.PANEL_RETRY_ATTEMPTS,
+            base_delay=BotConfig.PANEL_RETRY_BASE_DELAY,
+            max_delay=BotConfig.PANEL_RETRY_MAX_DELAY,
+            deadline=BotConfig.PANEL_RETRY_DEADLINE,
+        )
+        self.background_retry_policy = self.retry_policy.with_overrides(
+            max_attempts=BotConfig.PANEL_BACKGROUND_RETRY_ATTEMPTS,
+            deadline=BotConfig.PANEL_BACKGROUND_RETRY_DEADLINE,
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=BotConfig.PANEL_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=BotConfig.PANEL_BREAKER_RECOVERY_TIMEOUT,
+            half_open_max_calls=BotConfig.PANEL_BREAKER_HALF_OPEN_MAX_CALLS,
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """دریافت session مشترک (در صورت نیاز ساخته می‌شود)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            logger.info(
+                f"🔌 PanelClient session ساخته شد (limit={self.limit}, limit_per_host={self.limit_per_host})"
+            )
+        return self._session
+
+    async def close(self):
+        """بستن session و آزادسازی اتصال‌ها"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("🔌 PanelClient session بسته شد")
+        self._session = None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        data: Any = None,
+        timeout: Optional[float] = None,
+        retry: Optional[RetryPolicy] = None,
+        idempotency_key: Optional[str] = None,
+        idempotent: bool = False,
+    ) -> Tuple[int, Optional[Dict]]:
+        """
+        ارسال درخواست به پنل
+        خروجی: (کد وضعیت HTTP، بدنه JSON یا None)
+        خطاهای شبکه (aiohttp.ClientError و asyncio.TimeoutError) به فراخواننده می‌رسند
+        در زمان باز بودن مدار PanelUnavailableError بدون ارسال درخواست
+
+        تلاش مجدد فقط برای درخواست‌های idempotent: GET، درخواست‌های فقط‌خواندنی (idempotent=True)
+        و نوشتن‌هایی که idempotency_key دارند (هدر Idempotency-Key)
+        retry: سیاست این فراخوانی (پیش‌فرض self.retry_policy)؛ بودجه زمانی آن timeout هر تلاش را هم محدود می‌کند
+        (درخواست‌های بدون تلاش مجدد هم یک تلاش با همان بودجه و حداکثر self.timeout دارند)
+        """
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        retryable = method in ("GET", "HEAD") or idempotent or idempotency_key is not None
+        policy = retry or self.retry_policy
+        budget = policy.start()
+        # بدنه FormData فقط یک بار قابل ارسال است
+        if not retryable or isinstance(data, aiohttp.FormData):
+            status, body, _ = await self._send(
+                method, path, params, json, data, budget.timeout_for(timeout or self.timeout), headers
+            )
+            return status, body
+
+        while True:
+            attempt_timeout = budget.timeout_for(timeout or self.timeout)
+            try:
+                status, body, retry_after = await self._send(method, path, params, json, data, attempt_timeout, headers)
+            except PanelUnavailableError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = budget.next_delay()
+                if delay is None:
+                    raise
+                logger.debug(f"🔁 تلاش مجدد {method} {path} پس از {delay:.2f} ثانیه: {e!r}")
+            else:
+                if not policy.is_retryable_status(status):
+                    return status, body
+                delay = budget.next_delay(retry_after)
+                if delay is None:
+                    return status, body
+                logger.debug(f"🔁 تلاش مجدد {method} {path} پس از {delay:.2f} ثانیه: HTTP {status}")
+            self.retry_count += 1
+            await asyncio.sleep(delay)
+
+    async def _send(self, method, path, params, json, data, timeout, headers):
+        """
+        یک تلاش ارسال درخواست (با ثبت نتیجه در circuit breaker)
+        خروجی: (کد وضعیت، بدنه، Retry-After بر حسب ثانیه یا None)
+        """
+        if not self.breaker.allow():
+            raise PanelUnavailableError(f"پنل در دسترس نیست (circuit breaker باز است): {method} {path}")
+        session = await self._get_session()
+        url = f"{self.base_url}{path}"
+        # timeout=None در aiohttp یعنی بدون سقف زمانی؛ پیش‌فرض کلاینت جایگزین می‌شود
+        request_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        self.request_count += 1
+        retry_after = None
+        try:
+            async with session.request(
+                method, url, params=params, json=json, data=data, headers=headers, timeout=request_timeout
+            ) as resp:
+                try:
+                    body = await resp.json(content_type=None)
+                except (ValueError, aiohttp.ContentTypeError):
+                    body = None
+                try:
+                    retry_after = float(resp.headers["Retry-After"])
+                except (KeyError, ValueError):
+                    pass
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.breaker.record_failure()
+            raise
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        # خطای 5xx یعنی پنل سالم نیست؛ 4xx یعنی پنل پاسخ می‌دهد
+        if resp.status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return resp.status, body, retry_after
+
+    async def get(self, path: str, **kwargs) -> Tuple[int, Optional[Dict]]:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> Tuple[int, Optional[Dict]]:
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path: str, **kwargs) -> Tuple[int, Optional[Dict]]:
+        return await self.request("PUT", path, **kwargs)
+
+    # --- سلامت پنل ---
+
+    async def health(self, timeout: Optional[float] = 5) -> Tuple[int, Optional[Dict]]:
+        """بررسی endpoint سلامت پنل (بدون تلاش مجدد)"""
+        return await self.get("/health", timeout=timeout, retry=NO_RETRY)
+
+    # --- /mechanics/api ---
+
+    async def get_user_status(self, telegram_id: int, timeout: Optional[float] = None, retry: Optional[RetryPolicy] = None):
+        """وضعیت کاربر (مکانیک یا مشتری)"""
+        return await self.get(
+            "/mechanics/api/user/status", params={"telegram_id": telegram_id}, timeout=timeout, retry=retry
+        )
+
+    async def get_mechanic_status(self, telegram_id: int, timeout: Optional[float] = None, retry: Optional[RetryPolicy] = None):
+        """وضعیت مکانیک به همراه درصد کمیسیون"""
+        return await self.get(
+            "/mechanics/api/status", params={"telegram_id": telegram_id}, timeout=timeout, retry=retry
+        )
+
+    async def register_mechanic(self, form: aiohttp.FormData, timeout: Optional[float] = 30):
+        """ثبت‌نام مکانیک (multipart/form-data)"""
+        return await self.post("/mechanics/api/register", data=form, timeout=timeout)
+
+    # --- /customers/api ---
+
+    async def register_customer(self, payload: Dict, timeout: Optional[float] = None, idempotency_key: Optional[str] = None):
+        """ثبت‌نام مشتری"""
+        return await self.post("/customers/api/register", json=payload, timeout=timeout, idempotency_key=idempotency_key)
+
+    # --- /notifications/api ---
+
+    async def notify_mechanic_registered(self, payload: Dict, timeout: Optional[float] = 10):
+        """اعلان ثبت‌نام مکانیک جدید به پنل"""
+        return await self.post("/notifications/api/mechanic-registered", json=payload, timeout=timeout)
+
+    async def notify_order_registered(self, order_id: int, customer_name: str = "", timeout: Optional[float] = 10):
+        """اعلان ثبت سفارش جدید به پنل"""
+        payload = {"order_id": order_id, "customer_name": customer_name}
+        return await self.post("/notifications/api/order-registered", json=payload, timeout=timeout)
+
+    # --- /telegram-bot/api ---
+
+    async def list_orders(self, timeout: Optional[float] = None, retry: Optional[RetryPolicy] = None, **params):
+        """لیست سفارشات با فیلترهای telegram_id، status، limit و ..."""
+        return await self.get("/telegram-bot/api/orders", params=params, timeout=timeout, retry=retry)
+
+    async def get_order(self, order_id: int, timeout: Optional[float] = None, retry: Optional[RetryPolicy] = None):
+        """جزئیات یک سفارش"""
+        return await self.get(f"/telegram-bot/api/orders/{order_id}", timeout=timeout, retry=retry)
+
+    async def update_order_status(self, order_id: int, status: str, timeout: Optional[float] = 10):
+        """تغییر وضعیت سفارش (تنظیم وضعیت ذاتاً idempotent است)"""
+        return await self.put(
+            f"/telegram-bot/api/orders/{order_id}/status", json={"status": status}, timeout=timeout,
+            idempotency_key=f"order-{order_id}-status-{status}",
+        )
+
+    async def upload_receipt(self, order_id: int, file_data: bytes, filename: str, timeout: Optional[float] = 30):
+        """آپلود رسید پرداخت سفارش"""
+        form = aiohttp.FormData()
+        form.add_field("receipt_image", file_data, filename=filename, content_type="image/jpeg")
+        return await self.post(
+            f"/telegram-bot/api/orders/{order_id}/upload_receipt", data=form, timeout=timeout
+        )
+
+    async def create_bot_order(self, payload: Dict, timeout: Optional[float] = 10, idempotency_key: Optional[str] = None):
+        """ثبت سفارش با payload JSON (API قدیمی)"""
+        return await self.post("/telegram-bot/api/bot/orders", json=payload, timeout=timeout, idempotency_key=idempotency_key)
+
+    async def get_product_prices(self, product_names: list, timeout: Optional[float] = 10):
+        """دریافت قیمت محصولات (فقط‌خواندنی)"""
+        return await self.post(
+            "/telegram-bot/api/bot/products/prices", json={"products": product_names}, timeout=timeout, idempotent=True
+        )
+
+    # --- /api و /bot-orders/api ---
+
+    async def create_order(self, form: aiohttp.FormData, timeout: Optional[float] = 30):
+        """ثبت سفارش جدید به همراه عکس‌ها"""
+        return await self.post("/api/create_order", data=form, timeout=timeout)
+
+    async def confirm_order(self, order_id: int, telegram_id: int, timeout: Optional[float] = None):
+        """تایید نهایی سفارش توسط کاربر (کلید idempotency ثابت به ازای سفارش و کاربر)"""
+        return await self.post(
+            f"/bot-orders/api/order_status/{order_id}/confirm",
+            json={"telegram_id": telegram_id},
+            timeout=timeout,
+            idempotency_key=f"order-{order_id}-confirm-{telegram_id}",
+        )
+
+    async def cancel_order(self, order_id: int, telegram_id: int, timeout: Optional[float] = None):
+        """لغو نهایی سفارش توسط کاربر (کلید idempotency ثابت به ازای سفارش و کاربر)"""
+        return await self.post(
+            f"/bot-orders/api/order_status/{order_id}/cancel",
+            json={"telegram_id": telegram_id, "cancel": True},
+            timeout=timeout,
+            idempotency_key=f"order-{order_id}-cancel-{telegram_id}",
+        )
+
+    # --- درخواست‌های دسته‌ای ---
+
+    async def get_user_statuses_batch(self, telegram_ids: Iterable[int], timeout: Optional[float] = None,
+                                      retry: Optional[RetryPolicy] = None):
+        """
+        وضعیت چند کاربر با یک درخواست به /mechanics/api/user/status/batch
+        خروجی: {telegram_id: (کد وضعیت، بدنه)} با همان شکل پاسخ get_user_status
+        """
+        return await self._batch(
+            "user_status",
+            "/mechanics/api/user/status/batch",
+            "telegram_ids",
+            list(telegram_ids),
+            lambda item: (200, item),
+            lambda telegram_id: self.get_user_status(telegram_id, timeout=timeout, retry=retry),
+            timeout,
+            retry,
+        )
+
+    async def get_orders_batch(self, order_ids: Iterable[int], timeout: Optional[float] = None,
+                               retry: Optional[RetryPolicy] = None):
+        """
+        جزئیات چند سفارش با یک درخواست به /telegram-bot/api/orders/batch
+        خروجی: {order_id: (کد وضعیت، بدنه)} با همان شکل پاسخ get_order
+        """
+        return await self._batch(
+            "orders",
+            "/telegram-bot/api/orders/batch",
+            "order_ids",
+            list(order_ids),
+            lambda item: (200, {"success": True, "data": item}),
+            lambda order_id: self.get_order(order_id, timeout=timeout, retry=retry),
+            timeout,
+            retry,
+        )
+
+    async def _batch(self, kind, path, key, ids: List, wrap_item, single, timeout, retry=None):
+        """ارسال شناسه‌ها در دسته‌های batch_size تایی؛ در صورت نبود endpoint، درخواست‌های تکی همزمان"""
+        results: Dict[Any, Tuple[int, Optional[Dict]]] = {}
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return results
+
+        remaining = ids
+        if self.batch_supported[kind] is not False:
+            chunks = [ids[i:i + self.batch_size] for i in range(0, len(ids), self.batch_size)]
+            responses = await asyncio.gather(
+                *(self.post(path, json={key: chunk}, timeout=timeout, retry=retry, idempotent=True) for chunk in chunks),
+                return_exceptions=True,
+            )
+            remaining = []
+            for chunk, response in zip(chunks, responses):
+                if isinstance(response, BaseException):
+                    logger.warning(f"⚠️ خطا در درخواست دسته‌ای {path}: {response}")
+                    remaining.extend(chunk)
+                    continue
+                status_code, body = response
+                if status_code in (404, 405, 501):
+                    if self.batch_supported[kind] is not False:
+                        logger.info(f"ℹ️ پنل از {path} پشتیبانی نمی‌کند - استفاده از درخواست‌های تکی")
+                    self.batch_supported[kind] = False
+                    remaining.extend(chunk)
+                    continue
+                if status_code != 200 or not body or not body.get("success"):
+                    remaining.extend(chunk)
+                    continue
+                self.batch_supported[kind] = True
+                items = body.get("data") or {}
+                for item_id in chunk:
+                    item = items.get(str(item_id))
+                    results[item_id] = wrap_item(item) if item is not None else (404, {"success": False})
+
+        if remaining:
+            semaphore = asyncio.Semaphore(self.batch_fallback_concurrency)
+
+            async def fetch_one(item_id):
+                async with semaphore:
+                    try:
+                        results[item_id] = await single(item_id)
+                    except Exception as e:
+                        logger.debug(f"🔍 خطا در درخواست تکی {item_id}: {e}")
+
+            await asyncio.gather(*(fetch_one(item_id) for item_id in remaining))
+        return results
+
+
+# متغیر سراسری برای نگهداری کلاینت مشترک
+_panel_client: Optional[PanelClient] = None
+
+
+def init_panel_client(**kwargs) -> PanelClient:
+    """ساخت کلاینت مشترک پنل (در زمان راه‌اندازی ربات)"""
+    global _panel_client
+    _panel_client = PanelClient(**kwargs)
+    return _panel_client
+
+
+def get_panel_client() -> PanelClient:
+    """دریافت کلاینت مشترک پنل (در صورت نبود، ساخته می‌شود)"""
+    global _panel_client
+    if _panel_client is None:
+        _panel_client = PanelClient()
+    return _panel_client
+
+
+async def close_panel_client():
+    """بستن کلاینت مشترک پنل (در زمان خاموش شدن ربات)"""
+    global _panel_client
+    if _panel_client is not None:
+        await _panel_client.close()
+        _panel_client = None
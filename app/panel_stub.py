@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+پنل جایگزین محلی (aiohttp) برای توسعه و تست بدون پنل واقعی
+قرارداد endpoint های تکی و دسته‌ای وضعیت کاربر و سفارش را پیاده‌سازی می‌کند
+
+اجرا:
+    python -m app.panel_stub --port 5000
+سپس PANEL_API_BASE_URL=http://127.0.0.1:5000
+"""
+
+import argparse
+from typing import Dict, Optional
+
+from aiohttp import web
+
+
+def create_panel_stub_app(users: Optional[Dict] = None, orders: Optional[Dict] = None, batch: bool = True,
+                          cursor: bool = True) -> web.Application:
+    """
+    ساخت اپلیکیشن پنل جایگزین
+    users: {telegram_id: {'status': ..., 'role': ..., 'commission_percentage': ...}}
+    orders: {order_id: {'id': ..., 'status': ..., 'telegram_id': ..., ...}}
+    batch: اگر False باشد، endpoint های دسته‌ای 404 برمی‌گردانند (برای تست fallback)
+    cursor: اگر False باشد، پارامتر updated_since نادیده گرفته می‌شود (برای تست اسکن کامل)
+    """
+    app = web.Application()
+    app["users"] = {int(k): v for k, v in (users or {}).items()}
+    app["orders"] = {int(k): v for k, v in (orders or {}).items()}
+    app["batch"] = batch
+    app["cursor"] = cursor
+    # نسخه تغییر هر سفارش برای updated_since (شمارنده یکنواخت)
+    app["version"] = 0
+    for order in app["orders"].values():
+        app["version"] += 1
+        order.setdefault("updated_seq", app["version"])
+    app["request_count"] = 0
+
+    @web.middleware
+    async def count_requests(request, handler):
+        request.app["request_count"] += 1
+        return await handler(request)
+
+    app.middlewares.append(count_requests)
+
+    def user_body(telegram_id: int) -> Dict:
+        user = app["users"].get(telegram_id)
+        if user is None:
+            return {"success": False, "message": "User not found"}
+        return {"success": True, **user}
+
+    async def health(request):
+        return web.json_response({"status": "ok"})
+
+    async def user_status(request):
+        telegram_id = int(request.query.get("telegram_id", 0))
+        return web.json_response(user_body(telegram_id))
+
+    async def user_status_batch(request):
+        if not app["batch"]:
+            raise web.HTTPNotFound()
+        payload = await request.json()
+        data = {str(telegram_id): user_body(int(telegram_id)) for telegram_id in payload.get("telegram_ids", [])}
+        return web.json_response({"success": True, "data": data})
+
+    async def list_orders(request):
+        result = list(app["orders"].values())
+        if app["cursor"] and "updated_since" in request.query:
+            since = int(request.query["updated_since"] or 0)
+            limit = int(request.query.get("limit", 100))
+            changed = sorted((o for o in result if o["updated_seq"] > since), key=lambda o: o["updated_seq"])
+            page = changed[:limit]
+            next_cursor = str(page[-1]["updated_seq"]) if page else str(since)
+            return web.json_response({"success": True, "data": page, "next_cursor": next_cursor,
+                                      "has_more": len(changed) > limit})
+        if "telegram_id" in request.query:
+            telegram_id = int(request.query["telegram_id"])
+            result = [o for o in result if int(o.get("telegram_id", 0)) == telegram_id]
+        if "status" in request.query:
+            statuses = request.query["status"].split(",")
+            result = [o for o in result if o.get("status") in statuses]
+        offset = int(request.query.get("offset", 0))
+        if "limit" in request.query:
+            result = result[offset:offset + int(request.query["limit"])]
+        return web.json_response({"success": True, "data": result})
+
+    async def get_order(request):
+        order = app["orders"].get(int(request.match_info["order_id"]))
+        if order is None:
+            return web.json_response({"success": False, "message": "Order not found"}, status=404)
+        return web.json_response({"success": True, "data": order})
+
+    async def orders_batch(request):
+        if not app["batch"]:
+            raise web.HTTPNotFound()
+        payload = await request.json()
+        data = {}
+        for order_id in payload.get("order_ids", []):
+            order = app["orders"].get(int(order_id))
+            if order is not None:
+                data[str(order_id)] = order
+        return web.json_response({"success": True, "data": data})
+
+    async def update_order_status(request):
+        order = app["orders"].get(int(request.match_info["order_id"]))
+        if order is None:
+            return web.json_response({"success": False, "message": "Order not found"}, status=404)
+        payload = await request.json()
+        order["status"] = payload.get("status", order.get("status"))
+        app["version"] += 1
+        order["updated_seq"] = app["version"]
+        return web.json_response({"success": True})
+
+    app.router.add_get("/health", health)
+    app.router.add_get("/mechanics/api/user/status", user_status)
+    app.router.add_post("/mechanics/api/user/status/batch", user_status_batch)
+    app.router.add_get("/telegram-bot/api/orders", list_orders)
+    app.router.add_post("/telegram-bot/api/orders/batch", orders_batch)
+    app.router.add_get("/telegram-bot/api/orders/{order_id:\\d+}", get_order)
+    app.router.add_put("/telegram-bot/api/orders/{order_id:\\d+}/status", update_order_status)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="پنل جایگزین محلی")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--no-batch", action="store_true", help="غیرفعال کردن endpoint های دسته‌ای")
+    parser.add_argument("--no-cursor", action="store_true", help="غیرفعال کردن updated_since")
+    args = parser.parse_args()
+    web.run_app(create_panel_stub_app(batch=not args.no_batch, cursor=not args.no_cursor), host=args.host, port=args.port)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+سیاست واحد تلاش مجدد (retry)
+- کدهای وضعیت قابل تلاش مجدد
+- backoff نمایی با jitter کامل
+- بودجه زمانی کل (deadline) برای همه تلاش‌ها
+"""
+
+import random
+import time
+from typing import FrozenSet, Iterable, Optional
+
+# کدهای وضعیتی که نشان‌دهنده خطای موقت هستند
+DEFAULT_RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class RetryPolicy:
+    """
+    سیاست تلاش مجدد
+    max_attempts: حداکثر تعداد کل تلاش‌ها (شامل تلاش اول)
+    base_delay / max_delay: تاخیر پایه و سقف تاخیر backoff (ثانیه)
+    deadline: بودجه زمانی کل همه تلاش‌ها از شروع فراخوانی (None = بدون سقف)
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8,
+        deadline: Optional[float] = None,
+        retry_statuses: Iterable[int] = DEFAULT_RETRY_STATUSES,
+        jitter: bool = True,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retry_statuses: FrozenSet[int] = frozenset(retry_statuses)
+        self.jitter = jitter
+
+    def with_overrides(self, **overrides) -> "RetryPolicy":
+        """نسخه جدید سیاست با تغییر برخی پارامترها (برای تنظیم به ازای هر فراخوانی)"""
+        params = {
+            "max_attempts": self.max_attempts,
+            "base_delay": self.base_delay,
+            "max_delay": self.max_delay,
+            "deadline": self.deadline,
+            "retry_statuses": self.retry_statuses,
+            "jitter": self.jitter,
+        }
+        params.update(overrides)
+        return RetryPolicy(**params)
+
+    def backoff(self, attempt: int) -> float:
+        """تاخیر قبل از تلاش بعدی (attempt از 0 شروع می‌شود) با jitter کامل"""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def is_retryable_status(self, status_code: int) -> bool:
+        return status_code in self.retry_statuses
+
+    def start(self) -> "RetryBudget":
+        """شروع بودجه یک فراخوانی"""
+        return RetryBudget(self)
+
+    def __repr__(self):
+        return (
+            f"RetryPolicy(max_attempts={self.max_attempts}, base_delay={self.base_delay}, "
+            f"max_delay={self.max_delay}, deadline={self.deadline})"
+        )
+
+
+class RetryBudget:
+    """وضعیت تلاش‌های یک فراخوانی: تعداد تلاش و زمان باقی‌مانده"""
+
+    def __init__(self, policy: RetryPolicy):
+        self.policy = policy
+        self.attempt = 0
+        self.started_at = time.monotonic()
+
+    def remaining(self) -> Optional[float]:
+        """زمان باقی‌مانده از بودجه (None = بدون سقف)"""
+        if self.policy.deadline is None:
+            return None
+        return self.policy.deadline - (time.monotonic() - self.started_at)
+
+    def timeout_for(self, timeout: Optional[float]) -> Optional[float]:
+        """timeout تلاش فعلی: حداقل timeout درخواست و زمان باقی‌مانده"""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def next_delay(self, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        تاخیر تا تلاش بعدی یا None اگر تلاش دیگری مجاز نیست
+        retry_after: مقدار هدر Retry-After پنل (در صورت وجود بر backoff اولویت دارد)
+        """
+        self.attempt += 1
+        if self.attempt >= self.policy.max_attempts:
+            return None
+        delay = self.policy.backoff(self.attempt - 1)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        remaining = self.remaining()
+        # اگر پس از انتظار زمانی برای تلاش بعدی باقی نمی‌ماند، تلاش نکن
+        if remaining is not None and delay >= remaining:
+            return None
+        return delay
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+مقایسه زمان مسیریابی: زنجیره فیلترهای aiogram (روش قبلی) در برابر جدول مسیریابی (app/update_router.py)
+فقط انتخاب هندلر اندازه‌گیری می‌شود (هندلرها اجرا نمی‌شوند) و برای هر نمونه بررسی می‌شود که
+هر دو روش همان هندلر را انتخاب کنند
+
+اجرا:
+    python -m app.routing_benchmark --iterations 20000
+"""
+
+import os
+
+# بدون ایجاد پایگاه داده وضعیت
+os.environ.setdefault("STATE_BACKEND", "memory")
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, F
+from aiogram.filters import Command
+from aiogram.types import CallbackQuery, Chat, Document, Message, PhotoSize, User
+
+from app.update_router import UpdateRouter
+from app.handlers.receipt_handlers import (
+    get_receipt_waiting_state, receipt_document_handler, receipt_photo_handler, receipt_text_handler,
+    register_receipt_handlers, set_receipt_waiting_state,
+)
+from app.state_manager import mechanic_order_userinfo, mechanic_states
+from app.models import OrderDraft, RegistrationDraft, RegistrationStep
+from handlers import auth_handlers as auth
+from handlers import order_handlers as orders
+from handlers.support_handlers import register_support_handlers, simple_support_handler
+
+# کاربران نمونه: بدون وضعیت، در حال ثبت‌نام، در حال ثبت سفارش، در انتظار رسید
+GUEST, REGISTERING, ORDERING, RECEIPT = 1001, 1002, 1003, 1004
+
+
+def build_legacy_dispatcher() -> Dispatcher:
+    """زنجیره فیلترهای قبلی (همان ترتیب و همان lambdaها)"""
+    dp = Dispatcher()
+    menu = ["📝 ثبت سفارش", "📦 سفارشات من", "📞 پشتیبانی"]
+    dp.message.register(auth.start_handler, Command("start"))
+    dp.message.register(auth.status_check_handler, F.text == "⏳ وضعیت ثبت‌نام")
+    dp.message.register(auth.mechanic_register_start, F.text == "👨‍🔧 ثبت‌نام مکانیک")
+    dp.message.register(auth.customer_register_start, F.text == "👤 ثبت‌نام مشتری")
+    dp.message.register(simple_support_handler, F.text == "📞 پشتیبانی")
+    dp.message.register(auth.mechanic_register_process, lambda m: m and hasattr(m, 'from_user') and m.from_user and hasattr(m.from_user, 'id') and m.from_user.id in mechanic_states and ((hasattr(m, 'text') and m.text and not m.text.startswith("/") and m.text not in menu) or (hasattr(m, 'photo') and m.photo)))
+    dp.message.register(auth.customer_register_process, lambda m: m and hasattr(m, 'from_user') and m.from_user and hasattr(m.from_user, 'id') and m.from_user.id in auth.customer_register_states and hasattr(m, 'text') and m.text and not m.text.startswith("/") and m.text not in menu)
+    dp.message.register(auth.approve_handler, Command("approve"))
+    dp.message.register(auth.reject_handler, Command("reject"))
+    dp.message.register(orders.mechanic_menu_handler, lambda message: message.text in ["📝 ثبت سفارش", "📦 سفارشات من", "👤 پروفایل من", "📞 پشتیبانی"])
+    dp.message.register(orders.customer_menu_handler, lambda message: message.text in menu)
+    dp.message.register(orders.mechanic_order_text_handler, lambda message: (message.from_user.id in mechanic_order_userinfo or message.from_user.id in orders.customer_order_userinfo) and not message.photo)
+    dp.message.register(orders.mechanic_order_photo_handler, lambda message: (message.from_user.id in mechanic_order_userinfo or message.from_user.id in orders.customer_order_userinfo) and message.photo)
+    dp.callback_query.register(orders.order_callback_handler, lambda c: c.data and any(c.data.startswith(prefix) for prefix in ["photo_", "add_item_", "finish_order_"]))
+    dp.callback_query.register(orders.final_order_callback_handler, lambda c: c.data and (c.data.startswith("final_confirm_") or c.data.startswith("final_cancel_")))
+    dp.callback_query.register(orders.order_final_callback_handler, lambda c: c.data.startswith("order_final_confirm_") or c.data.startswith("order_final_cancel_"))
+    dp.callback_query.register(orders.payment_callback_handler, lambda c: c.data.startswith("confirm_payment_") or c.data.startswith("cancel_order_"))
+    dp.message.register(simple_support_handler, F.text == "📞 پشتیبانی")
+    dp.message.register(receipt_photo_handler, lambda message: message.photo is not None and get_receipt_waiting_state(message.from_user.id) is not None)
+    dp.message.register(receipt_text_handler, lambda message: message.text and get_receipt_waiting_state(message.from_user.id) is not None)
+    dp.message.register(receipt_document_handler, lambda message: message.document and get_receipt_waiting_state(message.from_user.id) is not None)
+    return dp
+
+
+def build_router() -> UpdateRouter:
+    """جدول مسیریابی با همان توابع ثبت main.py"""
+    router = UpdateRouter()
+    auth.register_auth_handlers(router)
+    orders.register_order_handlers(router)
+    register_support_handlers(router)
+    register_receipt_handlers(router)
+    return router
+
+
+def _message(user_id: int, text: str = None, photo: bool = False, document: bool = False) -> Message:
+    return Message(
+        message_id=1, date=datetime.now(), chat=Chat(id=user_id, type='private'),
+        from_user=User(id=user_id, is_bot=False, first_name='bench'), text=text,
+        photo=[PhotoSize(file_id='p', file_unique_id='p', width=1, height=1)] if photo else None,
+        document=Document(file_id='d', file_unique_id='d') if document else None,
+    )
+
+
+def _callback(user_id: int, data: str) -> CallbackQuery:
+    return CallbackQuery(id='1', from_user=User(id=user_id, is_bot=False, first_name='bench'),
+                         chat_instance='1', data=data)
+
+
+def build_samples():
+    messages = [
+        ('menu: ثبت سفارش', _message(GUEST, "📝 ثبت سفارش")),
+        ('menu: پشتیبانی', _message(GUEST, "📞 پشتیبانی")),
+        ('menu: وضعیت ثبت‌نام', _message(GUEST, "⏳ وضعیت ثبت‌نام")),
+        ('command: /start', _message(GUEST, "/start")),
+        ('command: /approve', _message(GUEST, "/approve 12")),
+        ('registration text', _message(REGISTERING, "علی رضایی")),
+        ('registration photo', _message(REGISTERING, photo=True)),
+        ('order draft text', _message(ORDERING, "لنت ترمز")),
+        ('order draft photo', _message(ORDERING, photo=True)),
+        ('receipt document', _message(RECEIPT, document=True)),
+        ('unhandled text', _message(GUEST, "سلام")),
+    ]
+    callbacks = [
+        ('callback: photo_yes_', _callback(ORDERING, "photo_yes_1003")),
+        ('callback: final_confirm_', _callback(ORDERING, "final_confirm_1003")),
+        ('callback: cancel_order_', _callback(GUEST, "cancel_order_77")),
+    ]
+    return messages, callbacks
+
+
+async def legacy_resolve(observer, event, bot):
+    """انتخاب هندلر مانند TelegramEventObserver.trigger (بدون اجرای هندلر)"""
+    for handler in observer.handlers:
+        result, _ = await handler.check(event, bot=bot)
+        if result:
+            return handler.callback
+    return None
+
+
+async def run(iterations: int):
+    mechanic_states[REGISTERING] = RegistrationDraft(RegistrationStep.FULL_NAME)
+    mechanic_order_userinfo[ORDERING] = OrderDraft()
+    set_receipt_waiting_state(RECEIPT, 77)
+
+    bot = Bot(token="123456:BENCHMARK")
+    legacy = build_legacy_dispatcher()
+    router = build_router()
+    messages, callbacks = build_samples()
+
+    print(f"{'نمونه':<26}{'زنجیره فیلتر (µs)':>20}{'جدول (µs)':>14}{'نسبت':>8}")
+    totals = [0.0, 0.0]
+    for label, event in messages + callbacks:
+        is_message = isinstance(event, Message)
+        observer = legacy.message if is_message else legacy.callback_query
+
+        async def via_router():
+            if is_message:
+                route, _ = await router.resolve_message(event, bot)
+            else:
+                route = router.resolve_callback(event)
+            return route.handler if route else None
+
+        expected, actual = await legacy_resolve(observer, event, bot), await via_router()
+        assert expected is actual, f"{label}: {getattr(expected, '__name__', None)} != {getattr(actual, '__name__', None)}"
+
+        timings = []
+        for resolve in (lambda: legacy_resolve(observer, event, bot), via_router):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                await resolve()
+            timings.append((time.perf_counter() - start) / iterations * 1e6)
+        totals[0] += timings[0]
+        totals[1] += timings[1]
+        print(f"{label:<26}{timings[0]:>20.2f}{timings[1]:>14.2f}{timings[0] / timings[1]:>7.1f}x")
+    print(f"{'مجموع':<26}{totals[0]:>20.2f}{totals[1]:>14.2f}{totals[0] / totals[1]:>7.1f}x")
+    await bot.session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="مقایسه زمان مسیریابی پیام‌ها")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+زمان‌بند اولویت‌دار برای polling
+هر موجودیت (سفارش یا کاربر) زمان بررسی بعدی خودش را دارد و در یک heap نگهداری می‌شود
+"""
+
+import heapq
+import itertools
+import time
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class PollScheduler:
+    """
+    heap زمان‌بندی با حذف تنبل (lazy deletion)
+    کلید هر موجودیت مثلاً ('order', 123) یا ('user', 456) است و meta اطلاعات دلخواه آن است
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._entries: Dict[Hashable, Dict[str, Any]] = {}
+        self._seq = itertools.count()
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key) -> Optional[Dict[str, Any]]:
+        """اطلاعات (meta) یک موجودیت"""
+        entry = self._entries.get(key)
+        return entry["meta"] if entry else None
+
+    def add(self, key, delay: float = 0, **meta) -> bool:
+        """افزودن موجودیت جدید (اگر از قبل وجود داشته باشد کاری انجام نمی‌شود)"""
+        if key in self._entries:
+            return False
+        self._entries[key] = {"due": None, "paused": False, "meta": meta}
+        self.schedule(key, delay)
+        return True
+
+    def schedule(self, key, delay: float, **meta):
+        """تنظیم زمان بررسی بعدی (delay ثانیه از الان)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = {"due": None, "paused": False, "meta": {}}
+        entry["meta"].update(meta)
+        if entry["paused"]:
+            return
+        entry["due"] = time.monotonic() + max(delay, 0)
+        heapq.heappush(self._heap, (entry["due"], next(self._seq), key))
+
+    def remove(self, key):
+        """حذف کامل موجودیت از زمان‌بند"""
+        self._entries.pop(key, None)
+
+    def pause(self, key):
+        """توقف بررسی موجودیت (اطلاعات آن حفظ می‌شود)"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry["paused"] = True
+            entry["due"] = None
+
+    def resume(self, key, delay: float = 0) -> bool:
+        """ادامه بررسی موجودیت متوقف شده"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        entry["paused"] = False
+        self.schedule(key, delay)
+        return True
+
+    def is_paused(self, key) -> bool:
+        entry = self._entries.get(key)
+        return bool(entry and entry["paused"])
+
+    def _discard_stale(self):
+        """حذف آیتم‌های قدیمی (حذف شده یا زمان‌بندی مجدد شده) از سر heap"""
+        while self._heap:
+            due, _, key = self._heap[0]
+            entry = self._entries.get(key)
+            if entry is not None and entry["due"] == due:
+                return
+            heapq.heappop(self._heap)
+
+    def pop_due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[Tuple[Hashable, Dict[str, Any]]]:
+        """
+        برداشتن موجودیت‌هایی که زمان بررسی‌شان رسیده (به ترتیب زمان)
+        موجودیت برداشته شده تا زمان schedule یا remove بعدی در heap نیست
+        """
+        now = time.monotonic() if now is None else now
+        due_items = []
+        while limit is None or len(due_items) < limit:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            _, _, key = heapq.heappop(self._heap)
+            entry = self._entries[key]
+            entry["due"] = None
+            due_items.append((key, entry["meta"]))
+        return due_items
+
+    def next_due_in(self, now: Optional[float] = None) -> Optional[float]:
+        """تعداد ثانیه تا نزدیک‌ترین بررسی (None اگر چیزی زمان‌بندی نشده)"""
+        self._discard_stale()
+        if not self._heap:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(self._heap[0][0] - now, 0)
+
+    def count(self, kind: str) -> int:
+        """تعداد موجودیت‌های یک نوع (بر اساس عضو اول کلید)"""
+        return sum(1 for key in self._entries if isinstance(key, tuple) and key[0] == kind)
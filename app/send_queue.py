@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+صف مرکزی ارسال پیام‌های ربات (اطلاع‌رسانی‌های polling، webhook پنل و پیگیری سفارشات)
+- محدودیت سراسری با token bucket (پیش‌فرض 30 پیام در ثانیه)
+- فاصله حداقل بین دو پیام به یک چت (پیش‌فرض 1 ثانیه)؛ پیام‌های هر چت به ترتیب ثبت ارسال می‌شوند
+- خطای 429 (TelegramRetryAfter): همان پیام پس از retry_after ثانیه دوباره ارسال می‌شود و
+  پیام‌های بعدی آن چت پشت آن منتظر می‌مانند
+- هر ارسال یک Future برمی‌گرداند: نتیجه متد تلگرام (مثلاً Message) یا خطای آن
+"""
+
+import asyncio
+import collections
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from config import BotConfig
+
+# تنظیم لاگر
+logger = logging.getLogger(__name__)
+
+
+class _TokenBucket:
+    """token bucket با نرخ rate در ثانیه و ظرفیت burst"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """زمان باقی‌مانده تا در دسترس بودن یک token"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class _SendJob:
+    """یک درخواست ارسال در صف"""
+
+    __slots__ = ('bot', 'method', 'future', 'enqueued_at', 'attempts')
+
+    def __init__(self, bot, method, future: asyncio.Future):
+        self.bot = bot
+        self.method = method
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+
+
+class _ChatQueue:
+    """صف پیام‌های یک چت و زمان مجاز ارسال بعدی"""
+
+    __slots__ = ('jobs', 'next_at', 'busy')
+
+    def __init__(self):
+        self.jobs: Deque[_SendJob] = collections.deque()
+        self.next_at = 0.0
+        self.busy = False
+
+
+class SendQueue:
+    """صف ارسال با محدودیت سراسری و هر چت (یک worker برای زمان‌بندی، ارسال‌ها همزمان)"""
+
+    def __init__(self, rate: float = None, chat_interval: float = None, max_retries: int = None,
+                 burst: float = None):
+        self.rate = rate if rate is not None else BotConfig.SEND_RATE_LIMIT
+        self.chat_interval = chat_interval if chat_interval is not None else BotConfig.SEND_CHAT_INTERVAL
+        self.max_retries = max_retries if max_retries is not None else BotConfig.SEND_MAX_RETRIES
+        self._bucket = _TokenBucket(self.rate, burst if burst is not None else max(1.0, self.rate / 6))
+        self._chats: Dict[int, _ChatQueue] = {}
+        self._ready: List[Tuple[float, int, int]] = []  # heap: (زمان مجاز، ترتیب، chat_id)
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight = set()
+        self.depth = 0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self._latencies: Deque[float] = collections.deque(maxlen=500)
+
+    # --- ثبت ارسال ---
+
+    def send(self, bot, method) -> asyncio.Future:
+        """ثبت یک متد تلگرام دارای chat_id (SendMessage، SendPhoto و ...) در صف"""
+        future = asyncio.get_running_loop().create_future()
+        chat_id = int(method.chat_id)
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _ChatQueue()
+        chat.jobs.append(_SendJob(bot, method, future))
+        self.depth += 1
+        if len(chat.jobs) == 1 and not chat.busy:
+            self._schedule(chat_id, chat)
+        self._ensure_worker()
+        return future
+
+    def send_message(self, bot, chat_id: int, text: str, **kwargs) -> asyncio.Future:
+        """ثبت ارسال پیام متنی (پارامترها مانند bot.send_message)"""
+        return self.send(bot, SendMessage(chat_id=chat_id, text=text, **kwargs))
+
+    def _schedule(self, chat_id: int, chat: _ChatQueue):
+        heapq.heappush(self._ready, (chat.next_at, next(self._seq), chat_id))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    # --- worker ---
+
+    async def _run(self):
+        """انتخاب چت آماده بعدی و شروع ارسال آن پس از دریافت token سراسری"""
+        while True:
+            self._wakeup.clear()
+            if not self._ready:
+                await self._wakeup.wait()
+                continue
+            now = time.monotonic()
+            wait = max(self._ready[0][0] - now, self._bucket.wait_time(now))
+            if wait > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, chat_id = heapq.heappop(self._ready)
+            chat = self._chats.get(chat_id)
+            if chat is None or not chat.jobs or chat.busy:
+                continue
+            job = chat.jobs[0]
+            if job.future.done():
+                # فراخواننده ارسال را لغو کرده است
+                self._finish(chat_id, chat)
+                continue
+            self._bucket.take(now)
+            chat.busy = True
+            task = asyncio.create_task(self._deliver(chat_id, chat, job))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _deliver(self, chat_id: int, chat: _ChatQueue, job: _SendJob):
+        started = time.monotonic()
+        job.attempts += 1
+        try:
+            result = await job.bot(job.method)
+        except TelegramRetryAfter as e:
+            chat.busy = False
+            if job.attempts <= self.max_retries:
+                self.retried += 1
+                chat.next_at = time.monotonic() + e.retry_after
+                logger.warning(f"⏳ محدودیت ارسال تلگرام برای چت {chat_id}: تلاش مجدد پس از {e.retry_after} ثانیه")
+                self._schedule(chat_id, chat)
+                return
+            self._fail(chat_id, chat, job, e)
+            return
+        except Exception as e:
+            chat.busy = False
+            chat.next_at = started + self.chat_interval
+            self._fail(chat_id, chat, job, e)
+            return
+        chat.busy = False
+        chat.next_at = started + self.chat_interval
+        self.sent += 1
+        self._latencies.append(time.monotonic() - job.enqueued_at)
+        if not job.future.done():
+            job.future.set_result(result)
+        self._finish(chat_id, chat)
+
+    def _fail(self, chat_id: int, chat: _ChatQueue, job: _SendJob, error: Exception):
+        self.failed += 1
+        logger.error(f"❌ خطا در ارسال پیام به چت {chat_id}: {error}")
+        if not job.future.done():
+            job.future.set_exception(error)
+        self._finish(chat_id, chat)
+
+    def _finish(self, chat_id: int, chat: _ChatQueue):
+        """حذف پیام ارسال شده از سر صف چت و زمان‌بندی پیام بعدی یا حذف صف خالی"""
+        chat.jobs.popleft()
+        self.depth -= 1
+        if chat.jobs:
+            self._schedule(chat_id, chat)
+        else:
+            # صف خالی پس از پایان فاصله چت حذف می‌شود
+            delay = max(0.0, chat.next_at - time.monotonic())
+            asyncio.get_running_loop().call_later(delay, self._evict, chat_id)
+
+    def _evict(self, chat_id: int):
+        chat = self._chats.get(chat_id)
+        if chat is not None and not chat.jobs and not chat.busy and chat.next_at <= time.monotonic():
+            del self._chats[chat_id]
+
+    # --- مدیریت ---
+
+    async def drain(self, timeout: float = None) -> bool:
+        """انتظار برای ارسال همه پیام‌های صف (False در صورت گذشت timeout)"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self.depth:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    async def close(self, timeout: float = 5.0):
+        """ارسال پیام‌های باقی‌مانده (حداکثر timeout ثانیه) و توقف worker"""
+        if not await self.drain(timeout):
+            logger.warning(f"⚠️ {self.depth} پیام در صف ارسال باقی ماند")
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    def stats(self) -> Dict[str, Any]:
+        """عمق صف، چت‌های منتظر، تعداد ارسال/خطا/429 و تاخیر ارسال (ثبت تا تحویل، ثانیه)"""
+        latencies = sorted(self._latencies)
+        return {
+            'depth': self.depth,
+            'chats': sum(1 for chat in self._chats.values() if chat.jobs),
+            'in_flight': len(self._inflight),
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+            'latency_avg': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            'latency_p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3) if latencies else 0.0,
+            'latency_max': round(latencies[-1], 3) if latencies else 0.0,
+        }
+
+
+# نمونه سراسری
+_send_queue: Optional[SendQueue] = None
+
+
+def init_send_queue(**kwargs) -> SendQueue:
+    """ایجاد نمونه سراسری صف ارسال"""
+    global _send_queue
+    if _send_queue is None:
+        _send_queue = SendQueue(**kwargs)
+    return _send_queue
+
+
+def get_send_queue() -> SendQueue:
+    """دریافت نمونه سراسری صف ارسال"""
+    return init_send_queue()
+
+
+async def close_send_queue(timeout: float = 5.0):
+    """ارسال پیام‌های باقی‌مانده و توقف صف سراسری"""
+    global _send_queue
+    if _send_queue is not None:
+        await _send_queue.close(timeout)
+        _send_queue = None
@@ -17,56 +17,210 @@ async def clear_user_state(user_id, storage):
 
 # توابع state دیگر (مثلاً get_mechanic_state و ...) بعداً اضافه می‌شوند 
 
-# متغیرهای حافظه
-mechanic_order_userinfo = {}
-customer_order_userinfo = {}
+# جداول وضعیت: دیکشنری در حافظه با ذخیره دسته‌ای در store پایدار (app/state_store.py)
+# پس از راه‌اندازی مجدد، سفارش‌ها و ثبت‌نام‌های نیمه‌کاره از دست نمی‌روند
+from app.state_store import StateTable
+from app.models import OrderDraft, RegistrationDraft, UserStatus
+from config import BotConfig
+
 user_db = {}
-user_statuses = {}
+# وضعیت کاربران (منبع واحد برای user_status.py) با ایندکس بر اساس status
+user_statuses = StateTable('user_statuses', index_field='status', model=UserStatus)
 
-# وضعیت مکانیک‌ها (در حافظه)
-mechanic_states = {}
+# وضعیت ثبت‌نام مکانیک‌ها
+mechanic_states = StateTable('mechanic_states', model=RegistrationDraft)
 
 # --- سفارش‌گذاری مکانیک و مشتری (بازنویسی شده) ---
-mechanic_order_userinfo = {}
-customer_order_userinfo = {}
+# پیش‌نویس‌ها حداکثر یک بار در هر بازه autosave ذخیره می‌شوند و پیش‌نویس‌های در حال تکمیل
+# پس از راه‌اندازی مجدد با اولین پیام کاربر بازیابی می‌شوند
+mechanic_order_userinfo = StateTable('mechanic_orders', index_field='status', model=OrderDraft,
+                                     flush_delay=BotConfig.ORDER_DRAFT_AUTOSAVE_DELAY, lazy=True)
+customer_order_userinfo = StateTable('customer_orders', index_field='status', model=OrderDraft,
+                                     flush_delay=BotConfig.ORDER_DRAFT_AUTOSAVE_DELAY, lazy=True)
+
+# ایندکس وضعیت و شناسه سفارش روی پیش‌نویس‌ها (برای polling)
+from app.order_registry import OrderDraftRegistry
+order_drafts = OrderDraftRegistry((mechanic_order_userinfo, customer_order_userinfo))
 
 # --- پشتیبانی و ثبت‌نام مشتری ---
-support_states = {}
-customer_register_states = {}
-customer_order_states = {}
+support_states = StateTable('support_states')
+customer_register_states = StateTable('customer_register_states', model=RegistrationDraft)
+customer_order_states = StateTable('customer_order_states')
 
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
+from collections import OrderedDict
+import asyncio
 import aiohttp
 import os
-import json
+import time
+from config import BotConfig
+
+# --- کش وضعیت کاربران پنل (TTL + LRU با single-flight) ---
+
+class UserStatusCache:
+    """
+    کش پاسخ endpoint وضعیت کاربر
+    - هر ورودی پس از ttl ثانیه منقضی می‌شود و حداکثر maxsize ورودی نگه داشته می‌شود (LRU)
+    - درخواست‌های همزمان برای یک کاربر یک درخواست مشترک به پنل می‌فرستند
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (expires_at, (status_code, data))
+        self._inflight = {}  # user_id -> asyncio.Task
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale_hits = 0
+
+    def get(self, user_id: int, allow_stale: bool = False):
+        """
+        دریافت پاسخ کش شده (در صورت انقضا None)
+        allow_stale: پاسخ منقضی هم برگردانده شود (برای زمان در دسترس نبودن پنل)
+        """
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic() and not allow_stale:
+            # ورودی منقضی تا زمان حذف LRU به عنوان داده پشتیبان نگه داشته می‌شود
+            return None
+        self._entries.move_to_end(user_id)
+        return value
+
+    def put(self, user_id: int, value):
+        """ذخیره پاسخ در کش"""
+        self._entries[user_id] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def update(self, user_id: int, **fields):
+        """به‌روزرسانی فیلدهای یک ورودی موجود (مثلاً پس از تغییر وضعیت)"""
+        value = self.get(user_id)
+        if value is None:
+            return
+        status_code, data = value
+        self.put(user_id, (status_code, {**(data or {}), **fields}))
+
+    def invalidate(self, user_id: int):
+        """حذف ورودی کاربر از کش"""
+        self._entries.pop(user_id, None)
+
+    async def fetch(self, user_id: int, loader, force: bool = False):
+        """دریافت از کش یا بارگذاری از پنل (یک درخواست مشترک برای فراخوانی‌های همزمان)"""
+        if not force:
+            value = self.get(user_id)
+            if value is not None:
+                self.hits += 1
+                return value
+
+        task = self._inflight.get(user_id)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(user_id, loader))
+            self._inflight[user_id] = task
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _load(self, user_id: int, loader):
+        try:
+            value = await loader()
+            status_code, _ = value
+            if status_code == 200:
+                self.put(user_id, value)
+            return value
+        finally:
+            self._inflight.pop(user_id, None)
+
+    def stats(self):
+        """آمار کش"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'stale_hits': self.stale_hits,
+            'size': len(self._entries),
+            'inflight': len(self._inflight),
+        }
+
+user_status_cache = UserStatusCache(
+    maxsize=BotConfig.USER_STATUS_CACHE_SIZE,
+    ttl=BotConfig.USER_STATUS_CACHE_TTL,
+)
+
+async def fetch_user_status(user_id: int, force: bool = False, timeout: float = None, retry=None):
+    """
+    دریافت وضعیت کاربر از endpoint /mechanics/api/user/status از طریق کش
+    خروجی: (کد وضعیت HTTP، بدنه JSON یا None)
+    retry: سیاست تلاش مجدد (پیش‌فرض: سیاست کوتاه کلاینت برای هندلرها)
+    """
+    from app.panel_client import get_panel_client, PanelUnavailableError
+    try:
+        return await user_status_cache.fetch(
+            user_id,
+            lambda: get_panel_client().get_user_status(user_id, timeout=timeout, retry=retry),
+            force=force,
+        )
+    except PanelUnavailableError:
+        # مدار باز است: استفاده از آخرین پاسخ کش شده (حتی منقضی) در صورت وجود
+        stale = user_status_cache.get(user_id, allow_stale=True)
+        if stale is None:
+            raise
+        user_status_cache.stale_hits += 1
+        import logging
+        logging.debug(f"🔌 پنل در دسترس نیست - استفاده از وضعیت کش شده کاربر {user_id}")
+        return stale
+
+async def prefetch_user_statuses(user_ids, timeout: float = None, retry=None):
+    """
+    بارگذاری دسته‌ای وضعیت کاربرانی که در کش نیستند (یک درخواست به ازای هر دسته)
+    خروجی: تعداد کاربرانی که در کش قرار گرفتند
+    """
+    from app.panel_client import get_panel_client
+    missing = [user_id for user_id in user_ids if user_status_cache.get(user_id) is None]
+    if not missing:
+        return 0
+    results = await get_panel_client().get_user_statuses_batch(missing, timeout=timeout, retry=retry)
+    stored = 0
+    for user_id, value in results.items():
+        if value[0] == 200:
+            user_status_cache.put(user_id, value)
+            stored += 1
+    return stored
+
+def invalidate_user_status_cache(user_id: int):
+    """حذف وضعیت کش شده کاربر (مثلاً پس از اطلاع‌رسانی webhook)"""
+    user_status_cache.invalidate(user_id)
+
+def get_user_status_cache_stats():
+    """آمار کش وضعیت کاربران"""
+    return user_status_cache.stats()
 
 # وضعیت کاربر را از حافظه دریافت کن
 
 def get_user_status(user_id: int):
-    """دریافت وضعیت کاربر"""
-    return user_statuses.get(user_id)
+    """دریافت وضعیت کاربر (خواندن به عنوان فعالیت کاربر برای پاکسازی ثبت می‌شود)"""
+    status = user_statuses.peek(user_id)
+    if status is not None:
+        user_statuses.touch(user_id)
+    return status
 
 async def check_user_status_from_server(user_id: int):
     """بررسی وضعیت کاربر از سرور"""
     try:
-        import os
-        import aiohttp
-        
-        PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
-        
         # استفاده از endpoint جدید که هم مکانیک و هم مشتری را بررسی می‌کند
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{PANEL_API_BASE_URL}/mechanics/api/user/status?telegram_id={user_id}") as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    if data.get('success'):
-                        status_data = {
-                            'status': data.get('status'),
-                            'role': data.get('role')  # mechanic یا customer
-                        }
-                        # ذخیره در حافظه
-                        set_user_status(user_id, data.get('role'), data.get('status'))
-                        return status_data
+        status_code, data = await fetch_user_status(user_id)
+        if status_code == 200 and data and data.get('success'):
+            status_data = {
+                'status': data.get('status'),
+                'role': data.get('role')  # mechanic یا customer
+            }
+            # ذخیره در حافظه
+            set_user_status(user_id, data.get('role'), data.get('status'))
+            return status_data
                         
         return None
         
@@ -77,129 +231,55 @@ async def check_user_status_from_server(user_id: int):
 
 def set_user_status(user_id: int, role: str, status: str):
     """تنظیم وضعیت کاربر با role و status جداگانه"""
-    status_data = {
-        'role': role,
-        'status': status
-    }
+    status_data = UserStatus(role, status, str(int(time.time())))
     user_statuses[user_id] = status_data
+    # هماهنگ نگه داشتن کش پاسخ پنل با وضعیت جدید
+    user_status_cache.update(user_id, role=role, status=status)
     import logging
     logging.info(f"[STATE] Set user {user_id} status: {status_data}")
 
 def clear_user_status(user_id: int):
     """پاک کردن وضعیت کاربر از حافظه"""
+    user_status_cache.invalidate(user_id)
     if user_id in user_statuses:
         del user_statuses[user_id]
         import logging
         logging.info(f"[STATE] Cleared user {user_id} status")
 
 def get_pending_users():
-    """دریافت لیست کاربران با وضعیت pending"""
-    pending_users = []
-    for user_id, data in user_statuses.items():
-        if data.get('status') == 'pending':
-            pending_users.append(user_id)
-    return pending_users
+    """دریافت لیست کاربران با وضعیت pending (از ایندکس وضعیت، بدون پیمایش همه کاربران)"""
+    return list(user_statuses.keys_by('pending'))
 
 def get_pending_orders():
-    """دریافت لیست سفارشات در انتظار بررسی (فقط سفارشات غیر پرداخت شده)"""
-    pending_orders = []
-    
-    # بررسی سفارشات مکانیک
-    for user_id, order_data in mechanic_order_userinfo.items():
-        status = order_data.get('status')
-        # فقط سفارش‌هایی که هنوز در انتظار هستند (نه پرداخت شده)
-        if status and status not in ['completed', 'پرداخت شده', 'payment_confirmed']:
-            order_id = order_data.get('order_id')
-            if order_id:
-                pending_orders.append((order_id, user_id))
-    
-    # بررسی سفارشات مشتری
-    for user_id, order_data in customer_order_userinfo.items():
-        status = order_data.get('status')
-        # فقط سفارش‌هایی که هنوز در انتظار هستند (نه پرداخت شده)
-        if status and status not in ['completed', 'پرداخت شده', 'payment_confirmed']:
-            order_id = order_data.get('order_id')
-            if order_id:
-                pending_orders.append((order_id, user_id))
-    
-    return pending_orders
+    """
+    دریافت سفارشات در انتظار بررسی (فقط سفارشات غیر پرداخت شده): [(order_id, user_id)]
+    نمای زنده از ایندکس پیش‌نویس‌ها؛ بدون پیمایش همه پیش‌نویس‌ها
+    """
+    return order_drafts.pending()
 
 def set_order_status(user_id: int, order_id: int, status: str):
-    """تنظیم وضعیت سفارش"""
-    # بررسی در سفارشات مکانیک
-    if user_id in mechanic_order_userinfo:
-        mechanic_order_userinfo[user_id]['status'] = status
-        mechanic_order_userinfo[user_id]['order_id'] = order_id
-        
-        # اگر سفارش پرداخت شده یا تکمیل شده، آن را از لیست pending حذف کن
-        if status in ['completed', 'پرداخت شده', 'payment_confirmed']:
-            # حذف از mechanic_order_userinfo
-            if user_id in mechanic_order_userinfo:
-                del mechanic_order_userinfo[user_id]
-    
-    # بررسی در سفارشات مشتری
-    if user_id in customer_order_userinfo:
-        customer_order_userinfo[user_id]['status'] = status
-        customer_order_userinfo[user_id]['order_id'] = order_id
-        
-        # اگر سفارش پرداخت شده یا تکمیل شده، آن را از لیست pending حذف کن
-        if status in ['completed', 'پرداخت شده', 'payment_confirmed']:
-            # حذف از customer_order_userinfo
-            if user_id in customer_order_userinfo:
-                del customer_order_userinfo[user_id]
+    """تنظیم وضعیت سفارش (در وضعیت پرداخت شده/تکمیل شده پیش‌نویس حذف می‌شود)"""
+    order_drafts.set_status(user_id, order_id, status)
 
 def clear_completed_orders():
     """پاک کردن سفارش‌های تکمیل شده از حافظه"""
-    # پاک کردن سفارشات مکانیک که تکمیل شده‌اند
-    completed_mechanic_users = []
-    for user_id, order_data in mechanic_order_userinfo.items():
-        status = order_data.get('status')
-        if status in ['completed', 'پرداخت شده', 'payment_confirmed']:
-            completed_mechanic_users.append(user_id)
-    
-    for user_id in completed_mechanic_users:
-        del mechanic_order_userinfo[user_id]
-    
-    # پاک کردن سفارشات مشتری که تکمیل شده‌اند
-    completed_customer_users = []
-    for user_id, order_data in customer_order_userinfo.items():
-        status = order_data.get('status')
-        if status in ['completed', 'پرداخت شده', 'payment_confirmed']:
-            completed_customer_users.append(user_id)
-    
-    for user_id in completed_customer_users:
-        del customer_order_userinfo[user_id]
-    
-    return len(completed_mechanic_users) + len(completed_customer_users)
+    return order_drafts.clear_terminal()
 
 def clear_user_order_state(user_id: int):
     """پاک کردن وضعیت سفارش کاربر از حافظه"""
-    # پاک کردن از سفارشات مکانیک
-    if user_id in mechanic_order_userinfo:
-        del mechanic_order_userinfo[user_id]
-    
-    # پاک کردن از سفارشات مشتری
-    if user_id in customer_order_userinfo:
-        del customer_order_userinfo[user_id]
+    order_drafts.clear_user(user_id)
     
     import logging
     logging.info(f"[STATE] Cleared order state for user {user_id}")
 
 # منوی داینامیک بر اساس وضعیت کاربر
+MECHANIC_STATE_FILE = os.path.join(os.path.dirname(__file__), 'mechanic_state.json')
+
 def get_mechanic_state_local(user_id: int):
-    """دریافت وضعیت محلی مکانیک از فایل JSON"""
+    """دریافت وضعیت محلی مکانیک از فایل JSON (فایل فقط پس از تغییر دوباره parse می‌شود)"""
     try:
-        import json
-        import os
-        
-        state_file = os.path.join(os.path.dirname(__file__), 'mechanic_state.json')
-        
-        if not os.path.exists(state_file):
-            return None
-            
-        with open(state_file, 'r', encoding='utf-8') as f:
-            states = json.load(f)
-            
+        from app.file_cache import read_json_file
+        states = read_json_file(MECHANIC_STATE_FILE, default={})
         return states.get(str(user_id))
         
     except Exception as e:
@@ -233,101 +313,72 @@ async def get_dynamic_menu(user_id: int):
     )
 
 import os
-import json
 
 RECEIPT_STATE_FILE = os.path.join(os.path.dirname(__file__), 'receipt_state.json')
 
+# وضعیت انتظار رسید (کلید: شناسه کاربر به صورت رشته)
+receipt_states = StateTable('receipt_state', key_type=str)
+
+def _import_legacy_receipt_states():
+    """انتقال یک باره receipt_state.json قدیمی به store"""
+    if receipt_states:
+        return
+    try:
+        from app.file_cache import read_json_file
+        data = read_json_file(RECEIPT_STATE_FILE)
+        for user_id, state in (data or {}).items():
+            receipt_states[str(user_id)] = state
+    except Exception as e:
+        import logging
+        logging.error(f"[STATE] Error importing legacy receipt states: {e}")
+
+_import_legacy_receipt_states()
+
 def get_receipt_state(user_id):
-    """دریافت وضعیت انتظار رسید کاربر از فایل"""
-    if not os.path.exists(RECEIPT_STATE_FILE):
-        return None
-    with open(RECEIPT_STATE_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    return data.get(str(user_id))
+    """دریافت وضعیت انتظار رسید کاربر (از حافظه)"""
+    return receipt_states.peek(str(user_id))
 
 def set_receipt_state(user_id, order_id):
-    """تنظیم وضعیت انتظار رسید برای کاربر در فایل"""
-    data = {}
-    if os.path.exists(RECEIPT_STATE_FILE):
-        with open(RECEIPT_STATE_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    data[str(user_id)] = {
+    """تنظیم وضعیت انتظار رسید برای کاربر"""
+    receipt_states[str(user_id)] = {
         'order_id': order_id,
         'state': 'await_receipt',
         'waiting_for_receipt': True
     }
-    with open(RECEIPT_STATE_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
 
 def clear_receipt_state(user_id):
-    """پاک کردن وضعیت انتظار رسید کاربر از فایل"""
-    if not os.path.exists(RECEIPT_STATE_FILE):
-        return
-    with open(RECEIPT_STATE_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    if str(user_id) in data:
-        del data[str(user_id)]
-        with open(RECEIPT_STATE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    """پاک کردن وضعیت انتظار رسید کاربر"""
+    receipt_states.pop(str(user_id), None)
+
+def get_receipt_waiting_orders():
+    """سفارش‌های در انتظار رسید: [(order_id, user_id)]"""
+    return [
+        (state.get('order_id'), int(user_id))
+        for user_id, state in receipt_states.items()
+        if state.get('order_id') and state.get('waiting_for_receipt')
+    ]
 
 # --- مدیریت سفارشات پرداخت شده ---
-NOTIFIED_ORDERS_FILE = os.path.join(os.path.dirname(__file__), 'notified_orders.json')
+# دفتر مشترک webhook و polling (مجموعه در حافظه + log فقط-افزودنی در app/notified_ledger.py)
 
 def is_order_payment_notified(order_id):
     """بررسی اینکه آیا سفارش قبلاً پرداخت شده اطلاع‌رسانی شده"""
-    if not os.path.exists(NOTIFIED_ORDERS_FILE):
-        return False
-    
-    try:
-        with open(NOTIFIED_ORDERS_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return str(order_id) in data.get('notified_orders', [])
-    except Exception as e:
-        import logging
-        logging.error(f"Error checking notified orders: {e}")
-        return False
+    from app.notified_ledger import get_notified_ledger
+    return get_notified_ledger().contains(order_id)
 
 def mark_order_payment_notified(order_id):
-    """علامت‌گذاری سفارش به عنوان پرداخت شده اطلاع‌رسانی شده"""
-    data = {'notified_orders': []}
-    
-    if os.path.exists(NOTIFIED_ORDERS_FILE):
-        try:
-            with open(NOTIFIED_ORDERS_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except Exception:
-            data = {'notified_orders': []}
-    
-    if 'notified_orders' not in data:
-        data['notified_orders'] = []
-    
-    if str(order_id) not in data['notified_orders']:
-        data['notified_orders'].append(str(order_id))
-        
-        # نگه داشتن فقط 1000 سفارش اخیر برای جلوگیری از بزرگ شدن فایل
-        if len(data['notified_orders']) > 1000:
-            data['notified_orders'] = data['notified_orders'][-1000:]
-        
-        try:
-            with open(NOTIFIED_ORDERS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
-            import logging
-            logging.info(f"✅ سفارش {order_id} به عنوان پرداخت شده اطلاع‌رسانی شده علامت‌گذاری شد")
-        except Exception as e:
-            import logging
-            logging.error(f"Error marking order as notified: {e}")
+    """
+    علامت‌گذاری سفارش به عنوان پرداخت شده اطلاع‌رسانی شده
+    خروجی: True اگر سفارش برای اولین بار علامت‌گذاری شد
+    """
+    from app.notified_ledger import get_notified_ledger
+    added = get_notified_ledger().add(order_id)
+    if added:
+        import logging
+        logging.info(f"✅ سفارش {order_id} به عنوان پرداخت شده اطلاع‌رسانی شده علامت‌گذاری شد")
+    return added
 
 def get_notified_orders():
     """دریافت لیست سفارشات اطلاع‌رسانی شده"""
-    if not os.path.exists(NOTIFIED_ORDERS_FILE):
-        return []
-    
-    try:
-        with open(NOTIFIED_ORDERS_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data.get('notified_orders', [])
-    except Exception as e:
-        import logging
-        logging.error(f"Error getting notified orders: {e}")
-        return []
\ No newline at end of file
+    from app.notified_ledger import get_notified_ledger
+    return get_notified_ledger().order_ids()
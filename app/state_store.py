@@ -0,0 +1,635 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ذخیره‌سازی پایدار وضعیت ربات
+- StateStore: رابط ذخیره‌سازی با یک جدول برای هر نوع وضعیت (کلید، وضعیت ایندکس شده، مقدار JSON)
+- MemoryStateStore: پیاده‌سازی در حافظه (بدون ماندگاری، برای توسعه و اسکریپت‌ها)
+- SQLiteStateStore: SQLite در حالت WAL؛ همه کوئری‌ها در یک thread اختصاصی اجرا می‌شوند
+- StateTable: دیکشنری در حافظه برای هندلرها که تغییراتش به صورت دسته‌ای (یک تراکنش) در store ذخیره می‌شود
+  (با lazy=True رکوردهای بدون وضعیت فقط هنگام اولین مراجعه هر کاربر از store خوانده می‌شوند؛
+  برای updateها پیش از اجرای هندلرها با preload_state_key به صورت غیرهمزمان)
+"""
+
+import asyncio
+import atexit
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from collections.abc import KeysView, MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import BotConfig
+
+# تنظیم لاگر
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_DB_FILE = os.path.join(os.path.dirname(__file__), 'bot_state.db')
+
+# رکورد ذخیره شده: (مقدار JSON، وضعیت برای ایندکس)
+Record = Tuple[str, Optional[str]]
+
+_KIND_PATTERN = re.compile(r'^[a-z_]+$')
+
+_MISSING = object()
+
+
+# فاصله حداقل به‌روزرسانی زمان آخرین فعالیت ذخیره شده با touch() (ثانیه)
+TOUCH_PERSIST_INTERVAL = 3600
+
+# مقادیری که درجا تغییر نمی‌کنند (خواندن آن‌ها کلید را تغییر یافته علامت نمی‌زند)
+_IMMUTABLE_TYPES = (str, int, float, bool, tuple, type(None))
+
+
+def field_value(value: Any, name: str):
+    """مقدار یک فیلد از dict یا مدل (dataclass)"""
+    if isinstance(value, dict):
+        return value.get(name)
+    return getattr(value, name, None)
+
+
+def encode_record(value: Any) -> Record:
+    """
+    تبدیل مقدار به رکورد قابل ذخیره (کپی کامل مقدار در لحظه فراخوانی)
+    مدل‌ها (app/models.py) با to_record به لیست فشرده تبدیل می‌شوند
+    """
+    status = field_value(value, 'status')
+    payload = value.to_record() if hasattr(value, 'to_record') else value
+    return (json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=str),
+            str(status) if status is not None else None)
+
+
+class StateStore:
+    """رابط ذخیره‌سازی وضعیت (یک جدول برای هر نوع وضعیت)"""
+
+    def load_entries(self, kind: str, with_status_only: bool = False) -> Dict[str, Tuple[Any, float]]:
+        """
+        رکوردهای یک نوع: {key: (value, زمان آخرین ذخیره)} (همزمان، فقط در شروع برنامه)
+        with_status_only: فقط رکوردهایی که وضعیت (فیلد ایندکس شده) دارند
+        """
+        raise NotImplementedError
+
+    def load_times(self, kind: str) -> Dict[str, float]:
+        """زمان آخرین ذخیره همه کلیدها بدون خواندن مقادیر: {key: updated_at}"""
+        raise NotImplementedError
+
+    def get_sync(self, kind: str, key: str) -> Optional[Any]:
+        """خواندن همزمان یک رکورد با کلید اصلی"""
+        raise NotImplementedError
+
+    def apply_sync(self, kind: str, puts: Dict[str, Record], deletes: Iterable[str] = ()):
+        """ذخیره و حذف دسته‌ای در یک تراکنش (همزمان)"""
+        raise NotImplementedError
+
+    async def apply(self, kind: str, puts: Dict[str, Record], deletes: Iterable[str] = ()):
+        """ذخیره و حذف دسته‌ای در یک تراکنش"""
+        raise NotImplementedError
+
+    async def get(self, kind: str, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def keys_by_status(self, kind: str, status: str) -> List[str]:
+        """کلیدهای دارای یک وضعیت (با استفاده از ایندکس وضعیت)"""
+        raise NotImplementedError
+
+    async def count(self, kind: str) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryStateStore(StateStore):
+    """ذخیره‌سازی در حافظه"""
+
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, Record]] = {}
+        self.updated_at: Dict[str, Dict[str, float]] = {}
+        self.transactions = 0
+
+    def _table(self, kind: str) -> Dict[str, Record]:
+        return self.tables.setdefault(kind, {})
+
+    def load_entries(self, kind: str, with_status_only: bool = False) -> Dict[str, Tuple[Any, float]]:
+        times = self.updated_at.get(kind, {})
+        return {
+            key: (json.loads(value), times.get(key, 0))
+            for key, (value, status) in self._table(kind).items()
+            if status is not None or not with_status_only
+        }
+
+    def load_times(self, kind: str) -> Dict[str, float]:
+        times = self.updated_at.get(kind, {})
+        return {key: times.get(key, 0) for key in self._table(kind)}
+
+    def get_sync(self, kind: str, key: str) -> Optional[Any]:
+        record = self._table(kind).get(key)
+        return json.loads(record[0]) if record else None
+
+    def apply_sync(self, kind: str, puts: Dict[str, Record], deletes: Iterable[str] = ()):
+        table = self._table(kind)
+        times = self.updated_at.setdefault(kind, {})
+        now = time.time()
+        table.update(puts)
+        times.update((key, now) for key in puts)
+        for key in deletes:
+            table.pop(key, None)
+            times.pop(key, None)
+        self.transactions += 1
+
+    async def apply(self, kind: str, puts: Dict[str, Record], deletes: Iterable[str] = ()):
+        self.apply_sync(kind, puts, deletes)
+
+    async def get(self, kind: str, key: str) -> Optional[Any]:
+        return self.get_sync(kind, key)
+
+    async def keys_by_status(self, kind: str, status: str) -> List[str]:
+        return [key for key, (_, record_status) in self._table(kind).items() if record_status == status]
+
+    async def count(self, kind: str) -> int:
+        return len(self._table(kind))
+
+
+class SQLiteStateStore(StateStore):
+    """
+    ذخیره‌سازی SQLite در حالت WAL
+    اتصال فقط در یک thread اختصاصی استفاده می‌شود تا کوئری‌ها event loop را مسدود نکنند
+    """
+
+    def __init__(self, path: str = DEFAULT_STATE_DB_FILE):
+        self.path = path
+        self.transactions = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._tables = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='state-store')
+        self._call(self._open)
+
+    # --- اجرای کوئری‌ها در thread اختصاصی ---
+
+    def _call(self, fn, *args):
+        """اجرای همزمان در thread اختصاصی"""
+        try:
+            future = self._executor.submit(fn, *args)
+        except RuntimeError:
+            # هنگام خروج مفسر thread اختصاصی پیش از atexit متوقف شده؛ اجرا در thread فعلی
+            return fn(*args)
+        return future.result()
+
+    async def _run(self, fn, *args):
+        """اجرای غیرهمزمان در thread اختصاصی"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        logger.info(f"🗄️ پایگاه داده وضعیت: {self.path}")
+
+    def _ensure_table(self, kind: str) -> str:
+        if not _KIND_PATTERN.match(kind):
+            raise ValueError(f"invalid state kind: {kind}")
+        table = f"state_{kind}"
+        if kind not in self._tables:
+            with self._conn:
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "key TEXT PRIMARY KEY, status TEXT, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+                )
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_status ON {table} (status)")
+            self._tables.add(kind)
+        return table
+
+    # --- عملیات (در thread اختصاصی) ---
+
+    def _load_entries(self, kind: str, with_status_only: bool = False) -> Dict[str, Tuple[Any, float]]:
+        table = self._ensure_table(kind)
+        where = " WHERE status IS NOT NULL" if with_status_only else ""
+        rows = self._conn.execute(f"SELECT key, value, updated_at FROM {table}{where}").fetchall()
+        return {key: (json.loads(value), updated_at) for key, value, updated_at in rows}
+
+    def _load_times(self, kind: str) -> Dict[str, float]:
+        table = self._ensure_table(kind)
+        return dict(self._conn.execute(f"SELECT key, updated_at FROM {table}").fetchall())
+
+    def _apply(self, kind: str, puts: Dict[str, Record], deletes: List[str]):
+        table = self._ensure_table(kind)
+        now = time.time()
+        with self._conn:
+            if puts:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO {table} (key, status, value, updated_at) VALUES (?, ?, ?, ?)",
+                    [(key, status, value, now) for key, (value, status) in puts.items()],
+                )
+            if deletes:
+                self._conn.executemany(f"DELETE FROM {table} WHERE key = ?", [(key,) for key in deletes])
+        self.transactions += 1
+
+    def _get(self, kind: str, key: str):
+        table = self._ensure_table(kind)
+        row = self._conn.execute(f"SELECT value FROM {table} WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _keys_by_status(self, kind: str, status: str) -> List[str]:
+        table = self._ensure_table(kind)
+        return [row[0] for row in self._conn.execute(f"SELECT key FROM {table} WHERE status = ?", (status,))]
+
+    def _count(self, kind: str) -> int:
+        table = self._ensure_table(kind)
+        return self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # --- رابط StateStore ---
+
+    def load_entries(self, kind: str, with_status_only: bool = False) -> Dict[str, Tuple[Any, float]]:
+        return self._call(self._load_entries, kind, with_status_only)
+
+    def load_times(self, kind: str) -> Dict[str, float]:
+        return self._call(self._load_times, kind)
+
+    def get_sync(self, kind: str, key: str) -> Optional[Any]:
+        return self._call(self._get, kind, key)
+
+    def apply_sync(self, kind: str, puts: Dict[str, Record], deletes: Iterable[str] = ()):
+        self._call(self._apply, kind, puts, list(deletes))
+
+    async def apply(self, kind: str, puts: Dict[str, Record], deletes: Iterable[str] = ()):
+        await self._run(self._apply, kind, puts, list(deletes))
+
+    async def get(self, kind: str, key: str) -> Optional[Any]:
+        return await self._run(self._get, kind, key)
+
+    async def keys_by_status(self, kind: str, status: str) -> List[str]:
+        return await self._run(self._keys_by_status, kind, status)
+
+    async def count(self, kind: str) -> int:
+        return await self._run(self._count, kind)
+
+    def close(self):
+        if self._conn is not None:
+            self._call(self._close)
+        self._executor.shutdown(wait=True)
+
+
+class StateTable(MutableMapping):
+    """
+    دیکشنری وضعیت یک نوع (مثلاً سفارش‌های در حال ثبت مکانیک‌ها) با ذخیره دسته‌ای در store
+    - خواندن‌ها از حافظه انجام می‌شوند (بدون I/O در هندلرها)
+    - کلیدهای تنظیم/حذف شده و کلیدهایی که با [] یا get() خوانده شده‌اند (و ممکن است مقدارشان
+      درجا تغییر کرده باشد) پس از flush_delay ثانیه در یک تراکنش ذخیره می‌شوند
+    - پیمایش با items()/values() و خواندن با peek() کلیدها را تغییر یافته علامت نمی‌زند
+    - touch(): ثبت فعالیت کلید هنگام خواندن (مثلاً وضعیت کاربر فعال) بدون تغییر مقدار
+    - زمان آخرین فعالیت هر کلید (با زمان ذخیره در store پس از راه‌اندازی مجدد حفظ می‌شود)
+    - index_field: ایندکس ثانویه روی یک فیلد مقدار (مثلاً status)؛ کلیدهای علامت‌خورده
+      در اولین جستجوی بعدی دوباره ایندکس می‌شوند (بدون پیمایش کل جدول)
+    - add_listener: اطلاع از کلیدهای تغییر یافته در refresh_index() (با یا بدون index_field)
+    - lazy: در شروع فقط رکوردهای دارای وضعیت بارگذاری می‌شوند؛ بقیه (مثلاً پیش‌نویس در حال تکمیل)
+      با preload() به صورت غیرهمزمان (پیش از هندلرهای update کاربر) یا در غیر این صورت با اولین
+      دسترسی به کلید با یک خواندن همزمان کلید اصلی بازیابی می‌شوند (in و len بدون I/O)؛
+      items()/values() فقط مقادیر بارگذاری شده را برمی‌گردانند
+    """
+
+    def __init__(self, kind: str, key_type=int, store: StateStore = None, flush_delay: float = None,
+                 index_field: Optional[str] = None, model=None, lazy: bool = False):
+        self.kind = kind
+        self.key_type = key_type
+        self.model = model  # کلاس مدل با from_record برای بازسازی مقادیر (None = dict ساده)
+        self.flush_delay = flush_delay if flush_delay is not None else BotConfig.STATE_FLUSH_DELAY
+        self.index_field = index_field
+        self.lazy = lazy
+        self.flushes = 0
+        self.restored = 0
+        self._data: Dict[Any, Any] = {}
+        self._unloaded = set()  # کلیدهای موجود در store که هنوز خوانده نشده‌اند (lazy)
+        self._dirty = set()
+        self._scheduled = False
+        self._pending: List[asyncio.Future] = []
+        self._index: Dict[Any, set] = {}  # {مقدار فیلد: کلیدها}
+        self._index_of: Dict[Any, Any] = {}  # {کلید: مقدار فیلد ایندکس شده}
+        self._stale_index = set()  # کلیدهایی که باید دوباره ایندکس شوند
+        self._listeners = []  # فراخوانی‌ها پس از ایندکس مجدد هر کلید: fn(key, value یا None)
+        self._touched: Dict[Any, float] = {}  # زمان آخرین فعالیت (تنظیم یا خواندن برای تغییر) هر کلید
+        self.store = store or get_state_store()
+        self.reload()
+        _tables.append(self)
+
+    def reload(self):
+        """بارگذاری رکوردها از store (زمان آخرین فعالیت = زمان آخرین ذخیره)"""
+        entries = self.store.load_entries(self.kind, with_status_only=self.lazy)
+        self._data = {self.key_type(key): self._decode(value) for key, (value, _) in entries.items()}
+        if self.lazy:
+            times = self.store.load_times(self.kind)
+            self._touched = {self.key_type(key): updated_at for key, updated_at in times.items()}
+            self._unloaded = set(self._touched) - set(self._data)
+        else:
+            self._touched = {self.key_type(key): updated_at for key, (_, updated_at) in entries.items()}
+            self._unloaded = set()
+        self._index, self._index_of = {}, {}
+        self._stale_index = set(self._data) if self.index_field else set()
+
+    def _decode(self, record):
+        return self.model.from_record(record) if self.model else record
+
+    def _restore(self, key):
+        """بازیابی همزمان یک کلید بارگذاری نشده از store (خارج از updateها؛ فقط یک بار برای هر کلید)"""
+        self._unloaded.discard(key)
+        try:
+            record = self.store.get_sync(self.kind, str(key))
+        except Exception as e:
+            logger.error(f"❌ خطا در بازیابی وضعیت {self.kind} برای {key}: {e}")
+            self._touched.pop(key, None)
+            return
+        self._install(key, record)
+
+    async def preload(self, key):
+        """بازیابی غیرهمزمان کلید بارگذاری نشده (بدون مسدود کردن event loop)"""
+        key = self.key_type(key)
+        if key not in self._unloaded:
+            return
+        try:
+            record = await self.store.get(self.kind, str(key))
+        except Exception as e:
+            logger.error(f"❌ خطا در بازیابی وضعیت {self.kind} برای {key}: {e}")
+            return
+        # کلید ممکن است در حین خواندن تنظیم یا حذف شده باشد
+        if key in self._unloaded:
+            self._unloaded.discard(key)
+            self._install(key, record)
+
+    def _install(self, key, record):
+        """ثبت رکورد بازیابی شده در حافظه (None = کلید دیگر در store وجود ندارد)"""
+        if record is None:
+            self._touched.pop(key, None)
+            return
+        self._data[key] = self._decode(record)
+        self.restored += 1
+        if self.index_field or self._listeners:
+            self._stale_index.add(key)
+        logger.debug(f"♻️ وضعیت {self.kind} برای {key} از store بازیابی شد")
+
+    # --- رابط dict ---
+
+    def __getitem__(self, key):
+        if key in self._unloaded:
+            self._restore(key)
+        value = self._data[key]
+        if not isinstance(value, _IMMUTABLE_TYPES):
+            self._mark(key)
+        return value
+
+    def get(self, key, default=None):
+        if key in self._data or key in self._unloaded:
+            try:
+                return self[key]
+            except KeyError:
+                return default
+        return default
+
+    def peek(self, key, default=None):
+        """خواندن بدون علامت‌گذاری برای ذخیره (برای فراخوانی‌هایی که مقدار را تغییر نمی‌دهند)"""
+        if key in self._unloaded:
+            self._restore(key)
+        return self._data.get(key, default)
+
+    def __setitem__(self, key, value):
+        self._unloaded.discard(key)
+        self._data[key] = value
+        self._mark(key)
+
+    def __delitem__(self, key):
+        if key in self._unloaded:
+            # حذف بدون خواندن مقدار از store
+            self._unloaded.discard(key)
+        else:
+            del self._data[key]
+        self._mark(key)
+
+    def discard(self, key):
+        """حذف کلید در صورت وجود (بدون خواندن مقدار بارگذاری نشده از store)"""
+        if key in self._data or key in self._unloaded:
+            del self[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._data or key in self._unloaded
+
+    def __iter__(self):
+        yield from self._data
+        yield from self._unloaded
+
+    def __len__(self) -> int:
+        return len(self._data) + len(self._unloaded)
+
+    def items(self):
+        return self._data.items()
+
+    def values(self):
+        return self._data.values()
+
+    def keys(self):
+        return KeysView(self) if self._unloaded else self._data.keys()
+
+    def __repr__(self):
+        return f"StateTable({self.kind!r}, {self._data!r})"
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._dirty)
+
+    # --- ایندکس ثانویه ---
+
+    def _reindex(self, key):
+        if self.index_field:
+            self._update_index(key)
+        for listener in self._listeners:
+            listener(key, self._data.get(key))
+
+    def _update_index(self, key):
+        old_value = self._index_of.pop(key, _MISSING)
+        if old_value is not _MISSING:
+            bucket = self._index.get(old_value)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._index[old_value]
+        if key in self._data:
+            value = self._data[key]
+            indexed = field_value(value, self.index_field)
+            self._index_of[key] = indexed
+            self._index.setdefault(indexed, set()).add(key)
+
+    def add_listener(self, listener):
+        """ثبت فراخوانی برای کلیدهای تغییر یافته (در refresh_index؛ کلیدهای موجود اعلام نمی‌شوند)"""
+        self._listeners.append(listener)
+
+    def refresh_index(self):
+        """ایندکس مجدد کلیدهای تغییر یافته (و اطلاع به listenerها)"""
+        if self._stale_index:
+            stale, self._stale_index = self._stale_index, set()
+            for key in stale:
+                self._reindex(key)
+
+    def keys_by(self, value) -> set:
+        """کلیدهایی که فیلد ایندکس شده‌شان برابر value است"""
+        self.refresh_index()
+        return set(self._index.get(value, ()))
+
+    def count_by(self, value) -> int:
+        self.refresh_index()
+        return len(self._index.get(value, ()))
+
+    def index_counts(self) -> Dict[Any, int]:
+        """تعداد کلیدها به ازای هر مقدار فیلد ایندکس شده"""
+        self.refresh_index()
+        return {value: len(keys) for value, keys in self._index.items()}
+
+    # --- زمان آخرین فعالیت ---
+
+    def last_activity(self, key) -> Optional[float]:
+        return self._touched.get(key)
+
+    def touch(self, key):
+        """
+        ثبت فعالیت کلید بدون تغییر مقدار (تا پاکسازی کلید فعال را حذف نکند)
+        زمان ذخیره شده در store حداکثر هر TOUCH_PERSIST_INTERVAL ثانیه یک بار به‌روز می‌شود
+        """
+        if key not in self._data:
+            return
+        now = time.time()
+        if now - self._touched.get(key, 0) >= TOUCH_PERSIST_INTERVAL:
+            self._mark(key)
+        else:
+            self._touched[key] = now
+
+    def idle_keys(self, ttl: float, now: float = None) -> List[Any]:
+        """کلیدهایی که بیش از ttl ثانیه فعالیتی نداشته‌اند"""
+        cutoff = (time.time() if now is None else now) - ttl
+        return [key for key, touched in self._touched.items() if touched < cutoff]
+
+    def _mark(self, key):
+        self._dirty.add(key)
+        if key in self._data:
+            self._touched[key] = time.time()
+        else:
+            self._touched.pop(key, None)
+        if self.index_field or self._listeners:
+            self._stale_index.add(key)
+        self._schedule_flush()
+
+    # --- ذخیره دسته‌ای ---
+
+    def _schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # بدون event loop (اسکریپت‌ها) ذخیره بلافاصله انجام می‌شود
+            self.flush()
+            return
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_later(self.flush_delay, self._start_flush)
+
+    def _take_batch(self) -> Tuple[Dict[str, Record], List[str]]:
+        """snapshot تغییرات (در thread event loop تا مقادیر در حین ذخیره تغییر نکنند)"""
+        puts, deletes = {}, []
+        for key in self._dirty:
+            if key in self._data:
+                puts[str(key)] = encode_record(self._data[key])
+            else:
+                deletes.append(str(key))
+        self._dirty = set()
+        return puts, deletes
+
+    def _start_flush(self):
+        self._scheduled = False
+        if not self._dirty:
+            return
+        batch = self._take_batch()
+        future = asyncio.ensure_future(self._apply(batch))
+        self._pending.append(future)
+        future.add_done_callback(self._pending.remove)
+
+    async def _apply(self, batch):
+        puts, deletes = batch
+        try:
+            await self.store.apply(self.kind, puts, deletes)
+            self.flushes += 1
+        except Exception as e:
+            logger.error(f"❌ خطا در ذخیره وضعیت {self.kind}: {e}")
+            # تلاش مجدد در ذخیره بعدی
+            for key in list(puts) + deletes:
+                self._dirty.add(self.key_type(key))
+
+    def flush(self):
+        """ذخیره همزمان تغییرات باقی‌مانده"""
+        if not self._dirty:
+            return
+        puts, deletes = self._take_batch()
+        try:
+            self.store.apply_sync(self.kind, puts, deletes)
+            self.flushes += 1
+        except Exception as e:
+            logger.error(f"❌ خطا در ذخیره وضعیت {self.kind}: {e}")
+
+    async def aclose(self):
+        """انتظار برای ذخیره‌های در حال اجرا و ذخیره تغییرات باقی‌مانده"""
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+        if self._dirty:
+            await self._apply(self._take_batch())
+
+
+# نمونه سراسری store و جداول ثبت شده
+_state_store: Optional[StateStore] = None
+_tables: List[StateTable] = []
+
+
+def create_state_store(backend: str = None, path: str = None) -> StateStore:
+    """ایجاد store بر اساس تنظیمات (sqlite یا memory)"""
+    backend = (backend or BotConfig.STATE_BACKEND).lower()
+    if backend == 'memory':
+        return MemoryStateStore()
+    return SQLiteStateStore(path or BotConfig.STATE_DB_PATH or DEFAULT_STATE_DB_FILE)
+
+
+def get_state_store() -> StateStore:
+    """دریافت نمونه سراسری store"""
+    global _state_store
+    if _state_store is None:
+        _state_store = create_state_store()
+        atexit.register(_close_sync)
+    return _state_store
+
+
+async def preload_state_key(key):
+    """بازیابی غیرهمزمان وضعیت‌های بارگذاری نشده یک کلید (مثلاً کاربر) در همه جداول lazy"""
+    for table in _tables:
+        if table.lazy:
+            await table.preload(key)
+
+
+def flush_state_tables():
+    """ذخیره همزمان تغییرات همه جداول"""
+    for table in _tables:
+        table.flush()
+
+
+def _close_sync():
+    global _state_store
+    if _state_store is None:
+        return
+    flush_state_tables()
+    _state_store.close()
+    _state_store = None
+
+
+async def close_state_store():
+    """ذخیره تغییرات باقی‌مانده همه جداول و بستن store (هنگام خاموش شدن)"""
+    for table in _tables:
+        await table.aclose()
+    _close_sync()
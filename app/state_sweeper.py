@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+پاکسازی دوره‌ای وضعیت‌های رها شده (ثبت‌نام، پیش‌نویس سفارش، پشتیبانی و ...)
+- هر نوع وضعیت TTL جداگانه دارد (بر اساس زمان آخرین فعالیت کاربر)
+- پس از پاکسازی، listenerها (مثلاً سیستم polling) از کاربران حذف شده مطلع می‌شوند
+"""
+
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+from config import BotConfig
+from app.state_store import StateTable
+
+# تنظیم لاگر
+logger = logging.getLogger(__name__)
+
+
+class StateSweeper:
+    """حذف کلیدهایی از جداول وضعیت که بیش از TTL فعالیتی نداشته‌اند"""
+
+    def __init__(self, interval: float = None):
+        self.interval = interval if interval is not None else BotConfig.STATE_SWEEP_INTERVAL
+        self.rules: List[Dict] = []  # [{'table', 'ttl', 'keep'}]
+        self.listeners: List[Callable] = []  # fn(kind, keys)
+        self.is_running = False
+        self.total_swept = 0
+        self.last_sweep_stats: Dict[str, int] = {}
+
+    def add_rule(self, table: StateTable, ttl: float, keep: Optional[Callable] = None):
+        """
+        ثبت TTL برای یک جدول (ttl <= 0 یعنی بدون انقضا)
+        keep(key, value): اگر True برگرداند، کلید حتی پس از TTL حفظ می‌شود
+        """
+        if ttl and ttl > 0:
+            self.rules.append({'table': table, 'ttl': ttl, 'keep': keep})
+
+    def add_listener(self, listener: Callable):
+        """ثبت فراخوانی پس از حذف کلیدها: listener(kind, keys)"""
+        self.listeners.append(listener)
+
+    def sweep_once(self, now: float = None) -> Dict[str, int]:
+        """یک دور پاکسازی؛ خروجی: تعداد حذف شده به ازای هر نوع وضعیت"""
+        now = time.time() if now is None else now
+        stats = {}
+        for rule in self.rules:
+            table, keep = rule['table'], rule['keep']
+            expired = [
+                key for key in table.idle_keys(rule['ttl'], now)
+                if not (keep and keep(key, table.peek(key)))
+            ]
+            if not expired:
+                continue
+            for key in expired:
+                table.discard(key)
+            table.refresh_index()
+            stats[table.kind] = len(expired)
+            for listener in self.listeners:
+                try:
+                    listener(table.kind, expired)
+                except Exception as e:
+                    logger.error(f"❌ خطا در اطلاع‌رسانی پاکسازی {table.kind}: {e}")
+        self.last_sweep_stats = stats
+        if stats:
+            self.total_swept += sum(stats.values())
+            logger.info(f"🧹 پاکسازی وضعیت‌های رها شده: {stats}")
+        return stats
+
+    async def run(self):
+        """حلقه پاکسازی دوره‌ای"""
+        self.is_running = True
+        logger.info(f"🧹 پاکسازی وضعیت‌ها شروع شد (هر {self.interval} ثانیه، {len(self.rules)} نوع وضعیت)")
+        while self.is_running:
+            try:
+                self.sweep_once()
+            except Exception as e:
+                logger.error(f"❌ خطا در پاکسازی وضعیت‌ها: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stop(self):
+        self.is_running = False
+
+    def stats(self) -> Dict:
+        """آمار پاکسازی و اندازه فعلی جداول"""
+        return {
+            'total_swept': self.total_swept,
+            'last_sweep': self.last_sweep_stats,
+            'sizes': {rule['table'].kind: len(rule['table']) for rule in self.rules},
+        }
+
+
+# نمونه سراسری
+_state_sweeper: Optional[StateSweeper] = None
+
+
+def init_state_sweeper(**kwargs) -> StateSweeper:
+    """ایجاد نمونه سراسری با TTL تنظیم شده برای جداول state_manager"""
+    global _state_sweeper
+    if _state_sweeper is None:
+        from app import state_manager as sm
+        sweeper = StateSweeper(**kwargs)
+        # ثبت‌نام نیمه‌کاره
+        sweeper.add_rule(sm.mechanic_states, BotConfig.STATE_TTL_REGISTRATION)
+        sweeper.add_rule(sm.customer_register_states, BotConfig.STATE_TTL_REGISTRATION)
+        # پیش‌نویس سفارش رها شده
+        sweeper.add_rule(sm.mechanic_order_userinfo, BotConfig.STATE_TTL_ORDER_DRAFT)
+        sweeper.add_rule(sm.customer_order_userinfo, BotConfig.STATE_TTL_ORDER_DRAFT)
+        sweeper.add_rule(sm.customer_order_states, BotConfig.STATE_TTL_ORDER_DRAFT)
+        # پشتیبانی
+        sweeper.add_rule(sm.support_states, BotConfig.STATE_TTL_SUPPORT)
+        # وضعیت کاربران غیرفعال (کاربران pending تا تعیین وضعیت حفظ می‌شوند)
+        sweeper.add_rule(
+            sm.user_statuses, BotConfig.STATE_TTL_USER_STATUS,
+            keep=lambda user_id, value: value is not None and value.status == 'pending',
+        )
+        _state_sweeper = sweeper
+    return _state_sweeper
+
+
+def get_state_sweeper() -> StateSweeper:
+    """دریافت نمونه سراسری پاکسازی وضعیت‌ها"""
+    return init_state_sweeper()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+پردازش همزمان updateها بین کاربران و ترتیبی برای هر چت
+- updateهای یک چت به ترتیب رسیدن و یکی‌یکی اجرا می‌شوند (قفل هر چت، FIFO)؛ بنابراین هندلرها
+  می‌توانند بین awaitها پیش‌نویس سفارش و وضعیت ثبت‌نام کاربر را بدون تداخل تغییر دهند
+- updateهای چت‌های مختلف همزمان اجرا می‌شوند، حداکثر به تعداد limit
+- قفل هر چت با شمارش ارجاع نگه داشته می‌شود و پس از آخرین update منتظر آن چت حذف می‌شود
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+
+from config import BotConfig
+
+# تنظیم لاگر
+logger = logging.getLogger(__name__)
+
+
+class _ChatLock:
+    """قفل یک چت و تعداد updateهای در حال اجرا یا منتظر آن"""
+
+    __slots__ = ('lock', 'refs')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.refs = 0
+
+
+class UpdateSerializer(BaseMiddleware):
+    """middleware بیرونی update: قفل هر چت و سقف کلی updateهای همزمان"""
+
+    def __init__(self, limit: int = None):
+        self.limit = max(1, limit if limit is not None else BotConfig.UPDATE_CONCURRENCY)
+        self._semaphore = asyncio.Semaphore(self.limit)
+        self._locks: Dict[int, _ChatLock] = {}
+        self.active = 0
+        self.peak_active = 0
+        self.processed = 0
+
+    @staticmethod
+    def _key(data: Dict[str, Any]) -> Optional[int]:
+        """کلید ترتیب: شناسه چت (یا کاربر برای updateهای بدون چت)"""
+        chat = data.get('event_chat')
+        if chat is not None:
+            return chat.id
+        user = data.get('event_from_user')
+        return user.id if user is not None else None
+
+    async def _run(self, handler, event, data):
+        async with self._semaphore:
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            try:
+                return await handler(event, data)
+            finally:
+                self.active -= 1
+                self.processed += 1
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        key = self._key(data)
+        if key is None:
+            return await self._run(handler, event, data)
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = _ChatLock()
+        entry.refs += 1
+        try:
+            async with entry.lock:
+                return await self._run(handler, event, data)
+        finally:
+            entry.refs -= 1
+            if entry.refs == 0:
+                del self._locks[key]
+
+    def stats(self) -> Dict[str, int]:
+        """updateهای در حال اجرا، منتظر و تعداد چت‌های دارای قفل"""
+        pending = sum(entry.refs for entry in self._locks.values())
+        return {
+            'limit': self.limit,
+            'active': self.active,
+            'waiting': max(0, pending - self.active),
+            'chats': len(self._locks),
+            'peak_active': self.peak_active,
+            'processed': self.processed,
+        }
+
+
+# نمونه سراسری
+_update_serializer: Optional[UpdateSerializer] = None
+
+
+def setup_update_concurrency(dp, limit: int = None) -> UpdateSerializer:
+    """ثبت middleware ترتیب/همزمانی updateها روی dispatcher"""
+    global _update_serializer
+    _update_serializer = UpdateSerializer(limit)
+    dp.update.outer_middleware(_update_serializer)
+    logger.info(f"🚦 پردازش updateها: ترتیبی برای هر چت، حداکثر {_update_serializer.limit} update همزمان")
+    return _update_serializer
+
+
+def get_update_serializer() -> Optional[UpdateSerializer]:
+    """دریافت نمونه سراسری (None اگر ثبت نشده باشد)"""
+    return _update_serializer
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+مسیریابی پیام‌ها و callbackها با جدول (به جای زنجیره فیلترهای lambda که aiogram یکی‌یکی بررسی می‌کند)
+- متن دقیق (دکمه‌های منو): یک جستجوی dict
+- دستورها (/start): جستجوی dict با نام دستور و سپس فیلتر Command همان دستور (mention و CommandObject)
+- callbackها: نگاشت پیشوند به هندلر (گروه‌بندی شده بر اساس طول پیشوند)
+- مسیرهای وابسته به وضعیت کاربر (predicate) فقط تا اولین مسیر متن/دستور پیدا شده بررسی می‌شوند
+  و وضعیت را از UserContext همان update می‌خوانند (app/user_context.py)
+ترتیب ثبت مانند aiogram حفظ می‌شود: اولین مسیر منطبق (به ترتیب ثبت) پیام را پردازش می‌کند
+"""
+
+import inspect
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.filters import Command
+
+from app.user_context import UserContext
+
+# تنظیم لاگر
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class Route:
+    """یک مسیر ثبت شده: ترتیب ثبت، هندلر و شرط (برای دستورها و predicateها)"""
+    order: int
+    handler: Callable
+    params: Optional[frozenset]  # پارامترهای کلیدی هندلر (None = **kwargs)
+    check: Optional[Callable] = None
+
+    async def call(self, event, data: Dict[str, Any]):
+        if self.params is not None:
+            data = {key: value for key, value in data.items() if key in self.params}
+        return await self.handler(event, **data)
+
+
+def _handler_params(handler: Callable) -> Optional[frozenset]:
+    """نام پارامترهای کلیدی هندلر (به جز رویداد)، مانند تزریق وابستگی aiogram"""
+    parameters = list(inspect.signature(handler).parameters.values())[1:]
+    if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters):
+        return None
+    return frozenset(p.name for p in parameters)
+
+
+def _command_name(text: Optional[str]) -> Optional[str]:
+    """نام دستور از متن پیام ('/start@bot args' -> 'start')"""
+    if not text or text[0] != '/':
+        return None
+    return text.split(maxsplit=1)[0][1:].partition('@')[0]
+
+
+class UpdateRouter:
+    """جدول مسیریابی پیام‌ها و callbackها (یک هندلر aiogram برای هر نوع رویداد)"""
+
+    def __init__(self):
+        self._order = 0
+        self._texts: Dict[str, Route] = {}
+        self._commands: Dict[str, Route] = {}
+        self._predicates: List[Route] = []
+        self._prefixes: Dict[str, Route] = {}
+        self._prefix_lengths: List[int] = []
+
+    def _route(self, handler: Callable, check: Callable = None) -> Route:
+        self._order += 1
+        return Route(self._order, handler, _handler_params(handler), check)
+
+    # --- ثبت مسیرها ---
+
+    def text(self, handler: Callable, *texts: str):
+        """هندلر برای متن‌های دقیق (متنی که قبلاً ثبت شده به هندلر قبلی می‌رسد)"""
+        route = self._route(handler)
+        for text in texts:
+            if text in self._texts:
+                logger.debug(f"🔀 متن {text!r} قبلاً به {self._texts[text].handler.__name__} مسیریابی شده")
+                continue
+            self._texts[text] = route
+
+    def command(self, handler: Callable, *commands: str):
+        """هندلر برای دستورها (مانند Command(...) در aiogram؛ CommandObject با نام command به هندلر می‌رسد)"""
+        for name in commands:
+            if name not in self._commands:
+                self._commands[name] = self._route(handler, Command(name))
+
+    def message_when(self, handler: Callable, predicate: Callable[[Any, UserContext], bool]):
+        """هندلر برای پیام‌هایی که predicate(message, user_ctx) برای آن‌ها True است (مثلاً کاربر در حال ثبت‌نام)"""
+        self._predicates.append(self._route(handler, predicate))
+
+    def callback(self, handler: Callable, *prefixes: str):
+        """هندلر برای callbackهایی که data آن‌ها با یکی از پیشوندها شروع می‌شود"""
+        route = self._route(handler)
+        for prefix in prefixes:
+            self._prefixes.setdefault(prefix, route)
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._prefixes})
+
+    def attach(self, dp):
+        """ثبت جدول به عنوان تنها هندلر پیام و callback در dispatcher"""
+        dp.message.register(self._on_message)
+        dp.callback_query.register(self._on_callback)
+        logger.info(
+            f"🔀 مسیریابی: {len(self._texts)} متن، {len(self._commands)} دستور، "
+            f"{len(self._predicates)} مسیر وضعیت، {len(self._prefixes)} پیشوند callback"
+        )
+
+    # --- مسیریابی ---
+
+    async def _match(self, route: Route, message, bot) -> Optional[Dict[str, Any]]:
+        """بررسی مسیر متن/دستور پیدا شده؛ خروجی: داده فیلتر یا None"""
+        if route.check is None:
+            return {}
+        result = await route.check(message, bot)
+        if not result:
+            return None
+        return result if isinstance(result, dict) else {}
+
+    async def resolve_message(self, message, bot=None, ctx: UserContext = None) -> Tuple[Optional[Route], Dict[str, Any]]:
+        """مسیر پیام (اولین مسیر منطبق به ترتیب ثبت) و داده فیلتر آن"""
+        text = message.text
+        fixed = []
+        route = self._texts.get(text) if text is not None else None
+        if route is not None:
+            fixed.append(route)
+        route = self._commands.get(_command_name(text or message.caption)) if self._commands else None
+        if route is not None:
+            fixed.append(route)
+            if len(fixed) == 2 and fixed[1].order < fixed[0].order:
+                fixed.reverse()
+
+        index = 0
+        for route in self._predicates:
+            while index < len(fixed) and fixed[index].order < route.order:
+                data = await self._match(fixed[index], message, bot)
+                if data is not None:
+                    return fixed[index], data
+                index += 1
+            if ctx is None:
+                ctx = UserContext.for_event(message)
+            if route.check(message, ctx):
+                return route, {}
+        for route in fixed[index:]:
+            data = await self._match(route, message, bot)
+            if data is not None:
+                return route, data
+        return None, {}
+
+    def resolve_callback(self, callback_query) -> Optional[Route]:
+        """مسیر callback: اولین پیشوند منطبق به ترتیب ثبت"""
+        data = callback_query.data
+        if not data:
+            return None
+        best = None
+        for length in self._prefix_lengths:
+            if length > len(data):
+                break
+            route = self._prefixes.get(data[:length])
+            if route is not None and (best is None or route.order < best.order):
+                best = route
+        return best
+
+    async def _on_message(self, message, **kwargs):
+        route, data = await self.resolve_message(message, kwargs.get('bot'), kwargs.get('user_ctx'))
+        if route is None:
+            return UNHANDLED
+        return await route.call(message, {**kwargs, **data})
+
+    async def _on_callback(self, callback_query, **kwargs):
+        route = self.resolve_callback(callback_query)
+        if route is None:
+            return UNHANDLED
+        return await route.call(callback_query, kwargs)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+وضعیت کاربر برای هر update (UserContext)
+- یک بار برای هر update توسط middleware بیرونی ساخته می‌شود و به فیلترها (app/update_router.py)
+  و هندلرها (پارامتر user_ctx) می‌رسد
+- هر مورد (پیش‌نویس سفارش، ثبت‌نام، رسید، وضعیت کاربر و ...) با اولین درخواست خوانده و
+  تا پایان update نگه داشته می‌شود؛ خواندن‌های تکراری در آمار به عنوان صرفه‌جویی شمرده می‌شوند
+- مقدارها وضعیت لحظه اولین خواندن را نشان می‌دهند؛ هندلری که وضعیت را تغییر می‌دهد مستقیماً با جداول کار می‌کند
+"""
+
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+
+# تنظیم لاگر
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# آمار کلی: تعداد context ها، خواندن‌های واقعی و خواندن‌های صرفه‌جویی شده
+_stats = {'contexts': 0, 'loads': 0, 'reuses': 0}
+
+
+class UserContext:
+    """وضعیت‌های یک کاربر با بارگذاری تنبل و memoise برای طول یک update"""
+
+    __slots__ = ('user_id', '_values')
+
+    def __init__(self, user_id: Optional[int]):
+        self.user_id = user_id
+        self._values: Dict[str, Any] = {}
+        _stats['contexts'] += 1
+
+    @classmethod
+    def for_event(cls, event) -> "UserContext":
+        """context برای کاربر فرستنده پیام یا callback"""
+        user = getattr(event, 'from_user', None)
+        return cls(user.id if user is not None else None)
+
+    def _load(self, name: str, loader: Callable[[], Any]):
+        value = self._values.get(name, _MISSING)
+        if value is not _MISSING:
+            _stats['reuses'] += 1
+            return value
+        value = loader() if self.user_id is not None else None
+        self._values[name] = value
+        _stats['loads'] += 1
+        return value
+
+    def invalidate(self, name: str = None):
+        """حذف مقدار(های) memoise شده پس از تغییر وضعیت در همین update"""
+        if name is None:
+            self._values.clear()
+        else:
+            self._values.pop(name, None)
+
+    # --- پیش‌نویس سفارش ---
+
+    @property
+    def order_table(self):
+        """جدول پیش‌نویس سفارش کاربر (مکانیک یا مشتری) یا None"""
+        def load():
+            from app.state_manager import mechanic_order_userinfo, customer_order_userinfo
+            if self.user_id in mechanic_order_userinfo:
+                return mechanic_order_userinfo
+            if self.user_id in customer_order_userinfo:
+                return customer_order_userinfo
+            return None
+        return self._load('order_table', load)
+
+    @property
+    def has_order_draft(self) -> bool:
+        return self.order_table is not None
+
+    @property
+    def is_mechanic_order(self) -> bool:
+        from app.state_manager import mechanic_order_userinfo
+        return self.order_table is mechanic_order_userinfo
+
+    @property
+    def order_draft(self):
+        """پیش‌نویس سفارش (برای تغییر؛ کلید برای ذخیره علامت‌گذاری می‌شود)"""
+        def load():
+            table = self.order_table
+            return table[self.user_id] if table is not None else None
+        return self._load('order_draft', load)
+
+    # --- ثبت‌نام ---
+
+    @property
+    def is_registering_mechanic(self) -> bool:
+        def load():
+            from app.state_manager import mechanic_states
+            return self.user_id in mechanic_states
+        return self._load('is_registering_mechanic', load)
+
+    @property
+    def is_registering_customer(self) -> bool:
+        def load():
+            from app.state_manager import customer_register_states
+            return self.user_id in customer_register_states
+        return self._load('is_registering_customer', load)
+
+    # --- رسید و وضعیت‌ها ---
+
+    @property
+    def receipt_state(self) -> Optional[Dict]:
+        """وضعیت انتظار رسید پرداخت"""
+        def load():
+            from app.state_manager import get_receipt_state
+            return get_receipt_state(self.user_id)
+        return self._load('receipt_state', load)
+
+    @property
+    def mechanic_state_local(self) -> Optional[Dict]:
+        """وضعیت محلی مکانیک (mechanic_state.json)"""
+        def load():
+            from app.state_manager import get_mechanic_state_local
+            return get_mechanic_state_local(self.user_id)
+        return self._load('mechanic_state_local', load)
+
+    @property
+    def user_status(self):
+        """وضعیت ذخیره شده کاربر (UserStatus) بدون درخواست به پنل"""
+        def load():
+            from app.state_manager import get_user_status
+            return get_user_status(self.user_id)
+        return self._load('user_status', load)
+
+    async def fetch_user_status(self):
+        """وضعیت کاربر؛ اگر محلی نباشد یک بار از پنل دریافت می‌شود"""
+        if self.user_status is not None:
+            return self.user_status
+        value = self._values.get('panel_status', _MISSING)
+        if value is not _MISSING:
+            _stats['reuses'] += 1
+            return value
+        from app.state_manager import check_user_status_from_server
+        value = await check_user_status_from_server(self.user_id) if self.user_id is not None else None
+        self._values['panel_status'] = value
+        _stats['loads'] += 1
+        return value
+
+
+class UserContextLoader(BaseMiddleware):
+    """
+    middleware بیرونی: ساخت UserContext برای هر پیام/callback با کلید user_ctx
+    وضعیت‌های بارگذاری نشده کاربر (پیش‌نویس سفارش lazy) پیش از هندلرها به صورت غیرهمزمان بازیابی می‌شوند
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        ctx = UserContext.for_event(event)
+        if ctx.user_id is not None:
+            from app.state_store import preload_state_key
+            await preload_state_key(ctx.user_id)
+        data['user_ctx'] = ctx
+        return await handler(event, data)
+
+
+def setup_user_context(dp):
+    """ثبت middleware برای پیام‌ها و callbackها"""
+    loader = UserContextLoader()
+    dp.message.outer_middleware(loader)
+    dp.callback_query.outer_middleware(loader)
+
+
+def get_user_context_stats() -> Dict[str, int]:
+    """آمار: contexts، خواندن‌های واقعی (loads) و خواندن‌های تکراری صرفه‌جویی شده (reuses)"""
+    return dict(_stats)
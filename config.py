@@ -23,6 +23,89 @@ class BotConfig:
     WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
     WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
     
+    # تنظیمات اتصال به پنل
+    PANEL_POOL_LIMIT = int(os.getenv("PANEL_POOL_LIMIT", "100"))
+    PANEL_POOL_LIMIT_PER_HOST = int(os.getenv("PANEL_POOL_LIMIT_PER_HOST", "30"))
+    PANEL_KEEPALIVE_TIMEOUT = float(os.getenv("PANEL_KEEPALIVE_TIMEOUT", "30"))
+    PANEL_REQUEST_TIMEOUT = float(os.getenv("PANEL_REQUEST_TIMEOUT", "15"))
+    # circuit breaker: تعداد خطای پیاپی برای باز شدن مدار، زمان باز ماندن (ثانیه) و تعداد درخواست آزمایشی
+    PANEL_BREAKER_FAILURE_THRESHOLD = int(os.getenv("PANEL_BREAKER_FAILURE_THRESHOLD", "5"))
+    PANEL_BREAKER_RECOVERY_TIMEOUT = float(os.getenv("PANEL_BREAKER_RECOVERY_TIMEOUT", "30"))
+    PANEL_BREAKER_HALF_OPEN_MAX_CALLS = int(os.getenv("PANEL_BREAKER_HALF_OPEN_MAX_CALLS", "1"))
+    # تلاش مجدد درخواست‌های idempotent: تعداد کل تلاش‌ها، تاخیر پایه/سقف backoff و بودجه زمانی کل (ثانیه)
+    # پیش‌فرض برای هندلرهای کاربر (کوتاه) و BACKGROUND برای polling و سرویس‌های پس‌زمینه
+    PANEL_RETRY_ATTEMPTS = int(os.getenv("PANEL_RETRY_ATTEMPTS", "2"))
+    PANEL_RETRY_BASE_DELAY = float(os.getenv("PANEL_RETRY_BASE_DELAY", "0.5"))
+    PANEL_RETRY_MAX_DELAY = float(os.getenv("PANEL_RETRY_MAX_DELAY", "8"))
+    PANEL_RETRY_DEADLINE = float(os.getenv("PANEL_RETRY_DEADLINE", "10"))
+    PANEL_BACKGROUND_RETRY_ATTEMPTS = int(os.getenv("PANEL_BACKGROUND_RETRY_ATTEMPTS", "4"))
+    PANEL_BACKGROUND_RETRY_DEADLINE = float(os.getenv("PANEL_BACKGROUND_RETRY_DEADLINE", "30"))
+    # درخواست‌های دسته‌ای (batch) وضعیت کاربران و سفارشات
+    PANEL_BATCH_ENABLED = os.getenv("PANEL_BATCH_ENABLED", "True").lower() == "true"
+    PANEL_BATCH_SIZE = int(os.getenv("PANEL_BATCH_SIZE", "100"))
+    PANEL_BATCH_FALLBACK_CONCURRENCY = int(os.getenv("PANEL_BATCH_FALLBACK_CONCURRENCY", "10"))
+    
+    # کش وضعیت کاربران (ثانیه / حداکثر تعداد)
+    USER_STATUS_CACHE_TTL = float(os.getenv("USER_STATUS_CACHE_TTL", "30"))
+    USER_STATUS_CACHE_SIZE = int(os.getenv("USER_STATUS_CACHE_SIZE", "10000"))
+    
+    # بررسی سفارش در انتظار کاربر پیش از ثبت سفارش جدید
+    PENDING_ORDER_DEADLINE = float(os.getenv("PENDING_ORDER_DEADLINE", "5"))
+    PENDING_ORDER_CACHE_TTL = float(os.getenv("PENDING_ORDER_CACHE_TTL", "5"))
+    # اگر پنل فیلتر چند وضعیتی (status=a,b,c) را پشتیبانی کند، یک درخواست به جای چند درخواست
+    PANEL_MULTI_STATUS_QUERY = os.getenv("PANEL_MULTI_STATUS_QUERY", "False").lower() == "true"
+    
+    # همگام‌سازی تغییرات سفارشات: auto = cursor افزایشی (updated_since) در صورت پشتیبانی پنل، full = اسکن کامل صفحه‌بندی شده
+    PANEL_ORDER_SYNC_MODE = os.getenv("PANEL_ORDER_SYNC_MODE", "auto")
+    PANEL_ORDER_PAGE_SIZE = int(os.getenv("PANEL_ORDER_PAGE_SIZE", "100"))
+    
+    # بررسی وضعیت کاربران در سیستم polling
+    USER_CHECK_CONCURRENCY = int(os.getenv("USER_CHECK_CONCURRENCY", "10"))
+    USER_CHECK_BUDGET = float(os.getenv("USER_CHECK_BUDGET", "45"))
+    
+    # زمان‌بند polling (ثانیه): سفارش‌های در انتظار پرداخت سریع‌تر، کاربران بدون تغییر با backoff نمایی
+    POLL_HOT_ORDER_INTERVAL = float(os.getenv("POLL_HOT_ORDER_INTERVAL", "15"))
+    POLL_ORDER_INTERVAL = float(os.getenv("POLL_ORDER_INTERVAL", "60"))
+    POLL_USER_BASE_INTERVAL = float(os.getenv("POLL_USER_BASE_INTERVAL", "60"))
+    POLL_USER_MAX_INTERVAL = float(os.getenv("POLL_USER_MAX_INTERVAL", "1800"))
+    POLL_TICK_MAX = float(os.getenv("POLL_TICK_MAX", "5"))
+    
+    # سرویس پیگیری سفارشات ثبت/تایید شده: فاصله بررسی و حداکثر عمر پیگیری (ثانیه)
+    ORDER_WATCH_INTERVAL = float(os.getenv("ORDER_WATCH_INTERVAL", "30"))
+    ORDER_WATCH_MAX_AGE = float(os.getenv("ORDER_WATCH_MAX_AGE", "259200"))
+    
+    # پردازش updateها: حداکثر updateهای همزمان (چت‌های مختلف؛ updateهای هر چت همیشه ترتیبی‌اند، 1 = کاملاً ترتیبی)
+    UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "16"))
+    
+    # صف ارسال پیام‌ها: حداکثر پیام در ثانیه (سراسری)، فاصله حداقل پیام‌های یک چت (ثانیه)
+    # و تعداد تلاش مجدد پس از خطای 429 (retry_after)
+    SEND_RATE_LIMIT = float(os.getenv("SEND_RATE_LIMIT", "30"))
+    SEND_CHAT_INTERVAL = float(os.getenv("SEND_CHAT_INTERVAL", "1.0"))
+    SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+    
+    # ذخیره‌سازی وضعیت ربات: sqlite (پایدار، حالت WAL) یا memory، مسیر پایگاه داده و تاخیر ذخیره دسته‌ای (ثانیه)
+    STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite")
+    STATE_DB_PATH = os.getenv("STATE_DB_PATH", "")
+    STATE_FLUSH_DELAY = float(os.getenv("STATE_FLUSH_DELAY", "0.5"))
+    # بازه ذخیره خودکار پیش‌نویس سفارش (ثانیه): تغییرات پیاپی کاربر در این بازه یک بار ذخیره می‌شوند
+    ORDER_DRAFT_AUTOSAVE_DELAY = float(os.getenv("ORDER_DRAFT_AUTOSAVE_DELAY", "2.0"))
+    
+    # پاکسازی وضعیت‌های رها شده: فاصله پاکسازی و TTL هر نوع وضعیت پس از آخرین فعالیت (ثانیه، 0 = بدون انقضا)
+    STATE_SWEEP_INTERVAL = float(os.getenv("STATE_SWEEP_INTERVAL", "600"))
+    STATE_TTL_REGISTRATION = float(os.getenv("STATE_TTL_REGISTRATION", "86400"))
+    STATE_TTL_ORDER_DRAFT = float(os.getenv("STATE_TTL_ORDER_DRAFT", "259200"))
+    STATE_TTL_SUPPORT = float(os.getenv("STATE_TTL_SUPPORT", "86400"))
+    STATE_TTL_USER_STATUS = float(os.getenv("STATE_TTL_USER_STATUS", "2592000"))
+    
+    # دفتر سفارشات پرداخت شده اطلاع‌رسانی شده: مدت نگهداری (روز) و فشرده‌سازی log پس از این تعداد ثبت
+    NOTIFIED_ORDERS_RETENTION_DAYS = float(os.getenv("NOTIFIED_ORDERS_RETENTION_DAYS", "30"))
+    NOTIFIED_LEDGER_COMPACT_EVERY = int(os.getenv("NOTIFIED_LEDGER_COMPACT_EVERY", "500"))
+    
+    # محافظ فراخوانی‌های blocking روی event loop
+    BLOCKING_GUARD = os.getenv("BLOCKING_GUARD", "True").lower() == "true"
+    BLOCKING_GUARD_STRICT = os.getenv("BLOCKING_GUARD_STRICT", "False").lower() == "true"
+    LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", "0.25"))
+    
     # تنظیمات لاگ
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     
@@ -13,27 +13,31 @@ except ImportError:
     def get_user_status(user_id):
         return None
 
-def get_main_menu(user_id: int) -> ReplyKeyboardMarkup:
+_LOOKUP = object()
+
+def get_main_menu(user_id: int, user_status=_LOOKUP) -> ReplyKeyboardMarkup:
     """
     دریافت منوی اصلی بر اساس وضعیت کاربر
+    user_status: وضعیت از پیش خوانده شده (مثلاً از UserContext)؛ در غیر این صورت خوانده می‌شود
     """
     # بررسی وضعیت کاربر
-    user_status = get_user_status(user_id)
+    if user_status is _LOOKUP:
+        user_status = get_user_status(user_id)
     if not user_status:
         # کاربر ثبت‌نام نکرده
         return get_guest_menu()
-    if user_status.get('status') == 'pending':
+    if user_status.status == 'pending':
         # کاربر در انتظار تایید
         return get_pending_menu()
-    if user_status.get('status') == 'approved':
+    if user_status.status == 'approved':
         # فقط مکانیک تایید شده به امکانات دسترسی دارد
-        user_type = user_status.get('role')  # mechanic یا customer
+        user_type = user_status.role  # mechanic یا customer
         if user_type == 'mechanic':
             return get_mechanic_menu()
         else:
             # مشتری تایید شده فقط پیام وضعیت بگیرد
             return get_guest_menu()
-    if user_status.get('status') == 'rejected':
+    if user_status.status == 'rejected':
         # کاربر رد شده
         return get_rejected_menu()
     # پیش‌فرض
@@ -101,15 +105,16 @@ def get_rejected_menu() -> ReplyKeyboardMarkup:
         one_time_keyboard=False
     )
 
-def get_status_message(user_id: int) -> str:
+def get_status_message(user_id: int, user_status=_LOOKUP) -> str:
     """دریافت پیام وضعیت کاربر"""
-    user_status = get_user_status(user_id)
+    if user_status is _LOOKUP:
+        user_status = get_user_status(user_id)
     
     if not user_status:
         return "شما هنوز ثبت‌نام نکرده‌اید. لطفاً ابتدا ثبت‌نام کنید."
     
-    status = user_status.get('status')
-    user_type = user_status.get('role')  # mechanic یا customer
+    status = user_status.status
+    user_type = user_status.role  # mechanic یا customer
     
     type_text = "مکانیک" if user_type == "mechanic" else "مشتری"
     
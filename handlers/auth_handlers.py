@@ -4,21 +4,22 @@
 # ---------------------------------------------
 
 import logging
-from aiogram import types, F
-from aiogram.filters import Command, CommandObject
+from aiogram import types
+from aiogram.filters import CommandObject
 from app.state_manager import (
     get_user_status, set_user_status, check_user_status_from_server, 
-    get_dynamic_menu, mechanic_states, customer_register_states
+    get_dynamic_menu, mechanic_states, customer_register_states, fetch_user_status
 )
+from app.models import RegistrationDraft, RegistrationStep
+from app.user_context import UserContext
 from app.utils import format_amount
+from app.panel_client import get_panel_client
 import aiohttp
-import requests
 import ssl
 import os
 
 async def check_and_update_user_status_from_panel(user_id: int):
     """بررسی و به‌روزرسانی وضعیت کاربر از پنل"""
-    import requests
     from app.state_manager import set_user_status
     
     panel_api_base_url = os.getenv("PANEL_API_BASE_URL")
@@ -30,15 +31,13 @@ async def check_and_update_user_status_from_panel(user_id: int):
     
     try:
         # استفاده از endpoint جدید که هم مکانیک و هم مشتری را بررسی می‌کند
-        user_url = f"{panel_api_base_url}/mechanics/api/user/status?telegram_id={user_id}"
-        logging.info(f"👤 Checking user API: {user_url}")
+        logging.info(f"👤 Checking user API for {user_id}")
         
         try:
-            user_response = requests.get(user_url, timeout=5)
-            logging.info(f"📊 User API response: {user_response.status_code}")
+            status_code, data = await fetch_user_status(user_id, timeout=5)
+            logging.info(f"📊 User API response: {status_code}")
             
-            if user_response.status_code == 200:
-                data = user_response.json()
+            if status_code == 200 and data is not None:
                 logging.info(f"📊 User data: {data}")
                 
                 # بررسی success و status
@@ -54,7 +53,7 @@ async def check_and_update_user_status_from_panel(user_id: int):
                 else:
                     logging.info(f"❌ User API success=false: {data}")
             else:
-                logging.info(f"❌ User API returned {user_response.status_code}: {user_response.text[:200]}")
+                logging.info(f"❌ User API returned {status_code}: {str(data)[:200]}")
                 
         except Exception as e:
             logging.info(f"❌ User API error: {e}")
@@ -67,8 +66,6 @@ async def check_and_update_user_status_from_panel(user_id: int):
 
 async def start_handler(message: types.Message):
     """هندلر شروع ربات با بررسی وضعیت از پنل"""
-    import os
-    import requests
     from dynamic_menu import get_main_menu, get_status_message
     from app.state_manager import set_user_status
     
@@ -86,18 +83,19 @@ async def start_handler(message: types.Message):
     menu = get_main_menu(user_id)
     await message.answer("لطفاً یکی از گزینه‌های زیر را انتخاب کنید:", reply_markup=menu)
 
-async def status_check_handler(message: types.Message):
+async def status_check_handler(message: types.Message, user_ctx: UserContext = None):
     """هندلر بررسی وضعیت ثبت‌نام"""
     from dynamic_menu import get_status_message, get_main_menu
     
     user_id = message.from_user.id
+    user_ctx = user_ctx or UserContext(user_id)
     
     # نمایش وضعیت کاربر
-    status_message = get_status_message(user_id)
+    status_message = get_status_message(user_id, user_ctx.user_status)
     await message.answer(status_message)
     
     # نمایش منوی به‌روزشده
-    menu = get_main_menu(user_id)
+    menu = get_main_menu(user_id, user_ctx.user_status)
     await message.answer("منوی اصلی:", reply_markup=menu)
 
 async def mechanic_register_start(message: types.Message):
@@ -114,7 +112,7 @@ async def mechanic_register_start(message: types.Message):
         return
     
     logger.info(f"🎆 شروع ثبت‌نام مکانیک برای کاربر {user.id}")
-    mechanic_states[user.id] = {"step": "full_name", "data": {}}
+    mechanic_states[user.id] = RegistrationDraft(RegistrationStep.FULL_NAME)
     logger.info(f"📋 حالت مکانیک {user.id} ذخیره شد - حالت‌های فعلی: {list(mechanic_states.keys())}")
     await message.answer("لطفاً نام کامل خود را وارد کنید:")
 
@@ -137,37 +135,37 @@ async def mechanic_register_process(message: types.Message):
         logger.warning(f"⚠️ حالت مکانیک {user.id} یافت نشد - حالت‌های موجود: {list(mechanic_states.keys())}")
         return
     
-    step = state["step"]
-    data = state["data"]
+    step = state.step
+    data = state.data
     logger.info(f"🔄 مرحله فعلی مکانیک {user.id}: {step}")
     
-    if step == "full_name":
+    if step == RegistrationStep.FULL_NAME:
         if hasattr(message, 'text') and message.text:
             data["full_name"] = message.text.strip()
-            state["step"] = "mobile"
+            state.step = RegistrationStep.MOBILE
             await message.answer("لطفاً شماره موبایل خود را وارد کنید:")
-    elif step == "mobile":
+    elif step == RegistrationStep.MOBILE:
         if hasattr(message, 'text') and message.text:
             data["mobile"] = message.text.strip()
-            state["step"] = "card_number"
+            state.step = RegistrationStep.CARD_NUMBER
             await message.answer("💳 لطفاً شماره کارت بانکی خود را وارد کنید:")
-    elif step == "card_number":
+    elif step == RegistrationStep.CARD_NUMBER:
         if hasattr(message, 'text') and message.text:
             data["card_number"] = message.text.strip()
-            state["step"] = "sheba_number"
+            state.step = RegistrationStep.SHEBA_NUMBER
             await message.answer("🏦 لطفاً شماره شبا خود را وارد کنید:")
-    elif step == "sheba_number":
+    elif step == RegistrationStep.SHEBA_NUMBER:
         if hasattr(message, 'text') and message.text:
             data["sheba_number"] = message.text.strip()
-            state["step"] = "address"
+            state.step = RegistrationStep.ADDRESS
             await message.answer("لطفاً آدرس کامل تعمیرگاه خود را وارد کنید:")
-    elif step == "address":
+    elif step == RegistrationStep.ADDRESS:
         if hasattr(message, 'text') and message.text:
             data["address"] = message.text.strip()
-            state["step"] = "business_license"
+            state.step = RegistrationStep.BUSINESS_LICENSE
             logger.info(f"📝 آدرس مکانیک {user.id} دریافت شد: {data['address']}")
             await message.answer("📜 حالا لطفاً عکس جواز کسب خود را ارسال کنید:")
-    elif step == "business_license":
+    elif step == RegistrationStep.BUSINESS_LICENSE:
         if hasattr(message, 'photo') and message.photo:
             # دریافت عکس جواز کسب
             photo = message.photo[-1]  # بزرگترین سایز عکس
@@ -183,7 +181,7 @@ async def mechanic_register_process(message: types.Message):
 async def submit_mechanic_registration(message, user_id, data):
     """ارسال اطلاعات ثبت‌نام مکانیک به پنل"""
     logger = logging.getLogger(__name__)
-    PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
+    panel_client = get_panel_client()
     
     # بررسی کامل بودن اطلاعات (بر اساس مدل پنل)
     required_fields = ['full_name', 'mobile', 'card_number', 'sheba_number', 'address', 'business_license_file_id']
@@ -244,22 +242,17 @@ async def submit_mechanic_registration(message, user_id, data):
                     filename = f"license_{user_id}.{file_extension}"
                     
                     # ارسال به پنل با multipart/form-data
-                    files = {
-                        'business_license_image': (filename, file_content, f'image/{file_extension}')
-                    }
-                    
-                    # حذف file_id از payload و اضافه کردن سایر فیلدها
-                    form_data = payload.copy()
-                    
-                    response = requests.post(
-                        f"{PANEL_API_BASE_URL}/mechanics/api/register",
-                        data=form_data,
-                        files=files,
-                        timeout=30
+                    form_data = aiohttp.FormData()
+                    for key, value in payload.items():
+                        form_data.add_field(key, str(value))
+                    form_data.add_field(
+                        'business_license_image', file_content,
+                        filename=filename, content_type=f'image/{file_extension}'
                     )
                     
-                    if response.status_code == 200:
-                        resp_data = response.json()
+                    status_code, resp_data = await panel_client.register_mechanic(form_data, timeout=30)
+                    
+                    if status_code == 200 and resp_data is not None:
                         if resp_data.get('success'):
                             mechanic_id = resp_data.get('id')  # API returns 'id' not 'mechanic_id'
                             set_user_status(user_id, "mechanic", "pending")
@@ -274,15 +267,11 @@ async def submit_mechanic_registration(message, user_id, data):
                                     'last_name': data.get('last_name', ''),
                                     'phone_number': data.get('phone_number', '')
                                 }
-                                notification_response = requests.post(
-                                    f"{PANEL_API_BASE_URL}/notifications/api/mechanic-registered",
-                                    json=notification_data,
-                                    timeout=10
-                                )
-                                if notification_response.status_code == 200:
+                                notification_status, _ = await panel_client.notify_mechanic_registered(notification_data)
+                                if notification_status == 200:
                                     logger.info(f"📢 نوتیفیکیشن ثبت‌نام مکانیک {user_id} (ID: {mechanic_id}) به پنل ارسال شد")
                                 else:
-                                    logger.error(f"❌ خطا در ارسال نوتیفیکیشن به پنل: {notification_response.status_code}")
+                                    logger.error(f"❌ خطا در ارسال نوتیفیکیشن به پنل: {notification_status}")
                             except Exception as e:
                                 logger.error(f"❌ خطا در ارسال نوتیفیکیشن به پنل: {e}")
                             
@@ -292,12 +281,11 @@ async def submit_mechanic_registration(message, user_id, data):
                             logger.error(f"❌ خطا در ثبت‌نام مکانیک {user_id}: {error_msg}")
                             await message.answer(f"❌ خطا در ثبت‌نام: {error_msg}")
                     else:
-                        logger.error(f"❌ خطا در ارسال درخواست به پنل - کد وضعیت: {response.status_code}")
-                        try:
-                            error_data = response.json()
-                            error_msg = error_data.get('message', 'خطای نامشخص')
-                        except:
-                            error_msg = f"خطای HTTP {response.status_code}"
+                        logger.error(f"❌ خطا در ارسال درخواست به پنل - کد وضعیت: {status_code}")
+                        if resp_data is not None:
+                            error_msg = resp_data.get('message', 'خطای نامشخص')
+                        else:
+                            error_msg = f"خطای HTTP {status_code}"
                         await message.answer(f"❌ خطا در ثبت‌نام: {error_msg}")
                 else:
                     logger.error(f"❌ خطا در ارتباط با پنل - کد وضعیت: {resp.status}")
@@ -313,7 +301,7 @@ async def customer_register_start(message: types.Message):
     user_id = getattr(getattr(message, 'from_user', None), 'id', None)
     if user_id is None:
         return
-    customer_register_states[user_id] = {'step': 'first_name', 'data': {}}
+    customer_register_states[user_id] = RegistrationDraft(RegistrationStep.FIRST_NAME)
     await message.answer("لطفاً نام خود را وارد کنید:")
 
 async def customer_register_process(message: types.Message):
@@ -326,30 +314,30 @@ async def customer_register_process(message: types.Message):
     if user_id not in customer_register_states:
         return
     state = customer_register_states[user_id]
-    step = state['step']
-    data = state['data']
+    step = state.step
+    data = state.data
     
-    if step == 'first_name':
+    if step == RegistrationStep.FIRST_NAME:
         data['first_name'] = message.text.strip()
-        state['step'] = 'phone_number'
+        state.step = RegistrationStep.PHONE_NUMBER
         await message.answer("شماره تلفن خود را وارد کنید:")
-    elif step == 'phone_number':
+    elif step == RegistrationStep.PHONE_NUMBER:
         data['phone_number'] = message.text.strip()
-        state['step'] = 'province'
+        state.step = RegistrationStep.PROVINCE
         await message.answer("استان خود را وارد کنید:")
-    elif step == 'province':
+    elif step == RegistrationStep.PROVINCE:
         data['province'] = message.text.strip()
-        state['step'] = 'city'
+        state.step = RegistrationStep.CITY
         await message.answer("شهر خود را وارد کنید:")
-    elif step == 'city':
+    elif step == RegistrationStep.CITY:
         data['city'] = message.text.strip()
-        state['step'] = 'postal_code'
+        state.step = RegistrationStep.POSTAL_CODE
         await message.answer("کد پستی خود را وارد کنید:")
-    elif step == 'postal_code':
+    elif step == RegistrationStep.POSTAL_CODE:
         data['postal_code'] = message.text.strip()
-        state['step'] = 'address'
+        state.step = RegistrationStep.ADDRESS
         await message.answer("آدرس کامل خود را وارد کنید:")
-    elif step == 'address':
+    elif step == RegistrationStep.ADDRESS:
         data['address'] = message.text.strip()
         # ارسال اطلاعات به API
         await customer_register_submit(message, user_id, data)
@@ -357,7 +345,6 @@ async def customer_register_process(message: types.Message):
 
 async def customer_register_submit(message, user_id, data):
     """ارسال اطلاعات ثبت‌نام مشتری به پنل"""
-    PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
     payload = {
         'telegram_id': user_id,
         'first_name': data.get('first_name', ''),
@@ -370,18 +357,16 @@ async def customer_register_submit(message, user_id, data):
         'username': message.from_user.username or ''
     }
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(f"{PANEL_API_BASE_URL}/customers/api/register", json=payload) as resp:
-                if resp.status == 200:
-                    resp_data = await resp.json()
-                    if resp_data.get('success'):
-                        # پیام تبریک و منو داینامیک
-                        await message.answer("🎉 ثبت‌نام شما با موفقیت انجام شد! به خانواده پارنام یدک خوش آمدید.")
-                        await message.answer("از منوی زیر یکی از گزینه‌ها را انتخاب کنید:", reply_markup=await get_dynamic_menu(user_id))
-                    else:
-                        await message.answer(f"خطا در ثبت‌نام: {resp_data.get('message', '')}")
-                else:
-                    await message.answer("خطا در ارتباط با سرور. لطفاً مجدداً تلاش کنید.")
+        status_code, resp_data = await get_panel_client().register_customer(payload)
+        if status_code == 200 and resp_data is not None:
+            if resp_data.get('success'):
+                # پیام تبریک و منو داینامیک
+                await message.answer("🎉 ثبت‌نام شما با موفقیت انجام شد! به خانواده پارنام یدک خوش آمدید.")
+                await message.answer("از منوی زیر یکی از گزینه‌ها را انتخاب کنید:", reply_markup=await get_dynamic_menu(user_id))
+            else:
+                await message.answer(f"خطا در ثبت‌نام: {resp_data.get('message', '')}")
+        else:
+            await message.answer("خطا در ارتباط با سرور. لطفاً مجدداً تلاش کنید.")
     except Exception as e:
         await message.answer("خطا در ارتباط با سرور.")
 
@@ -399,17 +384,12 @@ async def approve_handler(message: types.Message, command: CommandObject):
     set_user_status(user_id, "mechanic", "approved")
     try:
         # دریافت اطلاعات مکانیک از پنل برای نمایش درصد کمیسیون
-        PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
         commission_percent = "N/A"
         
         try:
-            import aiohttp
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{PANEL_API_BASE_URL}/mechanics/api/status?telegram_id={user_id}") as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if data.get('success') and data.get('data'):
-                            commission_percent = data['data'].get('commission_percent', 'N/A')
+            status_code, data = await get_panel_client().get_mechanic_status(user_id)
+            if status_code == 200 and data and data.get('success') and data.get('data'):
+                commission_percent = data['data'].get('commission_percent', 'N/A')
         except Exception as e:
             logging.warning(f"[BOT] Could not fetch commission percent for mechanic {user_id}: {e}")
         
@@ -447,26 +427,40 @@ async def reject_handler(message: types.Message, command: CommandObject):
 
 # Support handler حذف شد - از support_handlers.py استفاده می‌شود
 
-def register_auth_handlers(dp):
-    """ثبت هندلرهای احراز هویت"""
-    dp.message.register(start_handler, Command("start"))
-    dp.message.register(status_check_handler, F.text == "⏳ وضعیت ثبت‌نام")
+# دکمه‌های منو که در حین ثبت‌نام به عنوان ورودی ثبت‌نام پذیرفته نمی‌شوند
+_MENU_TEXTS = frozenset({"📝 ثبت سفارش", "📦 سفارشات من", "📞 پشتیبانی"})
+
+def _is_registration_text(message) -> bool:
+    """متن معمولی (نه دستور و نه دکمه منو)"""
+    text = message.text
+    return bool(text) and not text.startswith("/") and text not in _MENU_TEXTS
+
+def _is_mechanic_registering(message, ctx) -> bool:
+    return ctx.is_registering_mechanic and (_is_registration_text(message) or bool(message.photo))
+
+def _is_customer_registering(message, ctx) -> bool:
+    return ctx.is_registering_customer and _is_registration_text(message)
+
+def register_auth_handlers(router):
+    """ثبت هندلرهای احراز هویت در جدول مسیریابی (app/update_router.py)"""
+    router.command(start_handler, "start")
+    router.text(status_check_handler, "⏳ وضعیت ثبت‌نام")
     
     # دکمه‌های ثبت‌نام - با متن صحیح از dynamic_menu
-    dp.message.register(mechanic_register_start, F.text == "👨‍🔧 ثبت‌نام مکانیک")
-    dp.message.register(customer_register_start, F.text == "👤 ثبت‌نام مشتری")
+    router.text(mechanic_register_start, "👨‍🔧 ثبت‌نام مکانیک")
+    router.text(customer_register_start, "👤 ثبت‌نام مشتری")
     
     # دکمه پشتیبانی - از support_handlers.py استفاده می‌شود
     try:
         from handlers.support_handlers import simple_support_handler
-        dp.message.register(simple_support_handler, F.text == "📞 پشتیبانی")
+        router.text(simple_support_handler, "📞 پشتیبانی")
     except ImportError:
         logging.warning("Support handlers not found, skipping support button registration")
     
-    # هندلرهای پردازش ثبت‌نام (متن و عکس) - با فیلتر دقیق‌تر
-    dp.message.register(mechanic_register_process, lambda m: m and hasattr(m, 'from_user') and m.from_user and hasattr(m.from_user, 'id') and m.from_user.id in mechanic_states and ((hasattr(m, 'text') and m.text and not m.text.startswith("/") and m.text not in ["📝 ثبت سفارش", "📦 سفارشات من", "📞 پشتیبانی"]) or (hasattr(m, 'photo') and m.photo)))
-    dp.message.register(customer_register_process, lambda m: m and hasattr(m, 'from_user') and m.from_user and hasattr(m.from_user, 'id') and m.from_user.id in customer_register_states and hasattr(m, 'text') and m.text and not m.text.startswith("/") and m.text not in ["📝 ثبت سفارش", "📦 سفارشات من", "📞 پشتیبانی"])
+    # هندلرهای پردازش ثبت‌نام (متن و عکس)
+    router.message_when(mechanic_register_process, _is_mechanic_registering)
+    router.message_when(customer_register_process, _is_customer_registering)
     
     # هندلرهای ادمین
-    dp.message.register(approve_handler, Command("approve"))
-    dp.message.register(reject_handler, Command("reject"))
+    router.command(approve_handler, "approve")
+    router.command(reject_handler, "reject")
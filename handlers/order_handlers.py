@@ -5,32 +5,38 @@
 
 import logging
 import asyncio
-import aiohttp
 import os
 import json
 from aiogram import types, F
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from app.state_manager import (
     get_user_status, check_user_status_from_server, get_dynamic_menu,
-    mechanic_order_userinfo, customer_order_userinfo, customer_order_states
+    mechanic_order_userinfo, customer_order_userinfo, customer_order_states,
+    fetch_user_status
 )
+from app.models import OrderDraft, OrderItem, OrderStep
+from app.user_context import UserContext
 from app.utils import format_amount
+from app.panel_client import get_panel_client
+from app.order_watcher import get_order_watcher
+from app.send_queue import get_send_queue
+from config import BotConfig
 import datetime
+import time
 import pytz
-import requests
 import tempfile
 
-async def mechanic_menu_handler(message: types.Message):
+async def mechanic_menu_handler(message: types.Message, user_ctx: UserContext = None):
     """هندلر منوی مکانیک‌ها"""
     if not message or not hasattr(message, 'from_user') or not hasattr(message.from_user, 'id') or not hasattr(message, 'answer'):
         return
     user_id = getattr(getattr(message, 'from_user', None), 'id', None)
     if user_id is None:
         return
+    user_ctx = user_ctx or UserContext(user_id)
     
     # بررسی سفارش‌های در انتظار پرداخت (فقط اگر کاربر در حال ثبت سفارش نیست)
-    from app.state_manager import mechanic_order_userinfo, customer_order_userinfo
-    if user_id not in mechanic_order_userinfo and user_id not in customer_order_userinfo:
+    if not user_ctx.has_order_draft:
         pending_order = await check_pending_payment_orders(user_id)
         if pending_order:
             await show_pending_payment_order(message, pending_order)
@@ -38,12 +44,9 @@ async def mechanic_menu_handler(message: types.Message):
     
     if hasattr(message, 'text') and message.text == "📝 ثبت سفارش":
         # بررسی وضعیت مکانیک
-        PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
-        api_url = f"{PANEL_API_BASE_URL}/mechanics/api/user/status?telegram_id={user_id}"
         try:
-            response = requests.get(api_url, timeout=5)
-            if response.status_code == 200:
-                data = response.json()
+            status_code, data = await fetch_user_status(user_id, timeout=5)
+            if status_code == 200 and data is not None:
                 if data.get('success') and data.get('status') == 'approved':
                     # مکانیک تایید شده است
                     role = data.get('role', 'mechanic')
@@ -51,7 +54,7 @@ async def mechanic_menu_handler(message: types.Message):
                     set_user_status(user_id, role, 'approved')
                     
                     # شروع فرآیند ثبت سفارش
-                    mechanic_order_userinfo[user_id] = {"step": "product_name", "current_item": {}, "items": []}
+                    mechanic_order_userinfo[user_id] = OrderDraft()
                     await message.answer("لطفاً نام محصول اول و کیفیت (ایرانی ، شرکتی ، وارداتی )آن را وارد کنید:📝")
                     logging.info(f"[BOT] Mechanic {user_id} started multi-item order process.")
                     return
@@ -68,30 +71,8 @@ async def mechanic_menu_handler(message: types.Message):
         
     elif hasattr(message, 'text') and message.text == "📦 سفارشات من":
         # نمایش تاریخچه سفارشات مکانیک
-        PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
-        api_url = f"{PANEL_API_BASE_URL}/telegram-bot/api/orders?telegram_id={user_id}&limit=10"
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(api_url) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if data.get('success') and data.get('data'):
-                            orders = data['data']
-                            if not orders:
-                                await message.answer("شما هیچ سفارشی ثبت نکرده‌اید.")
-                                return
-                            msg = "✉️ تاریخچه سفارشات اخیر شما:\n\n"
-                            for idx, order in enumerate(orders, 1):
-                                items = order.get('items', [])
-                                if items:
-                                    for item in items:
-                                        msg += f"{idx}. {item.get('product_name', 'نامشخص')} - تعداد: {item.get('quantity', 0)}\n"
-                                        msg += f"   وضعیت: {order.get('status_display', 'نامشخص')}\n\n"
-                            await message.answer(msg)
-                        else:
-                            await message.answer("هیچ سفارشی یافت نشد یا خطا در دریافت اطلاعات.")
-                    else:
-                        await message.answer("خطا در ارتباط با سرور. لطفاً مجدداً تلاش کنید.")
+            await show_order_history(message, user_id)
         except Exception as e:
             await message.answer("خطا در دریافت تاریخچه سفارشات.")
             logging.error(f"[BOT] Error fetching order history for user {user_id}: {e}")
@@ -104,37 +85,49 @@ async def mechanic_menu_handler(message: types.Message):
         # نمایش اطلاعات پشتیبانی
         await message.answer("📞 برای ارتباط با پشتیبانی:\n\n📱 شماره تماس: 09123456789\n📧 ایمیل: support@nikayadak.com")
 
-async def mechanic_order_text_handler(message: types.Message):
+async def show_order_history(message: types.Message, user_id: int):
+    """نمایش تاریخچه سفارشات اخیر کاربر"""
+    status_code, data = await get_panel_client().list_orders(telegram_id=user_id, limit=10)
+    if status_code == 200 and data is not None:
+        if data.get('success') and data.get('data'):
+            orders = data['data']
+            if not orders:
+                await message.answer("شما هیچ سفارشی ثبت نکرده‌اید.")
+                return
+            msg = "✉️ تاریخچه سفارشات اخیر شما:\n\n"
+            for idx, order in enumerate(orders, 1):
+                items = order.get('items', [])
+                if items:
+                    for item in items:
+                        msg += f"{idx}. {item.get('product_name', 'نامشخص')} - تعداد: {item.get('quantity', 0)}\n"
+                        msg += f"   وضعیت: {order.get('status_display', 'نامشخص')}\n\n"
+            await message.answer(msg)
+        else:
+            await message.answer("هیچ سفارشی یافت نشد یا خطا در دریافت اطلاعات.")
+    else:
+        await message.answer("خطا در ارتباط با سرور. لطفاً مجدداً تلاش کنید.")
+
+async def mechanic_order_text_handler(message: types.Message, user_ctx: UserContext = None):
     """هندلر متن‌های سفارش مکانیک"""
     user_id = message.from_user.id
+    user_ctx = user_ctx or UserContext(user_id)
     
-    # بررسی اینکه آیا کاربر در حال ثبت سفارش است
-    is_mechanic = user_id in mechanic_order_userinfo
-    is_customer = user_id in customer_order_userinfo
-    
-    if not is_mechanic and not is_customer:
+    # پیش‌نویس سفارش کاربر (مکانیک یا مشتری)
+    order_data = user_ctx.order_draft
+    if order_data is None:
         return
+    step = order_data.step
     
-    # انتخاب order_userinfo مناسب
-    order_userinfo = mechanic_order_userinfo if is_mechanic else customer_order_userinfo
-    order_data = order_userinfo[user_id]
-    step = order_data.get('step', '')
-    
-    if step == 'product_name':
+    if step == OrderStep.PRODUCT_NAME:
         # دریافت نام و توضیحات محصول
-        product_text = message.text.strip()
-        
-        # ذخیره نام محصول
-        if 'current_item' not in order_data:
-            order_data['current_item'] = {}
-        order_data['current_item']['product_name'] = product_text
+        order_data.current_item.product_name = message.text.strip()
         
         # تغییر مرحله به دریافت تعداد
-        order_data['step'] = 'quantity'
+        order_data.step = OrderStep.QUANTITY
         
         await message.answer("🔢 لطفاً تعداد مورد نیاز را وارد کنید:")
         
-    elif step == 'quantity':
+    elif step == OrderStep.QUANTITY:
         # دریافت تعداد
         try:
             quantity = int(message.text.strip())
@@ -143,7 +136,7 @@ async def mechanic_order_text_handler(message: types.Message):
                 return
             
             # ذخیره تعداد
-            order_data['current_item']['quantity'] = quantity
+            order_data.current_item.quantity = quantity
             
             # پرسیدن درباره عکس
             keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -158,71 +151,45 @@ async def mechanic_order_text_handler(message: types.Message):
             
     else:
         # اگر در مرحله نامشخصی هستیم، دوباره شروع کنیم
-        order_data['step'] = 'product_name'
-        order_data['current_item'] = {}
+        order_data.step = OrderStep.PRODUCT_NAME
+        order_data.current_item = OrderItem()
         await message.answer("لطفاً نام محصول اول و کیفیت (ایرانی ، شرکتی ، وارداتی )آن را وارد کنید:📝")
 
-async def mechanic_order_photo_handler(message: types.Message):
+async def mechanic_order_photo_handler(message: types.Message, user_ctx: UserContext = None):
     """هندلر عکس‌های سفارش"""
     user_id = message.from_user.id
+    user_ctx = user_ctx or UserContext(user_id)
     
-    # بررسی اینکه آیا کاربر در حال ثبت سفارش است
-    is_mechanic = user_id in mechanic_order_userinfo
-    is_customer = user_id in customer_order_userinfo
-    
-    if not is_mechanic and not is_customer:
+    # پیش‌نویس سفارش کاربر (مکانیک یا مشتری)
+    order_data = user_ctx.order_draft
+    if order_data is None:
         return
     
-    # انتخاب order_userinfo مناسب
-    order_userinfo = mechanic_order_userinfo if is_mechanic else customer_order_userinfo
-    order_data = order_userinfo[user_id]
-    step = order_data.get('step', '')
-    
-    if step == 'waiting_photo':
-        # ذخیره عکس
-        if 'current_item' not in order_data:
-            order_data['current_item'] = {}
-        
+    if order_data.step == OrderStep.WAITING_PHOTO:
         # ذخیره file_id عکس
         if message.photo:
-            order_data['current_item']['photo_file_id'] = message.photo[-1].file_id
+            order_data.current_item.photo_file_id = message.photo[-1].file_id
         
         await message.answer("✅ عکس دریافت شد!")
         
         # پرسیدن برای ادامه یا پایان
-        await ask_continue_or_finish(message, user_id)
+        await ask_continue_or_finish(message, user_id, user_ctx)
         
     else:
         await message.answer("❌ در حال حاضر نیازی به عکس نیست.")
 
-async def ask_continue_or_finish(message: types.Message, user_id: int):
+async def ask_continue_or_finish(message: types.Message, user_id: int, user_ctx: UserContext = None):
     """پرسیدن از کاربر برای ادامه یا پایان سفارش"""
-    # بررسی اینکه آیا کاربر در حال ثبت سفارش است
-    is_mechanic = user_id in mechanic_order_userinfo
-    is_customer = user_id in customer_order_userinfo
-    
-    if not is_mechanic and not is_customer:
+    user_ctx = user_ctx or UserContext(user_id)
+    order_data = user_ctx.order_draft
+    if order_data is None:
         await message.answer("❌ شما در حال ثبت سفارش نیستید.")
         return
     
-    # انتخاب order_userinfo مناسب
-    order_userinfo = mechanic_order_userinfo if is_mechanic else customer_order_userinfo
-    order_data = order_userinfo[user_id]
-    
-    # ذخیره آیتم فعلی
-    current_item = order_data.get('current_item', {})
-    if current_item.get('product_name') and current_item.get('quantity'):
-        if 'items' not in order_data:
-            order_data['items'] = []
-        # کپی کامل آیتم شامل عکس
-        item_copy = current_item.copy()
-        if 'photo_file_id' in current_item:
-            item_copy['photo_file_id'] = current_item['photo_file_id']
-        order_data['items'].append(item_copy)
-        logging.info(f"[BOT] Added item to order: {item_copy}")
-    
-    # پاک کردن آیتم فعلی
-    order_data['current_item'] = {}
+    # ذخیره آیتم فعلی و شروع آیتم جدید
+    item = order_data.commit_current_item()
+    if item:
+        logging.info(f"[BOT] Added item to order: {item}")
     
     # نمایش گزینه‌ها
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -232,75 +199,54 @@ async def ask_continue_or_finish(message: types.Message, user_id: int):
     
     await message.answer("آیا می‌خواهید آیتم جدیدی اضافه کنید یا سفارش را نهایی کنید؟", reply_markup=keyboard)
 
-async def order_callback_handler(callback_query: types.CallbackQuery):
+async def order_callback_handler(callback_query: types.CallbackQuery, user_ctx: UserContext = None):
     """هندلر callback های سفارش (عکس، اضافه آیتم، پایان)"""
     if not callback_query.data:
         return
         
     user_id = callback_query.from_user.id
     data = callback_query.data
+    user_ctx = user_ctx or UserContext(user_id)
     
     # بررسی اینکه آیا کاربر در حال ثبت سفارش است
-    is_mechanic = user_id in mechanic_order_userinfo
-    is_customer = user_id in customer_order_userinfo
-    
-    if not is_mechanic and not is_customer:
+    order_userinfo = user_ctx.order_table
+    if order_userinfo is None:
         await callback_query.answer("❌ شما در حال ثبت سفارش نیستید.")
         return
     
-    # انتخاب order_userinfo مناسب
-    order_userinfo = mechanic_order_userinfo if is_mechanic else customer_order_userinfo
-    
     if data.startswith("photo_yes_"):
         # کاربر عکس دارد
-        order_data = order_userinfo[user_id]
-        order_data['step'] = 'waiting_photo'
+        order_data = user_ctx.order_draft
+        order_data.step = OrderStep.WAITING_PHOTO
         if callback_query.message:
             await callback_query.message.answer("📷 لطفاً عکس محصول را ارسال کنید:")
             
     elif data.startswith("photo_no_"):
         # کاربر عکس ندارد
         if callback_query.message:
-            await ask_continue_or_finish(callback_query.message, user_id)
+            await ask_continue_or_finish(callback_query.message, user_id, user_ctx)
             
     elif data.startswith("add_item_"):
         # اضافه کردن آیتم جدید
-        order_data = order_userinfo[user_id]
+        order_data = user_ctx.order_draft
         
-        # ذخیره آیتم فعلی
-        current_item = order_data.get('current_item', {})
-        if current_item.get('product_name') and current_item.get('quantity'):
-            if 'items' not in order_data:
-                order_data['items'] = []
-            # کپی کامل آیتم شامل عکس
-            item_copy = current_item.copy()
-            if 'photo_file_id' in current_item:
-                item_copy['photo_file_id'] = current_item['photo_file_id']
-            order_data['items'].append(item_copy)
-            logging.info(f"[BOT] Added item to order in callback: {item_copy}")
-        
-        # شروع آیتم جدید
-        order_data['current_item'] = {}
-        order_data['step'] = 'product_name'
+        # ذخیره آیتم فعلی و شروع آیتم جدید
+        item = order_data.commit_current_item()
+        if item:
+            logging.info(f"[BOT] Added item to order in callback: {item}")
+        order_data.step = OrderStep.PRODUCT_NAME
         
         if callback_query.message:
             await callback_query.message.answer("لطفاً نام محصول اول و کیفیت (ایرانی ، شرکتی ، وارداتی )آن را وارد کنید:📝")
             
     elif data.startswith("finish_order_"):
         # پایان سفارش و نمایش خلاصه
-        order_data = order_userinfo[user_id]
+        order_data = user_ctx.order_draft
         
         # ذخیره آیتم آخر
-        current_item = order_data.get('current_item', {})
-        if current_item.get('product_name') and current_item.get('quantity'):
-            if 'items' not in order_data:
-                order_data['items'] = []
-            # کپی کامل آیتم شامل عکس
-            item_copy = current_item.copy()
-            if 'photo_file_id' in current_item:
-                item_copy['photo_file_id'] = current_item['photo_file_id']
-            order_data['items'].append(item_copy)
-            logging.info(f"[BOT] Added final item to order: {item_copy}")
+        item = order_data.commit_current_item()
+        if item:
+            logging.info(f"[BOT] Added final item to order: {item}")
         
         # نمایش خلاصه سفارش
         await show_order_summary(callback_query.message, user_id)
@@ -319,8 +265,7 @@ async def show_order_summary(message: types.Message, user_id: int):
     
     # انتخاب order_userinfo مناسب
     order_userinfo = mechanic_order_userinfo if is_mechanic else customer_order_userinfo
-    order_data = order_userinfo[user_id]
-    items = order_data.get('items', [])
+    items = order_userinfo.peek(user_id).items
     
     if not items:
         await message.answer("❌ هیچ آیتمی در سفارش وجود ندارد.")
@@ -330,9 +275,9 @@ async def show_order_summary(message: types.Message, user_id: int):
     summary = "📋 خلاصه سفارش شما:\n\n"
     
     for idx, item in enumerate(items, 1):
-        summary += f"{idx}. 📝 {item['product_name']}\n"
-        summary += f"   🔢 تعداد: {item['quantity']}\n"
-        if item.get('photo_file_id'):
+        summary += f"{idx}. 📝 {item.product_name}\n"
+        summary += f"   🔢 تعداد: {item.quantity}\n"
+        if item.photo_file_id:
             summary += f"   📷 عکس: ✅\n"
         else:
             summary += f"   📷 عکس: ❌\n"
@@ -360,29 +305,22 @@ async def final_order_callback_handler(callback_query: types.CallbackQuery):
     order_userinfo = mechanic_order_userinfo if is_mechanic else customer_order_userinfo
     if callback_query.data.startswith("final_confirm_"):
         logging.info(f"[BOT] final_order_callback_handler called for user {user_id}")
-        order_data = order_userinfo[user_id]
-        items = order_data.get('items', [])
+        order_data = order_userinfo.peek(user_id)
+        items = order_data.items
         if not items:
             if callback_query.message:
                 await callback_query.message.answer("❌ هیچ آیتمی در سفارش وجود ندارد.")
             return
-        PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
         # آماده‌سازی داده‌ها و فایل‌ها
         formatted_items = []
         files = {}
         for idx, item in enumerate(items):
-            formatted_item = {
-                'product_name': item.get('product_name', ''),
-                'quantity': item.get('quantity', 0),
-                'unit_price': item.get('unit_price', 0),
-                'total_price': item.get('total_price', 0),
-                'photo': None
-            }
-            if item.get('photo_file_id'):
+            formatted_item = item.to_payload()
+            formatted_item['photo'] = None
+            if item.photo_file_id:
                 # دانلود عکس از تلگرام و ذخیره موقت
                 try:
-                    photo_file_id = item['photo_file_id']
-                    photo = await callback_query.bot.get_file(photo_file_id)
+                    photo = await callback_query.bot.get_file(item.photo_file_id)
                     with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp:
                         await callback_query.bot.download_file(photo.file_path, tmp.name)
                         files[f'item_{idx+1}_photo'] = open(tmp.name, 'rb')
@@ -393,10 +331,10 @@ async def final_order_callback_handler(callback_query: types.CallbackQuery):
         # آماده‌سازی فرم دیتا
         from aiohttp import FormData
         form = FormData()
-        # اطلاعات مشتری
-        customer_name = order_data.get('customer_name', '')
-        customer_phone = order_data.get('customer_phone', '')
-        customer_address = order_data.get('customer_address', '')
+        # اطلاعات مشتری (در پیش‌نویس سفارش ربات جمع‌آوری نمی‌شود)
+        customer_name = ''
+        customer_phone = ''
+        customer_address = ''
         telegram_id = str(user_id)
         form.add_field('customer_name', customer_name)
         form.add_field('customer_phone', customer_phone)
@@ -409,38 +347,32 @@ async def final_order_callback_handler(callback_query: types.CallbackQuery):
             form.add_field(key, file, filename=f'{key}.jpg', content_type='image/jpeg')
         try:
             # ارسال سفارش به پنل با فایل‌ها
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{PANEL_API_BASE_URL}/api/create_order",
-                    data=form,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as resp:
-                    if resp.status == 200:
-                        response_data = await resp.json()
-                        if response_data.get('success'):
-                            order_id = response_data.get('order_id')
-                            await send_order_notification(order_id, customer_name)
-                            from app.handlers.receipt_handlers import set_receipt_waiting_state
-                            set_receipt_waiting_state(user_id, order_id)
-                            asyncio.create_task(check_order_status_periodically(order_id, user_id, callback_query.bot))
-                            if callback_query.message:
-                                await callback_query.message.answer(
-                                    f"✅ سفارش شما ثبت شد.\nشناسه سفارش: {order_id}\nمنتظر تایید ادمین هستیم. به محض تایید، قیمت‌ها و جزئیات پرداخت برای شما ارسال خواهد شد.\n\n"
-                                )
-                            del order_userinfo[user_id]
-                            logging.info(f"[BOT] Order {order_id} submitted successfully by {'mechanic' if is_mechanic else 'customer'} {user_id}")
-                        else:
-                            error_msg = response_data.get('message', 'خطای نامشخص')
-                            if callback_query.message:
-                                await callback_query.message.answer(f"❌ خطا در ثبت سفارش: {error_msg}")
-                    elif resp.status == 400:
-                        response_data = await resp.json()
-                        error_msg = response_data.get('message', 'خطای نامشخص')
-                        if callback_query.message:
-                            await callback_query.message.answer(f"❌ خطا در ثبت سفارش: {error_msg}")
-                    else:
-                        if callback_query.message:
-                            await callback_query.message.answer("❌ خطا در ارتباط با سرور.")
+            status_code, response_data = await get_panel_client().create_order(form)
+            if status_code == 200 and response_data is not None:
+                if response_data.get('success'):
+                    order_id = response_data.get('order_id')
+                    invalidate_pending_order_cache(user_id)
+                    await send_order_notification(order_id, customer_name)
+                    from app.handlers.receipt_handlers import set_receipt_waiting_state
+                    set_receipt_waiting_state(user_id, order_id)
+                    get_order_watcher().watch(order_id, user_id)
+                    if callback_query.message:
+                        await callback_query.message.answer(
+                            f"✅ سفارش شما ثبت شد.\nشناسه سفارش: {order_id}\nمنتظر تایید ادمین هستیم. به محض تایید، قیمت‌ها و جزئیات پرداخت برای شما ارسال خواهد شد.\n\n"
+                        )
+                    del order_userinfo[user_id]
+                    logging.info(f"[BOT] Order {order_id} submitted successfully by {'mechanic' if is_mechanic else 'customer'} {user_id}")
+                else:
+                    error_msg = response_data.get('message', 'خطای نامشخص')
+                    if callback_query.message:
+                        await callback_query.message.answer(f"❌ خطا در ثبت سفارش: {error_msg}")
+            elif status_code == 400:
+                error_msg = (response_data or {}).get('message', 'خطای نامشخص')
+                if callback_query.message:
+                    await callback_query.message.answer(f"❌ خطا در ثبت سفارش: {error_msg}")
+            else:
+                if callback_query.message:
+                    await callback_query.message.answer("❌ خطا در ارتباط با سرور.")
         except Exception as e:
             logging.error(f"[BOT] Error submitting order for {'mechanic' if is_mechanic else 'customer'} {user_id}: {e}")
             if callback_query.message:
@@ -487,38 +419,9 @@ async def order_confirm_callback_handler(callback_query: types.CallbackQuery):
                 await callback_query.message.answer("❌ شما در حال ثبت سفارش نیستید.")
             return
             
-            # آماده‌سازی payload برای پنل
-            PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
-            order_payload = {
-                'mechanic_id': user_id,
-                'items': [{
-                    'product_name': order_data['product_name'],
-                    'quantity': order_data['quantity']
-                }],
-                'status': 'pending'
-            }
-            
             try:
-                # آماده‌سازی payload برای API جدید
-                items = order_data.get('items', [])
-                if not items and 'product_name' in order_data and 'quantity' in order_data:
-                    # اگر items خالی است اما product_name و quantity موجود است
-                    items = [{
-                        'product_name': order_data['product_name'],
-                        'quantity': order_data['quantity']
-                    }]
-                
-                # تبدیل آیتم‌ها به فرمت مناسب با عکس‌ها
-                formatted_items = []
-                for item in items:
-                    formatted_item = {
-                        'product_name': item.get('product_name', ''),
-                        'quantity': item.get('quantity', 0),
-                        'unit_price': item.get('unit_price', 0),
-                        'total_price': item.get('total_price', 0),
-                        'photo': item.get('photo_file_id', None)  # اضافه کردن عکس محصول
-                    }
-                    formatted_items.append(formatted_item)
+                # آماده‌سازی payload برای API جدید (آیتم‌ها به همراه عکس محصول)
+                formatted_items = [item.to_payload() for item in order_data.items]
                 
                 order_payload_fixed = {
                     'mechanic_id': user_id,
@@ -530,41 +433,35 @@ async def order_confirm_callback_handler(callback_query: types.CallbackQuery):
                 logging.info(f"[BOT] Original order_data: {order_data}")
                 logging.info(f"[BOT] Items with photos: {formatted_items}")
                 
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        f"{PANEL_API_BASE_URL}/telegram-bot/api/bot/orders",
-                        json=order_payload_fixed,
-                        timeout=aiohttp.ClientTimeout(total=10)
-                    ) as resp:
-                        if resp.status == 200:
-                            response_data = await resp.json()
-                            if response_data.get('success'):
-                                order_id = response_data.get('order_id')
-                                
-                                # ارسال اعلان سفارش جدید به پنل
-                                await send_order_notification(order_id)
-                                
-                                # تنظیم وضعیت انتظار رسید برای کاربر
-                                from app.handlers.receipt_handlers import set_receipt_waiting_state
-                                set_receipt_waiting_state(user_id, order_id)
-                                
-                                if callback_query.message:
-                                    await callback_query.message.answer(
-                                        f"✅ سفارش شما با موفقیت ثبت شد.\nشناسه سفارش: {order_id}\nمنتظر تایید ادمین باشید.\n\n"
-                                        "💡 نکته: اگر قبلاً پرداخت کرده‌اید، می‌توانید رسید پرداخت را ارسال کنید."
-                                    )
-                                
-                                # پاک کردن state
-                                del mechanic_order_userinfo[user_id]
-                                
-                                logging.info(f"[BOT] Order {order_id} submitted successfully by mechanic {user_id}")
-                                
-                            else:
-                                if callback_query.message:
-                                    await callback_query.message.answer("❌ خطا در ثبت سفارش. لطفاً مجدداً تلاش کنید.")
-                        else:
-                            if callback_query.message:
-                                await callback_query.message.answer("❌ خطا در ارتباط با سرور.")
+                status_code, response_data = await get_panel_client().create_bot_order(order_payload_fixed)
+                if status_code == 200 and response_data is not None:
+                    if response_data.get('success'):
+                        order_id = response_data.get('order_id')
+                        
+                        # ارسال اعلان سفارش جدید به پنل
+                        await send_order_notification(order_id)
+                        
+                        # تنظیم وضعیت انتظار رسید برای کاربر
+                        from app.handlers.receipt_handlers import set_receipt_waiting_state
+                        set_receipt_waiting_state(user_id, order_id)
+                        
+                        if callback_query.message:
+                            await callback_query.message.answer(
+                                f"✅ سفارش شما با موفقیت ثبت شد.\nشناسه سفارش: {order_id}\nمنتظر تایید ادمین باشید.\n\n"
+                                "💡 نکته: اگر قبلاً پرداخت کرده‌اید، می‌توانید رسید پرداخت را ارسال کنید."
+                            )
+                        
+                        # پاک کردن state
+                        del mechanic_order_userinfo[user_id]
+                        
+                        logging.info(f"[BOT] Order {order_id} submitted successfully by mechanic {user_id}")
+                        
+                    else:
+                        if callback_query.message:
+                            await callback_query.message.answer("❌ خطا در ثبت سفارش. لطفاً مجدداً تلاش کنید.")
+                else:
+                    if callback_query.message:
+                        await callback_query.message.answer("❌ خطا در ارتباط با سرور.")
                             
             except Exception as e:
                 logging.error(f"[BOT] Error submitting order for mechanic {user_id}: {e}")
@@ -583,20 +480,13 @@ async def order_confirm_callback_handler(callback_query: types.CallbackQuery):
 async def get_product_prices(product_names: list):
     """دریافت قیمت محصولات از پنل"""
     try:
-        PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{PANEL_API_BASE_URL}/telegram-bot/api/bot/products/prices",
-                json={'products': product_names},
-                timeout=aiohttp.ClientTimeout(total=10)
-            ) as resp:
-                if resp.status == 200:
-                    return await resp.json()
-                else:
-                    logging.error(f"❌ خطا در دریافت قیمت‌ها: {resp.status}")
-                    return {'success': False, 'message': 'خطا در دریافت قیمت‌ها'}
-                    
+        status_code, data = await get_panel_client().get_product_prices(product_names)
+        if status_code == 200:
+            return data
+        else:
+            logging.error(f"❌ خطا در دریافت قیمت‌ها: {status_code}")
+            return {'success': False, 'message': 'خطا در دریافت قیمت‌ها'}
+            
     except Exception as e:
         logging.error(f"❌ خطا در دریافت قیمت‌ها: {e}")
         return {'success': False, 'message': 'خطا در دریافت قیمت‌ها'}
@@ -605,62 +495,135 @@ async def get_product_prices(product_names: list):
 async def send_order_notification(order_id: int, customer_name: str = ""):
     """ارسال اعلان سفارش جدید به پنل"""
     try:
-        PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
-        notification_data = {
-            'order_id': order_id,
-            'customer_name': customer_name
-        }
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{PANEL_API_BASE_URL}/notifications/api/order-registered",
-                json=notification_data,
-                timeout=aiohttp.ClientTimeout(total=10)
-            ) as resp:
-                if resp.status == 200:
-                    logging.info(f"📢 اعلان سفارش جدید {order_id} به پنل ارسال شد")
-                else:
-                    logging.error(f"❌ خطا در ارسال اعلان سفارش {order_id}: {resp.status}")
-                    
+        status_code, _ = await get_panel_client().notify_order_registered(order_id, customer_name)
+        if status_code == 200:
+            logging.info(f"📢 اعلان سفارش جدید {order_id} به پنل ارسال شد")
+        else:
+            logging.error(f"❌ خطا در ارسال اعلان سفارش {order_id}: {status_code}")
+            
     except Exception as e:
         logging.error(f"❌ خطا در ارسال اعلان سفارش {order_id}: {e}")
 
+# وضعیت‌هایی که کاربر با داشتن سفارش در آن‌ها نباید سفارش جدید ثبت کند (به ترتیب اولویت)
+PENDING_PAYMENT_STATUSES = [
+    'در انتظار پرداخت',
+    'در انتظار تایید پرداخت', 
+    'در انتظار تایید کاربر',
+    'تایید شده'
+]
+
+# کش کوتاه‌مدت نتیجه بررسی سفارش در انتظار: user_id -> (زمان انقضا، سفارش یا None)
+_pending_order_cache = {}
+
+def invalidate_pending_order_cache(user_id: int):
+    """حذف نتیجه کش شده سفارش در انتظار کاربر (پس از ثبت/تایید/لغو سفارش)"""
+    _pending_order_cache.pop(user_id, None)
+
 async def check_pending_payment_orders(user_id: int):
     """بررسی سفارش‌های در انتظار پرداخت کاربر"""
+    cached = _pending_order_cache.get(user_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    # پنل در دسترس نیست (مدار باز): آخرین نتیجه کش شده حتی اگر منقضی باشد
+    if cached and get_panel_client().breaker.is_open:
+        return cached[1]
+    
     try:
-        PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
-        
-        # بررسی سفارش‌های با وضعیت‌های مختلف که کاربر نباید سفارش جدید ثبت کند
-        pending_statuses = [
-            'در انتظار پرداخت',
-            'در انتظار تایید پرداخت', 
-            'در انتظار تایید کاربر',
-            'تایید شده'
-        ]
+        if BotConfig.PANEL_MULTI_STATUS_QUERY:
+            order, complete = await _find_pending_order_combined(user_id)
+        else:
+            order, complete = await _find_pending_order_fanout(user_id)
         
-        for status in pending_statuses:
-            api_url = f"{PANEL_API_BASE_URL}/telegram-bot/api/orders?telegram_id={user_id}&status={status}"
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(api_url) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if data.get('success') and data.get('data'):
-                            orders = data['data']
-                            if orders:
-                                # اگر سفارشی با این وضعیت پیدا شد، آن را برگردان
-                                order = orders[0]
-                                logging.info(f"[BOT] Found pending order for user {user_id} with status: {status}")
-                                return order
+        # فقط نتیجه کامل (بدون خطا یا timeout) کش می‌شود
+        if complete:
+            _pending_order_cache[user_id] = (time.monotonic() + BotConfig.PENDING_ORDER_CACHE_TTL, order)
         
-        # اگر هیچ سفارش در انتظاری پیدا نشد، null برگردان
-        logging.info(f"[BOT] No pending orders found for user {user_id}")
-        return None
+        if order:
+            logging.info(f"[BOT] Found pending order for user {user_id} with status: {order.get('status')}")
+        else:
+            # اگر هیچ سفارش در انتظاری پیدا نشد، null برگردان
+            logging.info(f"[BOT] No pending orders found for user {user_id}")
+        return order
         
     except Exception as e:
         logging.error(f"[BOT] Error checking pending payment orders for user {user_id}: {e}")
         return None
 
+async def _find_pending_order_combined(user_id: int):
+    """یک درخواست با چند وضعیت (برای پنل‌هایی که فیلتر چندتایی status را پشتیبانی می‌کنند)"""
+    status_code, data = await get_panel_client().list_orders(
+        telegram_id=user_id,
+        status=",".join(PENDING_PAYMENT_STATUSES),
+        timeout=BotConfig.PENDING_ORDER_DEADLINE,
+    )
+    if status_code != 200 or not data or not data.get('success'):
+        return None, False
+    
+    orders = data.get('data') or []
+    for status in PENDING_PAYMENT_STATUSES:
+        for order in orders:
+            if order.get('status') == status:
+                return order, True
+    return None, True
+
+async def _find_pending_order_fanout(user_id: int):
+    """
+    ارسال همزمان درخواست برای تمام وضعیت‌ها با یک مهلت کلی
+    به محض اینکه وضعیت با بالاترین اولویتِ دارای سفارش مشخص شود، نتیجه برگردانده می‌شود
+    خروجی: (سفارش یا None، آیا همه پاسخ‌ها بدون خطا دریافت شد)
+    """
+    panel_client = get_panel_client()
+    deadline = BotConfig.PENDING_ORDER_DEADLINE
+    
+    async def probe(status):
+        status_code, data = await panel_client.list_orders(telegram_id=user_id, status=status, timeout=deadline)
+        if status_code != 200 or not data:
+            raise RuntimeError(f"HTTP {status_code}")
+        if data.get('success') and data.get('data'):
+            return data['data'][0]
+        return None
+    
+    tasks = {asyncio.ensure_future(probe(status)): idx for idx, status in enumerate(PENDING_PAYMENT_STATUSES)}
+    unresolved = object()
+    results = [unresolved] * len(tasks)
+    complete = True
+    loop = asyncio.get_running_loop()
+    end_time = loop.time() + deadline
+    pending = set(tasks)
+    
+    try:
+        while pending:
+            remaining = end_time - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    results[tasks[task]] = task.result()
+                except Exception as e:
+                    logging.warning(f"[BOT] Pending order probe failed for user {user_id}: {e}")
+                    results[tasks[task]] = None
+                    complete = False
+            
+            # اولین وضعیت (به ترتیب اولویت) که پاسخ داده و سفارش دارد، در صورتی که وضعیت‌های بالاتر همه پاسخ منفی داده باشند
+            for result in results:
+                if result is unresolved:
+                    break
+                if result:
+                    return result, complete
+            else:
+                return None, complete
+    finally:
+        for task in pending:
+            task.cancel()
+    
+    # مهلت تمام شد - بهترین نتیجه دریافت شده
+    logging.warning(f"[BOT] Pending order lookup for user {user_id} hit the {deadline}s deadline")
+    for result in results:
+        if result is not unresolved and result:
+            return result, False
+    return None, False
+
 async def show_pending_payment_order(message: types.Message, order_data: dict):
     """نمایش سفارش در انتظار پرداخت"""
     try:
@@ -772,8 +735,8 @@ async def show_pending_payment_order(message: types.Message, order_data: dict):
         logging.error(f"[BOT] Error showing pending payment order: {e}")
         await message.answer("❌ خطا در نمایش سفارش در انتظار پرداخت.")
 
-async def check_paid_orders_status(user_id: int):
-    """بررسی وضعیت سفارش‌های پرداخت شده و اطلاع‌رسانی به کاربر"""
+async def check_paid_orders_status(user_id: int, bot):
+    """بررسی وضعیت سفارش‌های پرداخت شده و اطلاع‌رسانی به کاربر (از طریق صف ارسال)"""
     try:
         # بررسی اینکه آیا کاربر در حال ثبت سفارش است
         from app.state_manager import mechanic_order_userinfo, customer_order_userinfo
@@ -782,130 +745,92 @@ async def check_paid_orders_status(user_id: int):
             logging.info(f"[BOT] User {user_id} is currently placing an order - skipping payment check")
             return
         
-        PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
-        
         # بررسی سفارش‌های با وضعیت "پرداخت شده"
-        api_url = f"{PANEL_API_BASE_URL}/telegram-bot/api/orders?telegram_id={user_id}&status=پرداخت شده"
-        
-        timeout = aiohttp.ClientTimeout(total=10)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(api_url) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    if data.get('success') and data.get('data'):
-                        orders = data['data']
-                        if orders:
-                            # اگر سفارش پرداخت شده وجود دارد، اطلاع‌رسانی کن
-                            order = orders[0]
-                            order_id = order.get('id')
-                            items = order.get('items', [])
-                            
-                            msg = f"✅ سفارش شماره {order_id} شما با موفقیت پرداخت شد!\n\n"
-                            msg += "📦 محصولات سفارش شده:\n"
-                            
-                            for item in items:
-                                product_name = item.get('product_name', '')
-                                quantity = item.get('quantity', 0)
-                                msg += f"• {product_name}: {quantity} عدد\n"
-                            
-                            msg += "\n🚚 سفارش شما به آدرس ثبت شده ارسال خواهد شد.\n"
-                            msg += "📞 در صورت نیاز به اطلاعات بیشتر، با پشتیبانی تماس بگیرید."
-                            
-                            # ارسال پیام به کاربر
-                            try:
-                                from aiogram import Bot
-                                from config import BotConfig
-                                bot = Bot(token=BotConfig.BOT_TOKEN)
-                                await bot.send_message(user_id, msg)
-                                
-                                # پاک کردن سفارش از حافظه
-                                try:
-                                    from app.state_manager import clear_user_order_state
-                                    clear_user_order_state(user_id)
-                                except Exception as e:
-                                    logging.warning(f"[BOT] Could not clear user order state for {user_id}: {e}")
-                                
-                                logging.info(f"[BOT] Payment confirmation sent to user {user_id} for order {order_id}")
-                                
-                            except Exception as e:
-                                logging.error(f"[BOT] Error sending payment confirmation to user {user_id}: {e}")
-                            
+        status_code, data = await get_panel_client().list_orders(telegram_id=user_id, status="پرداخت شده", timeout=10)
+        if status_code == 200 and data:
+            if data.get('success') and data.get('data'):
+                orders = data['data']
+                if orders:
+                    # اگر سفارش پرداخت شده وجود دارد، اطلاع‌رسانی کن
+                    order = orders[0]
+                    order_id = order.get('id')
+                    items = order.get('items', [])
+                    
+                    msg = f"✅ سفارش شماره {order_id} شما با موفقیت پرداخت شد!\n\n"
+                    msg += "📦 محصولات سفارش شده:\n"
+                    
+                    for item in items:
+                        product_name = item.get('product_name', '')
+                        quantity = item.get('quantity', 0)
+                        msg += f"• {product_name}: {quantity} عدد\n"
+                    
+                    msg += "\n🚚 سفارش شما به آدرس ثبت شده ارسال خواهد شد.\n"
+                    msg += "📞 در صورت نیاز به اطلاعات بیشتر، با پشتیبانی تماس بگیرید."
+                    
+                    # ارسال پیام به کاربر
+                    try:
+                        await get_send_queue().send_message(bot, user_id, msg)
+                        
+                        # پاک کردن سفارش از حافظه
+                        try:
+                            from app.state_manager import clear_user_order_state
+                            clear_user_order_state(user_id)
+                        except Exception as e:
+                            logging.warning(f"[BOT] Could not clear user order state for {user_id}: {e}")
+                        
+                        logging.info(f"[BOT] Payment confirmation sent to user {user_id} for order {order_id}")
+                        
+                    except Exception as e:
+                        logging.error(f"[BOT] Error sending payment confirmation to user {user_id}: {e}")
+                    
     except Exception as e:
         logging.error(f"[BOT] Error checking paid orders status for user {user_id}: {e}")
 
-def register_order_handlers(dp):
-    """ثبت handler های سفارش"""
-    # Handler های منوی اصلی
-    dp.message.register(mechanic_menu_handler, lambda message: message.text in ["📝 ثبت سفارش", "📦 سفارشات من", "👤 پروفایل من", "📞 پشتیبانی"])
-    dp.message.register(customer_menu_handler, lambda message: message.text in ["📝 ثبت سفارش", "📦 سفارشات من", "📞 پشتیبانی"])
+def register_order_handlers(router):
+    """ثبت handler های سفارش در جدول مسیریابی (app/update_router.py)"""
+    # Handler های منوی اصلی (متن تکراری به هندلر ثبت شده قبلی می‌رسد)
+    router.text(mechanic_menu_handler, "📝 ثبت سفارش", "📦 سفارشات من", "👤 پروفایل من", "📞 پشتیبانی")
+    router.text(customer_menu_handler, "📝 ثبت سفارش", "📦 سفارشات من", "📞 پشتیبانی")
     
     # Handler های پردازش متن و عکس سفارش (برای مکانیک و مشتری)
-    dp.message.register(mechanic_order_text_handler, lambda message: (message.from_user.id in mechanic_order_userinfo or message.from_user.id in customer_order_userinfo) and not message.photo)
-    dp.message.register(mechanic_order_photo_handler, lambda message: (message.from_user.id in mechanic_order_userinfo or message.from_user.id in customer_order_userinfo) and message.photo)
+    router.message_when(mechanic_order_text_handler, lambda message, ctx: not message.photo and ctx.has_order_draft)
+    router.message_when(mechanic_order_photo_handler, lambda message, ctx: bool(message.photo) and ctx.has_order_draft)
     
     # Handler های callback
-    dp.callback_query.register(order_callback_handler, lambda c: c.data and any(c.data.startswith(prefix) for prefix in ["photo_", "add_item_", "finish_order_"]))
-    dp.callback_query.register(final_order_callback_handler, lambda c: c.data and (c.data.startswith("final_confirm_") or c.data.startswith("final_cancel_")))
+    router.callback(order_callback_handler, "photo_", "add_item_", "finish_order_")
+    router.callback(final_order_callback_handler, "final_confirm_", "final_cancel_")
     
     # Handler callback برای تایید/لغو سفارش
-    dp.callback_query.register(
-        order_final_callback_handler, 
-        lambda c: c.data.startswith("order_final_confirm_") or c.data.startswith("order_final_cancel_")
-    )
+    router.callback(order_final_callback_handler, "order_final_confirm_", "order_final_cancel_")
     
     # Handler callback برای تایید/لغو پرداخت
-    dp.callback_query.register(
-        payment_callback_handler,
-        lambda c: c.data.startswith("confirm_payment_") or c.data.startswith("cancel_order_")
-    )
+    router.callback(payment_callback_handler, "confirm_payment_", "cancel_order_")
 
-async def customer_menu_handler(message: types.Message):
+async def customer_menu_handler(message: types.Message, user_ctx: UserContext = None):
     """هندلر منوی مشتریان"""
     if not message or not hasattr(message, 'from_user') or not hasattr(message.from_user, 'id') or not hasattr(message, 'answer'):
         return
     user_id = getattr(getattr(message, 'from_user', None), 'id', None)
     if user_id is None:
         return
+    user_ctx = user_ctx or UserContext(user_id)
     
     # بررسی سفارش‌های در انتظار پرداخت (فقط اگر کاربر در حال ثبت سفارش نیست)
-    from app.state_manager import mechanic_order_userinfo, customer_order_userinfo
-    if user_id not in mechanic_order_userinfo and user_id not in customer_order_userinfo:
+    if not user_ctx.has_order_draft:
         pending_order = await check_pending_payment_orders(user_id)
         if pending_order:
             await show_pending_payment_order(message, pending_order)
             return
     
     if hasattr(message, 'text') and message.text == "📝 ثبت سفارش":
-        customer_order_userinfo[user_id] = {"step": "product_name", "current_item": {}, "items": []}
+        customer_order_userinfo[user_id] = OrderDraft()
         await message.answer("لطفاً نام محصول اول و کیفیت (ایرانی ، شرکتی ، وارداتی )آن را وارد کنید:📝")
         logging.info(f"[BOT] Customer {user_id} started multi-item order process.")
         
     elif hasattr(message, 'text') and message.text == "📦 سفارشات من":
         # نمایش تاریخچه سفارشات مشتری
-        PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
-        api_url = f"{PANEL_API_BASE_URL}/telegram-bot/api/orders?telegram_id={user_id}&limit=10"
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(api_url) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if data.get('success') and data.get('data'):
-                            orders = data['data']
-                            if not orders:
-                                await message.answer("شما هیچ سفارشی ثبت نکرده‌اید.")
-                                return
-                            msg = "✉️ تاریخچه سفارشات اخیر شما:\n\n"
-                            for idx, order in enumerate(orders, 1):
-                                items = order.get('items', [])
-                                if items:
-                                    for item in items:
-                                        msg += f"{idx}. {item.get('product_name', 'نامشخص')} - تعداد: {item.get('quantity', 0)}\n"
-                                        msg += f"   وضعیت: {order.get('status_display', 'نامشخص')}\n\n"
-                            await message.answer(msg)
-                        else:
-                            await message.answer("هیچ سفارشی یافت نشد یا خطا در دریافت اطلاعات.")
-                    else:
-                        await message.answer("خطا در ارتباط با سرور. لطفاً مجدداً تلاش کنید.")
+            await show_order_history(message, user_id)
         except Exception as e:
             await message.answer("خطا در دریافت تاریخچه سفارشات.")
             logging.error(f"[BOT] Error fetching order history for user {user_id}: {e}")
@@ -919,93 +844,38 @@ async def order_final_callback_handler(callback_query: types.CallbackQuery):
     import logging
     user_id = callback_query.from_user.id
     data = callback_query.data
-    bot = callback_query.bot
     await callback_query.answer()
     
     # استخراج order_id از callback_data
     if data.startswith("order_final_confirm_"):
         order_id = int(data.split("_")[-1])
         # اطلاع به پنل که سفارش تایید شد
-        PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
-        url = f"{PANEL_API_BASE_URL}/bot-orders/api/order_status/{order_id}/confirm"
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json={"telegram_id": user_id}) as resp:
-                    if resp.status == 200:
-                        await callback_query.message.answer("✅ سفارش تایید شد. منتظر پردازش باشید.")
-                        # شروع چک کردن وضعیت سفارش
-                        asyncio.create_task(check_order_status_periodically(order_id, user_id, bot))
-                    else:
-                        await callback_query.message.answer("خطا در تایید سفارش. لطفاً مجدداً تلاش کنید.")
+            status_code, _ = await get_panel_client().confirm_order(order_id, user_id)
+            invalidate_pending_order_cache(user_id)
+            if status_code == 200:
+                await callback_query.message.answer("✅ سفارش تایید شد. منتظر پردازش باشید.")
+                # پیگیری وضعیت سفارش توسط سرویس مرکزی (بدون پیگیری تکراری)
+                get_order_watcher().watch(order_id, user_id)
+            else:
+                await callback_query.message.answer("خطا در تایید سفارش. لطفاً مجدداً تلاش کنید.")
         except Exception as e:
             logging.error(f"[BOT] Error confirming order: {e}")
             await callback_query.message.answer("خطا در ارتباط با سرور.")
     elif data.startswith("order_final_cancel_"):
         order_id = int(data.split("_")[-1])
         # اطلاع به پنل که سفارش لغو شد
-        PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
-        url = f"{PANEL_API_BASE_URL}/bot-orders/api/order_status/{order_id}/cancel"
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json={"telegram_id": user_id, "cancel": True}) as resp:
-                    if resp.status == 200:
-                        await callback_query.message.answer("سفارش لغو شد.")
-                    else:
-                        await callback_query.message.answer("خطا در لغو سفارش. لطفاً مجدداً تلاش کنید.")
+            status_code, _ = await get_panel_client().cancel_order(order_id, user_id)
+            invalidate_pending_order_cache(user_id)
+            if status_code == 200:
+                await callback_query.message.answer("سفارش لغو شد.")
+            else:
+                await callback_query.message.answer("خطا در لغو سفارش. لطفاً مجدداً تلاش کنید.")
         except Exception as e:
             logging.error(f"[BOT] Error cancelling order: {e}")
             await callback_query.message.answer("خطا در ارتباط با سرور.")
 
-async def check_order_status_periodically(order_id, user_id, bot):
-    """چک کردن وضعیت سفارش به صورت دوره‌ای"""
-    import logging
-    PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
-    status_url = f"{PANEL_API_BASE_URL}/telegram-bot/api/orders/{order_id}"
-    last_status = None
-    
-    while True:
-        await asyncio.sleep(30)  # چک هر 30 ثانیه
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(status_url) as resp:
-                    if resp.status == 200:
-                        response_data = await resp.json()
-                        if response_data.get('success'):
-                            data = response_data.get('data', {})
-                            logging.info(f"[BOT] Checked order status for {user_id} order {order_id}: {data}")
-                            
-                            current_status = data.get("status")
-                            if current_status != last_status:
-                                last_status = current_status
-                                
-                                if current_status == "در انتظار تایید کاربر":
-                                    # ادمین سفارش را تایید کرده و قیمت‌ها را وارد کرده
-                                    await show_order_summary_with_prices(order_id, user_id, bot, data)
-                                    
-                                elif current_status == "در انتظار پرداخت":
-                                    # کاربر سفارش را تایید کرده
-                                    await show_payment_details(order_id, user_id, bot, data)
-                                    
-                                elif current_status == "در انتظار تایید پرداخت":
-                                    # کاربر رسید را ارسال کرده
-                                    await bot.send_message(user_id, "✅ رسید پرداخت شما دریافت شد و در حال بررسی است.")
-                                    
-                                elif current_status == "تکمیل شده":
-                                    await bot.send_message(user_id, "✅ سفارش شما با موفقیت تکمیل شد و به آدرس شما ارسال خواهد شد!")
-                                    logging.info(f"[BOT] Order completion notification sent to user {user_id}")
-                                    break
-                                    
-                                elif current_status == "لغو شده":
-                                    await bot.send_message(user_id, "❌ سفارش شما لغو شد.")
-                                    logging.info(f"[BOT] Order cancellation notification sent to user {user_id}")
-                                    break
-                    else:
-                        logging.warning(f"[BOT] Status check failed for order {order_id}: status={resp.status}")
-                        
-        except Exception as e:
-            logging.error(f"[BOT] Exception in order status check for {order_id}: {e}")
-
-
 async def show_order_summary_with_prices(order_id, user_id, bot, order_data):
     """نمایش خلاصه سفارش با قیمت‌ها"""
     try:
@@ -1014,21 +884,18 @@ async def show_order_summary_with_prices(order_id, user_id, bot, order_data):
         
         # اگر قیمت‌ها صفر هستند، از API دریافت کن
         if not items or all(item.get('unit_price', 0) == 0 for item in items):
-            PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(f"{PANEL_API_BASE_URL}/telegram-bot/api/orders/{order_id}") as resp:
-                        if resp.status == 200:
-                            response_data = await resp.json()
-                            if response_data.get('success'):
-                                order_data = response_data.get('data', {})
-                                items = order_data.get('items', [])
-                                total_amount = order_data.get('total_amount', 0)
-                                logging.info(f"[BOT] Retrieved order data from API: {order_data}")
-                            else:
-                                logging.error(f"[BOT] API returned error: {response_data}")
-                        else:
-                            logging.error(f"[BOT] API request failed with status {resp.status}")
+                status_code, response_data = await get_panel_client().get_order(order_id)
+                if status_code == 200 and response_data is not None:
+                    if response_data.get('success'):
+                        order_data = response_data.get('data', {})
+                        items = order_data.get('items', [])
+                        total_amount = order_data.get('total_amount', 0)
+                        logging.info(f"[BOT] Retrieved order data from API: {order_data}")
+                    else:
+                        logging.error(f"[BOT] API returned error: {response_data}")
+                else:
+                    logging.error(f"[BOT] API request failed with status {status_code}")
             except Exception as e:
                 logging.error(f"[BOT] Error fetching order data from API: {e}")
         
@@ -1063,7 +930,7 @@ async def show_order_summary_with_prices(order_id, user_id, bot, order_data):
             [InlineKeyboardButton(text="❌ لغو سفارش", callback_data=f"cancel_order_{order_id}")]
         ])
         
-        await bot.send_message(user_id, summary_msg, reply_markup=keyboard)
+        await get_send_queue().send_message(bot, user_id, summary_msg, reply_markup=keyboard)
         logging.info(f"[BOT] Order summary with prices sent to user {user_id} for order {order_id}")
         
     except Exception as e:
@@ -1091,7 +958,7 @@ async def show_payment_details(order_id, user_id, bot, order_data):
             "پس از واریز، عکس یا فایل رسید پرداخت را ارسال کنید."
         )
         
-        await bot.send_message(user_id, payment_msg, parse_mode="HTML")
+        await get_send_queue().send_message(bot, user_id, payment_msg, parse_mode="HTML")
         
         # تنظیم وضعیت انتظار رسید
         from app.handlers.receipt_handlers import set_receipt_waiting_state
@@ -1115,24 +982,18 @@ async def payment_callback_handler(callback_query: types.CallbackQuery):
         order_id = callback_query.data.split("_")[-1]
         
         try:
-            PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
-            
             # بروزرسانی وضعیت سفارش به "در انتظار پرداخت"
-            async with aiohttp.ClientSession() as session:
-                async with session.put(
-                    f"{PANEL_API_BASE_URL}/telegram-bot/api/orders/{order_id}/status",
-                    json={'status': 'در انتظار پرداخت'},
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as resp:
-                    if resp.status == 200:
-                        if callback_query.message:
-                            await callback_query.message.answer(
-                                f"✅ سفارش شما تایید شد.\nشناسه سفارش: {order_id}\n"
-                                "جزئیات پرداخت به زودی برای شما ارسال خواهد شد."
-                            )
-                    else:
-                        if callback_query.message:
-                            await callback_query.message.answer("❌ خطا در تایید سفارش.")
+            status_code, _ = await get_panel_client().update_order_status(order_id, 'در انتظار پرداخت')
+            invalidate_pending_order_cache(user_id)
+            if status_code == 200:
+                if callback_query.message:
+                    await callback_query.message.answer(
+                        f"✅ سفارش شما تایید شد.\nشناسه سفارش: {order_id}\n"
+                        "جزئیات پرداخت به زودی برای شما ارسال خواهد شد."
+                    )
+            else:
+                if callback_query.message:
+                    await callback_query.message.answer("❌ خطا در تایید سفارش.")
                             
         except Exception as e:
             logging.error(f"[BOT] Error confirming payment for order {order_id}: {e}")
@@ -1144,21 +1005,15 @@ async def payment_callback_handler(callback_query: types.CallbackQuery):
         order_id = callback_query.data.split("_")[-1]
         
         try:
-            PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
-            
             # بروزرسانی وضعیت سفارش به "لغو شده"
-            async with aiohttp.ClientSession() as session:
-                async with session.put(
-                    f"{PANEL_API_BASE_URL}/telegram-bot/api/orders/{order_id}/status",
-                    json={'status': 'لغو شده'},
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as resp:
-                    if resp.status == 200:
-                        if callback_query.message:
-                            await callback_query.message.answer("❌ سفارش لغو شد.")
-                    else:
-                        if callback_query.message:
-                            await callback_query.message.answer("❌ خطا در لغو سفارش.")
+            status_code, _ = await get_panel_client().update_order_status(order_id, 'لغو شده')
+            invalidate_pending_order_cache(user_id)
+            if status_code == 200:
+                if callback_query.message:
+                    await callback_query.message.answer("❌ سفارش لغو شد.")
+            else:
+                if callback_query.message:
+                    await callback_query.message.answer("❌ خطا در لغو سفارش.")
                             
         except Exception as e:
             logging.error(f"[BOT] Error canceling order {order_id}: {e}")
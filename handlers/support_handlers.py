@@ -3,9 +3,9 @@
 # توضیح: هندلرهای پشتیبانی
 # ---------------------------------------------
 
-from aiogram import types, F
+from aiogram import types
 
-async def simple_support_handler(message: types.Message):
+async def simple_support_handler(message: types.Message, user_ctx=None):
     """هندلر پشتیبانی ساده"""
     import logging
     logger = logging.getLogger(__name__)
@@ -19,8 +19,9 @@ async def simple_support_handler(message: types.Message):
         logger.info(f"Support request from user {user_id}")
         
         # بررسی وضعیت کاربر
-        from app.state_manager import get_mechanic_state_local
-        state = get_mechanic_state_local(user_id)
+        from app.user_context import UserContext
+        user_ctx = user_ctx or UserContext(user_id)
+        state = user_ctx.mechanic_state_local
         
         logger.info(f"User {user_id} state: {state}")
         
@@ -46,6 +47,6 @@ async def simple_support_handler(message: types.Message):
         logger.error(f"Error in support handler: {e}", exc_info=True)
         await message.answer("⛔ خطا در نمایش اطلاعات پشتیبانی. لطفاً دقایقی دیگر مجدداً تلاش کنید.")
 
-def register_support_handlers(dp):
-    """ثبت هندلرهای پشتیبانی"""
-    dp.message.register(simple_support_handler, F.text == "📞 پشتیبانی")
+def register_support_handlers(router):
+    """ثبت هندلرهای پشتیبانی در جدول مسیریابی"""
+    router.text(simple_support_handler, "📞 پشتیبانی")
@@ -22,6 +22,37 @@ from handlers.order_handlers import register_order_handlers
 from handlers.support_handlers import register_support_handlers
 from app.handlers.receipt_handlers import register_receipt_handlers
 from dynamic_menu import get_main_menu
+from app.panel_client import init_panel_client, get_panel_client, close_panel_client
+from app.blocking_guard import install_blocking_guard, monitor_loop_lag
+from app.order_watcher import init_order_watcher
+from app.state_sweeper import init_state_sweeper
+from app.update_router import UpdateRouter
+from app.user_context import setup_user_context
+from app.update_concurrency import setup_update_concurrency
+from app.send_queue import init_send_queue, get_send_queue, close_send_queue
+from app.retry import RetryPolicy
+
+# نگهداری مرجع task های پس‌زمینه تا توسط garbage collector حذف نشوند
+_background_tasks = set()
+
+def start_background_task(coro):
+    """اجرای یک coroutine به صورت task پس‌زمینه با نگهداری مرجع آن"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def stop_background_tasks():
+    """توقف و لغو task های پس‌زمینه (پیگیری سفارشات، پاکسازی وضعیت‌ها و ...) و انتظار برای پایان آن‌ها"""
+    from app.order_watcher import get_order_watcher
+    from app.state_sweeper import get_state_sweeper
+    get_order_watcher().stop()
+    get_state_sweeper().stop()
+    tasks = list(_background_tasks)
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 def check_internet_connection():
     """بررسی اتصال اینترنت"""
@@ -93,11 +124,38 @@ async def setup_bot_and_dispatcher():
     bot = Bot(token=BotConfig.BOT_TOKEN)
     dp = Dispatcher()
     
-    # ثبت handlers
-    register_auth_handlers(dp)
-    register_order_handlers(dp)
-    register_support_handlers(dp)
-    register_receipt_handlers(dp)
+    # محافظ فراخوانی‌های blocking روی event loop
+    if BotConfig.BLOCKING_GUARD:
+        install_blocking_guard(strict=BotConfig.BLOCKING_GUARD_STRICT)
+        start_background_task(monitor_loop_lag(threshold=BotConfig.LOOP_LAG_THRESHOLD))
+    
+    # کلاینت مشترک پنل با connection pool (برای تمام هندلرها و polling)
+    panel_client = init_panel_client()
+    logger.info(f"🔌 کلاینت پنل راه‌اندازی شد: {panel_client.base_url}")
+    
+    # سرویس مرکزی پیگیری سفارشات (مجموعه پیگیری از فایل بازیابی می‌شود)
+    order_watcher = init_order_watcher(bot, panel_client=panel_client)
+    start_background_task(order_watcher.run())
+    logger.info(f"👀 سرویس پیگیری سفارشات راه‌اندازی شد ({order_watcher.watched_count} سفارش)")
+    
+    # پاکسازی دوره‌ای وضعیت‌های رها شده
+    start_background_task(init_state_sweeper().run())
+    
+    # صف مرکزی ارسال اطلاع‌رسانی‌ها (محدودیت سراسری و هر چت تلگرام)
+    send_queue = init_send_queue()
+    logger.info(f"📤 صف ارسال: {send_queue.rate} پیام در ثانیه، فاصله {send_queue.chat_interval} ثانیه برای هر چت")
+    
+    # ثبت handlers در جدول مسیریابی (به ترتیب اولویت) و اتصال آن به dispatcher
+    router = UpdateRouter()
+    register_auth_handlers(router)
+    register_order_handlers(router)
+    register_support_handlers(router)
+    register_receipt_handlers(router)
+    router.attach(dp)
+    # وضعیت کاربر یک بار برای هر update (مشترک بین فیلترها و هندلرها)
+    setup_user_context(dp)
+    # updateهای هر چت ترتیبی و چت‌های مختلف همزمان (تا سقف UPDATE_CONCURRENCY)
+    setup_update_concurrency(dp)
     
     logger.info("✅ تمام handlers ثبت شدند")
     
@@ -111,19 +169,16 @@ async def mechanic_status_notify(request):
     bot = request.app["bot"]
 
     if telegram_id and status:
+        # وضعیت کش شده کاربر دیگر معتبر نیست
+        from app.state_manager import invalidate_user_status_cache
+        invalidate_user_status_cache(int(telegram_id))
         if status == "approved":
             # دریافت درصد کمیسیون از پنل
-            import os
-            import aiohttp
-            PANEL_API_BASE_URL = os.getenv("PANEL_API_BASE_URL")
             commission_percent = "N/A"
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(f"{PANEL_API_BASE_URL}/mechanics/api/status?telegram_id={telegram_id}") as resp:
-                        if resp.status == 200:
-                            data = await resp.json()
-                            if data.get('success') and data:
-                                commission_percent = data.get('commission_percentage', 'N/A')
+                status_code, data = await get_panel_client().get_mechanic_status(telegram_id)
+                if status_code == 200 and data and data.get('success'):
+                    commission_percent = data.get('commission_percentage', 'N/A')
             except Exception as e:
                 commission_percent = "N/A"
             # آپدیت وضعیت کاربر به mechanic/approved
@@ -132,10 +187,10 @@ async def mechanic_status_notify(request):
             msg = f"✅ مدارک شما تایید شد و می‌توانید سفارش ثبت کنید.\n\n💰 درصد کمیسیون شما: {commission_percent}%"
             from app.state_manager import get_dynamic_menu
             menu = await get_dynamic_menu(int(telegram_id))
-            await bot.send_message(telegram_id, msg, reply_markup=menu)
+            await get_send_queue().send_message(bot, telegram_id, msg, reply_markup=menu)
         else:
             msg = "❌ متاسفانه مدارک شما تایید نشد. لطفاً با پشتیبانی تماس بگیرید."
-            await bot.send_message(telegram_id, msg)
+            await get_send_queue().send_message(bot, telegram_id, msg)
         return web.json_response({"success": True})
     return web.json_response({"success": False, "error": "Invalid data"}, status=400)
 
@@ -152,16 +207,14 @@ async def order_status_notify(request):
 
     if telegram_id and status and order_id:
         # بررسی ای��که آیا این سفارش قبلاً پرداخت شده اطلاع‌رسانی شده
-        from app.state_manager import is_order_payment_notified, mark_order_payment_notified
+        from app.state_manager import mark_order_payment_notified
         
         if status == "پرداخت شده":
-            if is_order_payment_notified(order_id):
+            # بررسی و علامت‌گذاری در یک مرحله (دفتر مشترک با polling)
+            if not mark_order_payment_notified(order_id):
                 logging.info(f"⚠️ سفارش {order_id} قبلاً پرداخت شده اطلاع‌رسانی شده - پیام ارسال نمی‌شود")
                 return web.json_response({"success": True, "message": "Already notified"})
             
-            # علامت‌گذاری به عنوان اطلاع‌رسانی شده
-            mark_order_payment_notified(order_id)
-            
             msg = f"✅ پرداخت سفارش شماره {order_id} تایید شد!\n\n🎉 سفارش شما نهایی شد و به آدرس شما ارسال خواهد شد.\n\n📦 می‌توانید سفارش جدیدی ثبت کنید."
             
             # پاکسازی وضعیت رسید
@@ -182,7 +235,7 @@ async def order_status_notify(request):
         else:
             msg = f"📋 وضعیت سفارش #{order_id}: {status}"
         
-        await bot.send_message(telegram_id, msg)
+        await get_send_queue().send_message(bot, telegram_id, msg)
         logging.info(f"📤 پیام وضعیت سفارش {order_id} به کاربر {telegram_id} ارسال شد")
         return web.json_response({"success": True})
     
@@ -192,8 +245,9 @@ async def start_polling(bot: Bot, dp: Dispatcher, logger):
     """شروع polling ربات"""
     logger.info("🚀 شروع polling ربات...")
     
-    max_retries = 5
-    retry_delay = 10  # ثانیه
+    # همان سیاست retry پنل: backoff نمایی با jitter از 10 ثانیه
+    retry_policy = RetryPolicy(max_attempts=5, base_delay=10, max_delay=160)
+    max_retries = retry_policy.max_attempts
     
     for attempt in range(max_retries):
         try:
@@ -203,17 +257,17 @@ async def start_polling(bot: Bot, dp: Dispatcher, logger):
             me = await bot.get_me()
             logger.info(f"✅ اتصال به تلگرام برقرار شد. ربات: @{me.username}")
             
-            # شروع polling
-            await dp.start_polling(bot, skip_updates=True)
+            # شروع polling (هر update در task جداگانه؛ ترتیب هر چت توسط app/update_concurrency.py)
+            await dp.start_polling(bot, skip_updates=True, handle_as_tasks=True)
             break
             
         except Exception as e:
             logger.error(f"❌ خطا در تلاش {attempt + 1}: {e}")
             
             if attempt < max_retries - 1:
-                logger.info(f"⏳ انتظار {retry_delay} ثانیه قبل از تلاش بعدی...")
+                retry_delay = retry_policy.backoff(attempt)
+                logger.info(f"⏳ انتظار {retry_delay:.1f} ثانیه قبل از تلاش بعدی...")
                 await asyncio.sleep(retry_delay)
-                retry_delay *= 2  # افزایش زمان انتظار
             else:
                 logger.error("❌ تمام تلاش‌ها ناموفق بود. ربات متوقف می‌شود.")
                 raise
@@ -238,6 +292,8 @@ async def start_webhook(bot: Bot, dp: Dispatcher):
         webhook_requests_handler = SimpleRequestHandler(
             dispatcher=dp,
             bot=bot,
+            # پاسخ فوری به تلگرام و پردازش همزمان updateها (ترتیب هر چت حفظ می‌شود)
+            handle_in_background=BotConfig.UPDATE_CONCURRENCY > 1,
         )
         webhook_requests_handler.register(app, path=BotConfig.WEBHOOK_PATH)
         
@@ -308,7 +364,7 @@ async def main():
             logger.info("🔄 ربات در حالت POLLING اجرا می‌شود")
             # شروع سیستم polling برای بررسی وضعیت کاربران و سفارشات
             from polling_system import PollingSystem
-            polling_system = PollingSystem(bot)
+            polling_system = PollingSystem(bot, panel_client=get_panel_client())
             
             # تنظیم مرجع سراسری برای استفاده در receipt handlers
             from app.handlers.receipt_handlers import set_global_polling_system
@@ -326,6 +382,16 @@ async def main():
     except Exception as e:
         print(f"❌ خطا در راه‌اندازی ربات: {e}")
         raise
+    finally:
+        # توقف سرویس‌های پس‌زمینه پیش از بستن منابعی که از آن‌ها استفاده می‌کنند
+        await stop_background_tasks()
+        # ارسال پیام‌های باقی‌مانده در صف
+        await close_send_queue()
+        # ذخیره تغییرات باقی‌مانده وضعیت‌ها و بستن پایگاه داده وضعیت
+        from app.state_store import close_state_store
+        await close_state_store()
+        # بستن اتصال‌های باز به پنل
+        await close_panel_client()
 
 if __name__ == "__main__":
     try:
@@ -8,36 +8,57 @@
 import asyncio
 import logging
 import os
-import requests
 import aiohttp
-import json
-from datetime import datetime, timedelta
+import time
+from collections import deque
+from datetime import timedelta
 from aiogram import Bot
-from app.state_manager import get_user_status, set_user_status, is_order_payment_notified, mark_order_payment_notified
+from app.state_manager import get_user_status, set_user_status, fetch_user_status, is_order_payment_notified, mark_order_payment_notified
+from app.panel_client import PanelClient, PanelUnavailableError, get_panel_client
+from app.scheduler import PollScheduler
+from app.order_sync import OrderSync, FULL_SCAN_STATUS
+from app.send_queue import get_send_queue
 import sys
 from config import BotConfig
 
 # تنظیم لاگر
 logger = logging.getLogger(__name__)
 
+# وضعیت‌های نهایی سفارش - پس از رسیدن به آن‌ها سفارش از زمان‌بند حذف می‌شود
+ORDER_TERMINAL_STATUSES = {'پرداخت شده', 'payment_confirmed', 'completed', 'rejected', 'لغو شده'}
+# سفارش‌های منتظر پرداخت یا تایید پرداخت با فاصله کوتاه‌تر بررسی می‌شوند
+ORDER_HOT_STATUSES = {'در انتظار پرداخت', 'waiting_for_payment', 'در انتظار تایید پرداخت', 'waiting_for_user_confirmation', 'در انتظار تایید کاربر'}
+
 class PollingSystem:
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, panel_client: PanelClient = None):
         """مقداردهی اولیه"""
         self.bot = bot
+        self.panel_client = panel_client or get_panel_client()
         self.panel_api_base_url = os.getenv("PANEL_API_BASE_URL", "http://127.0.0.1:5000")
         self.is_running = False
-        self.paused_orders = set()  # سفارش‌هایی که polling برایشان متوقف شده
+        self.paused_orders = {}  # سفارش‌هایی که polling برایشان متوقف شده: {order_id: زمان توقف}
         self.polling_interval = 300  # 5 دقیقه برای کاهش تداخل
         self.previous_statuses = {}  # ذخیره وضعیت قبلی کاربران
         self.previous_order_statuses = {}  # ذخیره وضعیت قبلی سفارشات
-        self.notified_orders = set()  # سفارشاتی که اطلاع‌رسانی شده‌اند
-        self.notified_orders_file = os.path.join(os.path.dirname(__file__), 'notified_orders.json')
-        self.load_notified_orders()
+        self.order_status_seen = {}  # زمان آخرین دریافت وضعیت هر سفارش: {order_id: زمان}
         self.last_menu_update = {}  # زمان آخرین به‌روزرسانی منو برای هر کاربر
-        self.connection_retries = 2  # کاهش تعداد تلاش‌های اتصال
-        self.retry_delay = 10  # افزایش تاخیر بین تلاش‌ها
-        self.last_connection_check = 0  # زمان آخرین بررسی اتصال
-        self.connection_check_interval = 60  # افزایش فاصله بررسی اتصال (ثانیه)
+        self.retry_policy = self.panel_client.background_retry_policy  # سیاست تلاش مجدد درخواست‌های polling
+        self.user_check_concurrency = BotConfig.USER_CHECK_CONCURRENCY  # تعداد بررسی همزمان وضعیت کاربران
+        self.user_check_budget = BotConfig.USER_CHECK_BUDGET  # حداکثر زمان بررسی کاربران در هر چرخه (ثانیه)
+        self.deferred_users = []  # کاربرانی که به چرخه بعد موکول شده‌اند
+        self.last_user_cycle_stats = {}  # آمار آخرین چرخه بررسی کاربران
+        self.order_sync = OrderSync(self.panel_client)  # همگام‌سازی افزایشی تغییرات سفارشات با cursor
+        self.scheduler = PollScheduler()  # زمان بررسی بعدی هر سفارش ('order', id) و کاربر ('user', id)
+        self.finished_orders = {}  # سفارش‌هایی که به وضعیت نهایی رسیده‌اند و دیگر زمان‌بندی نمی‌شوند: {order_id: زمان}
+        self.next_full_scan = 0  # زمان همگام‌سازی بعدی تغییرات سفارشات از API
+        self.panel_accessible = None  # آخرین تصمیم اتصال به پنل
+        self.source_duplicates = 0  # تعداد سفارش‌های تکراری بین منابع در آخرین ثبت زمان‌بند
+        self.last_order_cycle_stats = {}  # آمار آخرین چرخه سفارشات
+        # کاربرانی که وضعیتشان به دلیل عدم فعالیت پاکسازی شد از زمان‌بند حذف می‌شوند
+        from app.state_sweeper import get_state_sweeper
+        get_state_sweeper().add_listener(self.on_states_expired)
+        # سفارش‌ها و کاربران جدید هنگام تغییر داده‌ها در زمان‌بند ثبت می‌شوند (بدون پیمایش در هر چرخه)
+        self.watched_tables = self.watch_state_changes()
         logger = logging.getLogger(__name__)
         logger.info(f"🔧 PollingSystem initialized with panel URL: {self.panel_api_base_url}")
         
@@ -46,30 +67,6 @@ class PollingSystem:
             self.polling_interval = 60  # هر 1 دقیقه یکبار فقط در حالت پولینگ
             logger.info(f"⏰ Polling interval set to {self.polling_interval} seconds")
     
-    def load_notified_orders(self):
-        """ب��رگذاری سفارشات اطلاع‌رسانی شده از فایل"""
-        try:
-            if os.path.exists(self.notified_orders_file):
-                with open(self.notified_orders_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.notified_orders = set(data.get('notified_orders', []))
-                    logger.info(f"📋 بارگذاری {len(self.notified_orders)} سفارش اطلاع‌رسانی شده")
-        except Exception as e:
-            logger.error(f"❌ خطا در بارگذاری سفارشات اطلاع‌رسانی شده: {e}")
-    
-    def save_notified_orders(self):
-        """ذخیره سفارشات اطلاع‌رسانی شده در فایل"""
-        try:
-            data = {
-                'notified_orders': list(self.notified_orders),
-                'last_updated': datetime.now().isoformat()
-            }
-            with open(self.notified_orders_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            logger.info(f"💾 ذخیره {len(self.notified_orders)} سفارش اطلاع‌رسانی شده")
-        except Exception as e:
-            logger.error(f"�� خطا در ذخیره سفارشات اطلاع‌رسانی شده: {e}")
-    
     async def start_polling(self):
         """شروع polling system"""
         if BotConfig.USE_WEBHOOK:
@@ -80,58 +77,248 @@ class PollingSystem:
         logger.info("🚀 شروع سیستم polling...")
         logger.info(f"⏰ فاصله بررسی: {self.polling_interval} ثانیه")
         self.is_running = True
-        panel_accessible = False
         
         while self.is_running:
             try:
-                import time
-                current_time = time.time()
+                # ثبت سفارش‌ها و کاربران تغییر یافته در زمان‌بند (فقط کلیدهای تغییر یافته)
+                self.refresh_schedule()
+                full_scan = time.monotonic() >= self.next_full_scan
+                if full_scan:
+                    # پیمایش کامل منابع فقط در همگام‌سازی کامل (شبکه ایمنی برای تغییرات ثبت نشده)
+                    self.prune_order_history()
+                    self.sync_schedule()
                 
-                # بررسی اتصال به پنل فقط در فواصل مشخص
-                if current_time - self.last_connection_check > self.connection_check_interval:
-                    panel_accessible = await self.check_panel_connection()
-                    self.last_connection_check = current_time
-                    
-                    if panel_accessible:
-                        logger.info("✅ اتصال به پنل برقرار است")
-                    else:
-                        logger.warning("��️ عدم اتصال به پنل - کار در حالت آفلاین")
+                # سفارش‌ها و کاربرانی که زمان بررسی‌شان رسیده
+                due = self.scheduler.pop_due()
+                due_orders = [(meta['order_id'], meta['user_id']) for key, meta in due if key[0] == 'order']
+                due_users = [meta['user_id'] for key, meta in due if key[0] == 'user']
                 
-                # بررسی سفارشات فقط در حالت polling
-                logger.info("🔍 شروع بررسی سفارشات...")
-                await self.check_pending_orders()
-
-                # بررسی وضعیت کاربران (مکانیک و مشتری)
-                logger.info("🔍 شروع بررسی وضعیت کاربران...")
-                await self.check_user_statuses()
+                # pipeline سفارشات: جمع‌آوری، حذف تکرار، یک تصمیم اتصال، یک بار دریافت، مقایسه و اطلاع‌رسانی
+                if due_orders or full_scan:
+                    await self.run_order_cycle(due_orders, full_scan)
                 
-                if panel_accessible:
-                    logger.info("✅ چرخه polling با موفقیت تکمیل شد")
-                else:
-                    logger.debug("🔍 چرخه polling تکمیل شد (حالت آفلاین)")
+                if due_users:
+                    logger.info(f"🔍 بررسی {len(due_users)} کاربر سررسید شده...")
+                    await self.check_user_statuses(due_users)
+                
+                if full_scan:
+                    self.next_full_scan = time.monotonic() + self.polling_interval
+                    from app.state_manager import get_user_status_cache_stats
+                    logger.info(f"📊 آمار کش وضعیت کاربران: {get_user_status_cache_stats()}")
+                    from app.user_context import get_user_context_stats
+                    logger.info(f"📊 وضعیت کاربر در updateها (loads/reuses): {get_user_context_stats()}")
+                    from app.update_concurrency import get_update_serializer
+                    if get_update_serializer() is not None:
+                        logger.info(f"📊 پردازش updateها: {get_update_serializer().stats()}")
+                    logger.info(f"📊 صف ارسال پیام‌ها: {get_send_queue().stats()}")
+                    logger.info(f"📊 circuit breaker پنل: {self.panel_client.breaker.stats()}")
+                    logger.info(
+                        f"📊 زمان‌بند: {self.scheduler.count('order')} سفارش، {self.scheduler.count('user')} کاربر، "
+                        f"{len(self.paused_orders)} سفارش متوقف"
+                    )
                 
-                # انتظار قبل از چک بعدی
-                logger.info(f"⏳ انتظار {self.polling_interval} ثانیه برای چک بعدی...")
-                await asyncio.sleep(self.polling_interval)
+                # خوابیدن تا نزدیک‌ترین بررسی (حداکثر POLL_TICK_MAX تا موارد جدید سریع ثبت شوند)
+                await asyncio.sleep(self.next_tick_delay())
                 
             except Exception as e:
                 logger.error(f"❌ خطا در polling loop: {e}")
                 await asyncio.sleep(10)  # انتظار بیشتر در صورت خطا
     
+    def next_tick_delay(self) -> float:
+        """فاصله تا بیدار شدن بعدی حلقه polling"""
+        delay = BotConfig.POLL_TICK_MAX
+        next_due = self.scheduler.next_due_in()
+        if next_due is not None:
+            delay = min(delay, next_due)
+        delay = min(delay, max(self.next_full_scan - time.monotonic(), 0))
+        return max(delay, 0.5)
+    
+    # --- زمان‌بندی ---
+    
+    def watch_state_changes(self):
+        """ثبت listener روی پیش‌نویس‌های سفارش و جداول وضعیت کاربران؛ خروجی: جداول تحت نظر"""
+        from app.state_manager import (
+            order_drafts, mechanic_order_userinfo, customer_order_userinfo, mechanic_states,
+            customer_register_states, user_statuses,
+        )
+        order_drafts.add_listener(self.schedule_order)
+        tables = (mechanic_order_userinfo, customer_order_userinfo, mechanic_states, customer_register_states, user_statuses)
+        for table in tables:
+            table.add_listener(self.on_user_state_change)
+        return tables
+    
+    def refresh_schedule(self):
+        """اعمال تغییرات جداول تحت نظر در زمان‌بند (listenerها فقط برای کلیدهای تغییر یافته اجرا می‌شوند)"""
+        for table in self.watched_tables:
+            table.refresh_index()
+    
+    def schedule_order(self, order_id: int, user_id: int) -> bool:
+        """ثبت سفارش در زمان‌بند (سفارش نهایی یا متوقف ثبت نمی‌شود)؛ بلافاصله سررسید می‌شود"""
+        if not order_id or order_id in self.finished_orders or order_id in self.paused_orders:
+            return False
+        return self.scheduler.add(('order', order_id), order_id=order_id, user_id=user_id, interval=BotConfig.POLL_ORDER_INTERVAL)
+    
+    def schedule_user(self, user_id: int) -> bool:
+        """ثبت کاربر در زمان‌بند (اگر از قبل ثبت نشده باشد)"""
+        return self.scheduler.add(('user', user_id), user_id=user_id, interval=BotConfig.POLL_USER_BASE_INTERVAL)
+    
+    def on_user_state_change(self, user_id: int, value):
+        """listener جداول وضعیت: ثبت کاربری که پیش‌نویس/ثبت‌نام دارد یا در انتظار تایید است"""
+        if value is not None and ('user', user_id) not in self.scheduler and self.is_user_candidate(user_id):
+            self.schedule_user(user_id)
+    
+    def sync_schedule(self):
+        """
+        پیمایش کامل منابع و ثبت سفارش‌ها و کاربرانی که هنوز در زمان‌بند نیستند
+        فقط در همگام‌سازی کامل اجرا می‌شود؛ ثبت عادی با listenerها انجام می‌شود
+        """
+        added = 0
+        seen = set()
+        self.source_duplicates = 0
+        for order_id, user_id in self.collect_order_candidates():
+            if order_id in seen:
+                self.source_duplicates += 1
+                continue
+            seen.add(order_id)
+            if self.schedule_order(order_id, user_id):
+                added += 1
+        for user_id in self.collect_user_candidates():
+            if self.schedule_user(user_id):
+                added += 1
+        if added:
+            logger.info(f"🗓️ {added} مورد ثبت نشده در پیمایش کامل به زمان‌بند polling اضافه شد")
+    
+    def collect_order_candidates(self):
+        """سفارش‌های در انتظار از حافظه (پیش‌نویس‌ها و وضعیت انتظار رسید): [(order_id, user_id)]"""
+        from app.state_manager import clear_completed_orders, get_pending_orders, get_receipt_waiting_orders
+        cleared_count = clear_completed_orders()
+        if cleared_count > 0:
+            logger.info(f"🧹 {cleared_count} سفارش تکمیل شده از حافظه پاک شد")
+        
+        return list(get_pending_orders()) + get_receipt_waiting_orders()
+    
+    def collect_user_candidates(self):
+        """کاربران در انتظار تایید و کاربران دارای پیش‌نویس سفارش یا ثبت‌نام نیمه‌کاره"""
+        from app.state_manager import (
+            mechanic_order_userinfo, customer_order_userinfo, mechanic_states, customer_register_states, get_pending_users,
+        )
+        return (
+            set(mechanic_order_userinfo.keys()) | set(customer_order_userinfo.keys())
+            | set(mechanic_states.keys()) | set(customer_register_states.keys()) | set(get_pending_users())
+        )
+    
+    def is_user_candidate(self, user_id: int) -> bool:
+        """آیا کاربر هنوز باید بررسی شود (در انتظار تایید یا دارای پیش‌نویس/ثبت‌نام)"""
+        from app.state_manager import (
+            mechanic_order_userinfo, customer_order_userinfo, mechanic_states, customer_register_states, user_statuses,
+        )
+        if (user_id in mechanic_order_userinfo or user_id in customer_order_userinfo
+                or user_id in mechanic_states or user_id in customer_register_states):
+            return True
+        status = user_statuses.peek(user_id)
+        return status is not None and status.status == 'pending'
+    
+    def on_states_expired(self, kind: str, user_ids):
+        """حذف کاربران پاکسازی شده از زمان‌بند تا تعداد کاربران بررسی شده محدود بماند"""
+        from app.state_manager import user_statuses
+        removed = 0
+        for user_id in user_ids:
+            if self.is_user_candidate(user_id):
+                continue
+            if ('user', user_id) in self.scheduler:
+                self.scheduler.remove(('user', user_id))
+                removed += 1
+            if user_id not in user_statuses:
+                # وضعیت قبلی تا حذف وضعیت ذخیره شده حفظ می‌شود (جلوگیری از اطلاع‌رسانی تکراری تایید)
+                self.previous_statuses.pop(user_id, None)
+                self.last_menu_update.pop(user_id, None)
+        if removed:
+            logger.info(f"🧹 {removed} کاربر غیرفعال ({kind}) از زمان‌بند polling حذف شد")
+    
+    def prune_order_history(self, now: float = None):
+        """
+        حذف سفارش‌های نهایی/متوقف و وضعیت‌های قبلی سفارش‌هایی که بیش از STATE_TTL_ORDER_DRAFT ثانیه
+        تغییری نداشته‌اند (مانند پاکسازی پیش‌نویس‌های سفارش) تا حافظه polling محدود بماند
+        """
+        ttl = BotConfig.STATE_TTL_ORDER_DRAFT
+        if ttl <= 0:
+            return
+        cutoff = (time.monotonic() if now is None else now) - ttl
+        expired_finished = [order_id for order_id, at in self.finished_orders.items() if at < cutoff]
+        for order_id in expired_finished:
+            del self.finished_orders[order_id]
+        expired_paused = [order_id for order_id, at in self.paused_orders.items() if at < cutoff]
+        for order_id in expired_paused:
+            del self.paused_orders[order_id]
+            self.scheduler.remove(('order', order_id))
+        # وضعیت قبلی سفارش‌های در حال بررسی حفظ می‌شود (جلوگیری از اطلاع‌رسانی تکراری)
+        expired_statuses = [
+            order_id for order_id, at in self.order_status_seen.items()
+            if at < cutoff and ('order', order_id) not in self.scheduler
+        ]
+        for order_id in expired_statuses:
+            del self.order_status_seen[order_id]
+            self.previous_order_statuses.pop(order_id, None)
+        if expired_finished or expired_paused or expired_statuses:
+            logger.info(
+                f"🧹 پاکسازی سوابق سفارشات: {len(expired_finished)} نهایی، {len(expired_paused)} متوقف، "
+                f"{len(expired_statuses)} وضعیت قبلی"
+            )
+    
+    def remember_order_status(self, order_id: int, status):
+        """ثبت آخرین وضعیت دریافت شده سفارش و زمان آن"""
+        self.previous_order_statuses[order_id] = status
+        self.order_status_seen[order_id] = time.monotonic()
+    
+    def reschedule_order(self, order_id: int):
+        """زمان‌بندی مجدد سفارش بر اساس آخرین وضعیت آن"""
+        key = ('order', order_id)
+        status = self.previous_order_statuses.get(order_id)
+        if status in ORDER_TERMINAL_STATUSES:
+            self.scheduler.remove(key)
+            self.finished_orders[order_id] = time.monotonic()
+            logger.debug(f"🏁 سفارش {order_id} در وضعیت نهایی {status} - حذف از زمان‌بند")
+            return
+        interval = BotConfig.POLL_HOT_ORDER_INTERVAL if status in ORDER_HOT_STATUSES else BotConfig.POLL_ORDER_INTERVAL
+        self.scheduler.schedule(key, interval, interval=interval)
+    
+    def reschedule_user(self, user_id: int, outcome: str, changed: bool):
+        """
+        زمان‌بندی مجدد کاربر
+        با هر بررسی بدون تغییر فاصله دو برابر می‌شود (تا POLL_USER_MAX_INTERVAL)؛
+        تغییر وضعیت یا خطا فاصله را به مقدار پایه برمی‌گرداند
+        """
+        key = ('user', user_id)
+        if key not in self.scheduler:
+            # کاربر در حین بررسی پاکسازی شده یا هنوز در زمان‌بند ثبت نشده
+            return
+        if outcome == 'ok' and not self.is_user_candidate(user_id):
+            # وضعیت کاربر تعیین شده و پیش‌نویس/ثبت‌نام فعالی ندارد
+            self.scheduler.remove(key)
+            logger.debug(f"🏁 کاربر {user_id} دیگر نیازی به بررسی ندارد - حذف از زمان‌بند")
+            return
+        meta = self.scheduler.get(key)
+        interval = meta.get('interval', BotConfig.POLL_USER_BASE_INTERVAL)
+        if outcome != 'ok' or changed:
+            interval = BotConfig.POLL_USER_BASE_INTERVAL
+        else:
+            interval = min(interval * 2, BotConfig.POLL_USER_MAX_INTERVAL)
+        self.scheduler.schedule(key, interval, user_id=user_id, interval=interval)
+    
     async def check_panel_connection(self):
         """بررسی اتصال به پنل"""
         try:
             # ابتدا سعی کن به endpoint سلامت متصل شوی
-            response = requests.get(f"{self.panel_api_base_url}/health", timeout=5)
-            if response.status_code == 200:
+            status_code, _ = await self.panel_client.health(timeout=5)
+            if status_code == 200:
                 logger.debug("✅ اتصال به پنل برقرار است")
                 return True
             
             # اگر endpoint سلامت کار نکرد، سعی کن به endpoint اصلی متصل شوی
-            response = requests.get(f"{self.panel_api_base_url}/", timeout=5)
-            return response.status_code in [200, 302, 404]  # هر کدام از این کدها نشان‌دهنده کارکرد سرور است
+            status_code, _ = await self.panel_client.get("/", timeout=5)
+            return status_code in [200, 302, 404]  # هر کدام از این کدها نشان‌دهنده کارکرد سرور است
             
-        except requests.exceptions.ConnectionError:
+        except aiohttp.ClientConnectionError:
             logger.debug("🔍 عدم اتصال به پنل")
             return False
         except Exception as e:
@@ -143,20 +330,64 @@ class PollingSystem:
         self.is_running = False
         logger.info("⏹️ سیستم polling متوقف شد")
     
-    async def check_user_statuses(self):
-        """بررسی وضعیت کاربران"""
+    async def check_user_statuses(self, user_ids=None):
+        """
+        بررسی وضعیت کاربران با تعداد محدود worker همزمان و سقف زمانی هر چرخه
+        user_ids: کاربران سررسید شده از زمان‌بند (پیش‌فرض: همه کاربران فعال)
+        """
         try:
-            # دریافت لیست کاربران فعال
-            from app.state_manager import mechanic_order_userinfo, customer_order_userinfo, get_pending_users, user_statuses
+            if user_ids is None:
+                user_ids = self.collect_user_candidates()
             
-            # بررسی کاربران در انتظار تایید
-            pending_users = get_pending_users()
-            all_users = set(mechanic_order_userinfo.keys()) | set(customer_order_userinfo.keys()) | set(pending_users) | set(user_statuses.keys())
+            # کاربرانی که در چرخه قبل به دلیل اتمام زمان بررسی نشدند، اول بررسی می‌شوند
+            user_ids = list(dict.fromkeys(user_ids))
+            requested = set(user_ids)
+            deferred = [user_id for user_id in self.deferred_users if user_id in requested]
+            deferred_set = set(deferred)
+            queue = deque(deferred + [user_id for user_id in user_ids if user_id not in deferred_set])
             
-            logger.info(f"[POLLING] Checking {len(all_users)} users for status updates")
+            logger.info(f"[POLLING] Checking {len(queue)} users for status updates ({len(deferred)} deferred)")
             
-            for user_id in all_users:
-                await self.check_user_status(user_id)
+            # دریافت دسته‌ای وضعیت‌ها در کش؛ بررسی تک‌تک کاربران بعد از آن از کش خوانده می‌شود
+            from app.state_manager import prefetch_user_statuses
+            try:
+                prefetched = await prefetch_user_statuses(list(queue), timeout=10, retry=self.retry_policy)
+                logger.debug(f"[POLLING] Prefetched {prefetched} user statuses in batch")
+            except Exception as e:
+                logger.warning(f"[POLLING] Batch user status prefetch failed: {e}")
+            
+            loop = asyncio.get_running_loop()
+            started_at = loop.time()
+            budget_end = started_at + self.user_check_budget
+            stats = {'ok': 0, 'failed': 0, 'timeout': 0}
+            
+            async def worker():
+                while queue:
+                    if loop.time() >= budget_end:
+                        return
+                    user_id = queue.popleft()
+                    previous_status = self.previous_statuses.get(user_id)
+                    outcome = await self.check_user_status(user_id)
+                    stats[outcome] += 1
+                    self.reschedule_user(user_id, outcome, self.previous_statuses.get(user_id) != previous_status)
+            
+            workers = min(self.user_check_concurrency, len(queue))
+            await asyncio.gather(*(worker() for _ in range(workers)))
+            
+            # کاربران باقی‌مانده در چرخه بعد دوباره سررسید می‌شوند
+            self.deferred_users = list(queue)
+            for user_id in self.deferred_users:
+                self.scheduler.schedule(('user', user_id), 0, user_id=user_id)
+            stats['deferred'] = len(self.deferred_users)
+            stats['duration'] = round(loop.time() - started_at, 2)
+            self.last_user_cycle_stats = stats
+            
+            logger.info(
+                f"[POLLING] User status cycle: {stats['duration']}s, ok={stats['ok']}, "
+                f"failed={stats['failed']}, timeout={stats['timeout']}, deferred={stats['deferred']}"
+            )
+            if self.deferred_users:
+                logger.warning(f"[POLLING] Cycle budget of {self.user_check_budget}s reached - {len(self.deferred_users)} users deferred to next cycle")
                     
         except Exception as e:
             logger.error(f"❌ خطا در بررسی وضعیت کاربران: {e}")
@@ -167,59 +398,59 @@ class PollingSystem:
         return get_pending_users()
     
     async def check_user_status(self, user_id: int):
-        """بررسی وضعیت کاربر"""
-        for attempt in range(self.connection_retries):
-            try:
-                # استفاده از endpoint جدید که هم مکانیک و هم مشتری را بررسی می‌کند
-                user_url = f"{self.panel_api_base_url}/mechanics/api/user/status?telegram_id={user_id}"
-                user_response = requests.get(user_url, timeout=10)
-                
-                if user_response.status_code == 200:
-                    user_data = user_response.json()
-                    if user_data.get('success'):
-                        status = user_data.get('status')
-                        role = user_data.get('role')
-                        commission_percent = user_data.get('commission_percentage', 0)
+        """
+        بررسی وضعیت کاربر (تلاش مجدد توسط سیاست retry کلاینت پنل)
+        خروجی: 'ok'، 'failed' یا 'timeout'
+        """
+        try:
+            # استفاده از endpoint جدید که هم مکانیک و هم مشتری را بررسی می‌کند
+            status_code, user_data = await fetch_user_status(user_id, timeout=10, retry=self.retry_policy)
+            
+            if status_code == 200 and user_data is not None:
+                if user_data.get('success'):
+                    status = user_data.get('status')
+                    role = user_data.get('role')
+                    commission_percent = user_data.get('commission_percentage', 0)
+                    
+                    # بررسی تغییر وضعیت
+                    previous_status = self.previous_statuses.get(user_id, {})
+                    current_status = {'status': status, 'role': role}
+                    
+                    if previous_status != current_status:
+                        logging.info(f"[POLLING] User {user_id} status changed: {previous_status} -> {current_status}, commission: {commission_percent}%")
                         
-                        # بررسی تغییر وضعیت
-                        previous_status = self.previous_statuses.get(user_id, {})
-                        current_status = {'status': status, 'role': role}
+                        # به‌روزرسانی وضعیت کاربر در حافظه
+                        from app.state_manager import set_user_status
+                        set_user_status(user_id, role, status)
                         
-                        if previous_status != current_status:
-                            logging.info(f"[POLLING] User {user_id} status changed: {previous_status} -> {current_status}, commission: {commission_percent}%")
-                            
-                            # به‌روزرسانی وضعیت کاربر در حافظه
-                            from app.state_manager import set_user_status
-                            set_user_status(user_id, role, status)
-                            
-                            # ذخیره وضعیت جدید
-                            self.previous_statuses[user_id] = current_status
-                            
-                            # اطلاع‌رسانی بر اساس وضعیت جدید
-                            if status == 'approved':
-                                await self.notify_user_approved(user_id, role, commission_percent)
-                                # منو فقط در زمان تایید اولیه به‌روزرسانی می‌شود
-                            elif status == 'rejected':
-                                await self.notify_user_rejected(user_id, role)
-                        else:
-                            logging.debug(f"[POLLING] User {user_id} status unchanged: {status}")
+                        # ذخیره وضعیت جدید
+                        self.previous_statuses[user_id] = current_status
+                        
+                        # اطلاع‌رسانی بر اساس وضعیت جدید
+                        if status == 'approved':
+                            await self.notify_user_approved(user_id, role, commission_percent)
+                            # منو فقط در زمان تایید اولیه به‌روزرسانی می‌شود
+                        elif status == 'rejected':
+                            await self.notify_user_rejected(user_id, role)
                     else:
-                        logging.info(f"[POLLING] User {user_id} not found in system")
-                else:
-                    logging.warning(f"[POLLING] Failed to get user status for {user_id}: {user_response.status_code}")
-                
-                # اگر موفق بودیم، از حلقه خارج شویم
-                break
-                
-            except requests.exceptions.ConnectionError as e:
-                logger.warning(f"[POLLING] Connection error for user {user_id} (attempt {attempt + 1}/{self.connection_retries}): {e}")
-                if attempt < self.connection_retries - 1:
-                    await asyncio.sleep(self.retry_delay)
+                        logging.debug(f"[POLLING] User {user_id} status unchanged: {status}")
                 else:
-                    logger.error(f"[POLLING] Failed to check user status for {user_id} after {self.connection_retries} attempts")
-            except Exception as e:
-                logger.error(f"[POLLING] Error checking user status for {user_id}: {e}")
-                break
+                    logging.info(f"[POLLING] User {user_id} not found in system")
+            else:
+                logging.warning(f"[POLLING] Failed to get user status for {user_id}: {status_code}")
+                return 'failed'
+            return 'ok'
+            
+        except PanelUnavailableError:
+            logger.debug(f"[POLLING] Panel circuit open - skipping user {user_id}")
+        except aiohttp.ClientConnectionError as e:
+            logger.error(f"[POLLING] Failed to check user status for {user_id}: {e}")
+        except asyncio.TimeoutError:
+            logger.warning(f"[POLLING] Timeout checking user status for {user_id}")
+            return 'timeout'
+        except Exception as e:
+            logger.error(f"[POLLING] Error checking user status for {user_id}: {e}")
+        return 'failed'
     
     async def notify_user_approved(self, user_id: int, user_type: str, commission_percent: float = 0):
         """اطلاع‌رسانی تایید ثبت‌نام به کاربر"""
@@ -229,13 +460,13 @@ class PollingSystem:
             else:
                 message = "🎉 تبریک! ثبت‌نام شما به عنوان مشتری تایید شد.\n\nحالا می‌توانید سفارش ثبت کنید."
             
-            await self.bot.send_message(user_id, message)
+            await get_send_queue().send_message(self.bot, user_id, message)
             logger.info(f"📢 اطلاع‌رسانی تایید به کاربر {user_id} ارسال شد")
             
             # ارسال منوی داینامیک یکسان با /start بعد از تایید
             from dynamic_menu import get_main_menu
             menu = get_main_menu(user_id)
-            await self.bot.send_message(user_id, "منوی اصلی:", reply_markup=menu)
+            await get_send_queue().send_message(self.bot, user_id, "منوی اصلی:", reply_markup=menu)
             
         except Exception as e:
             logger.error(f"❌ خطا در ارسال اطلاع‌رسانی تایید به کاربر {user_id}: {e}")
@@ -245,7 +476,7 @@ class PollingSystem:
         try:
             message = "😔 متاسفانه ثبت‌نام شما رد شد.\n\nبرای اطلاعات بیشتر با پشتیبانی تماس بگیرید."
             
-            await self.bot.send_message(user_id, message)
+            await get_send_queue().send_message(self.bot, user_id, message)
             logger.info(f"📢 اطلاع‌رسانی رد به کاربر {user_id} ارسال شد")
             
         except Exception as e:
@@ -253,157 +484,173 @@ class PollingSystem:
     
     # --- متدهای مربوط به سفارشات ---
     
-    async def check_pending_orders(self):
-        """بررسی وضعیت سفارشات در انتظار (فقط در حالت polling)"""
+    async def is_panel_accessible(self) -> bool:
+        """
+        تصمیم اتصال به پنل برای این چرخه بر اساس circuit breaker کلاینت
+        - مدار بسته: بدون درخواست اضافه
+        - مدار باز: حالت آفلاین بدون هیچ درخواستی
+        - زمان درخواست آزمایشی (نیمه‌باز): یک درخواست سلامت به عنوان probe
+        """
+        breaker = self.panel_client.breaker
+        if breaker.state == breaker.CLOSED:
+            accessible = True
+        elif breaker.is_open:
+            accessible = False
+        else:
+            accessible = await self.check_panel_connection()
+        if accessible != self.panel_accessible:
+            if accessible:
+                logger.info("✅ اتصال به پنل برقرار است")
+            else:
+                logger.warning("⚠️ عدم اتصال به پنل - کار در حالت آفلاین")
+        self.panel_accessible = accessible
+        return accessible
+    
+    async def run_order_cycle(self, due_orders, full_scan: bool = False):
+        """
+        یک چرخه pipeline سفارشات (فقط در حالت polling):
+        1. جمع‌آوری شناسه‌ها از زمان‌بند (پیش‌نویس‌ها و receipt_state) و همگام‌سازی تغییرات پنل
+        2. حذف تکرار
+        3. یک تصمیم اتصال برای کل چرخه
+        4. دریافت هر سفارش حداکثر یک بار (صفحات همگام‌سازی + یک درخواست دسته‌ای برای بقیه)
+        5. مقایسه با وضعیت قبلی و اطلاع‌رسانی در یک مرحله
+        """
         if BotConfig.USE_WEBHOOK:
             logger.debug("🌐 حالت webhook فعال است - بررسی سفارشات غیرفعال")
             return
-            
-        try:
-            # پاک کردن سفارش‌های تکمیل شده از حافظه
-            from app.state_manager import clear_completed_orders, get_pending_orders
-            cleared_count = clear_completed_orders()
-            if cleared_count > 0:
-                logger.info(f"🧹 {cleared_count} سفارش تکمیل شده از حافظه پاک شد")
-            
-            # دریافت سفارش‌های در انتظار (فقط غیر پرداخت شده)
-            pending_orders = get_pending_orders()
-            logger.info(f"📋 بررسی {len(pending_orders)} سفارش در انتظار...")
-            
-            for order_id, user_id in pending_orders:
-                logger.info(f"🔍 بررسی سفارش {order_id} برای کاربر {user_id}")
-                await self.check_order_status(order_id, user_id)
-            
-            # بررسی سفارشات از receipt_state.json
-            await self.check_receipt_state_orders()
-                
-        except Exception as e:
-            logger.error(f"❌ خطا در بررسی سفارشات در انتظار: {e}")
+        
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+        requests_before = self.panel_client.request_count
+        # تکرار بین منابع (پیش‌نویس و receipt_state) در زمان ثبت در زمان‌بند حذف شده است
+        stats = {'scheduled': len(due_orders), 'listed': 0, 'duplicates': self.source_duplicates, 'candidates': 0,
+                 'fetched': 0, 'changed': 0, 'offline': False}
+        
+        # 1-2: جمع‌آوری و حذف تکرار {order_id: user_id}
+        candidates = {}
+        for order_id, user_id in due_orders:
+            candidates.setdefault(order_id, user_id)
+        
+        # 3: یک تصمیم اتصال برای کل چرخه
+        if not await self.is_panel_accessible():
+            stats['offline'] = True
+            for order_id, user_id in candidates.items():
+                logger.warning(f"⚠️ پنل در دسترس نیست - استفاده از وضعیت آفلاین برای سفارش {order_id}")
+                await self.handle_offline_order_status(order_id, user_id)
+                self.reschedule_order(order_id)
+            stats['candidates'] = len(candidates)
+            self.report_order_cycle(stats, loop.time() - started_at, requests_before)
+            return
+        
+        # 4-5 الف: همگام‌سازی تغییرات - هر صفحه snapshot کامل است، همان‌جا مقایسه و سپس cursor جلو می‌رود
+        handled = set()
+        if full_scan:
+            baseline = self.order_sync.is_baseline
+            try:
+                async for orders, cursor in self.order_sync.pages():
+                    for order in orders:
+                        order_id = order.get('id')
+                        user_id = order.get('telegram_id') or order.get('user_id')
+                        if not order_id or not user_id or order_id in handled:
+                            continue
+                        # اولین همگام‌سازی بدون cursor: فقط سفارشات در انتظار پرداخت (مانند اسکن کامل)
+                        if baseline and order.get('status') != FULL_SCAN_STATUS and order_id not in candidates:
+                            continue
+                        stats['listed'] += 1
+                        if order_id in candidates:
+                            stats['duplicates'] += 1
+                        handled.add(order_id)
+                        await self.apply_order_snapshot_safe(order_id, candidates.get(order_id, user_id), order, stats)
+                    self.order_sync.advance(cursor)
+            finally:
+                # یک ذخیره cursor برای کل همگام‌سازی
+                await self.order_sync.commit()
+            stats['sync'] = self.order_sync.last_sync_stats
+        
+        # 4-5 ب: بقیه سفارش‌های سررسید با یک درخواست دسته‌ای
+        missing = [order_id for order_id in candidates if order_id not in handled]
+        if missing:
+            fetched = await self.prefetch_orders(missing)
+            for order_id in missing:
+                status_code, order_data = fetched.get(order_id, (None, None))
+                if status_code == 200 and order_data is not None and order_data.get('success'):
+                    handled.add(order_id)
+                    await self.apply_order_snapshot_safe(order_id, candidates[order_id], order_data.get('data', {}), stats)
+                else:
+                    logger.warning(f"⚠️ خطا در دریافت وضعیت سفارش {order_id}: {status_code}")
+        stats['candidates'] = len(handled | set(candidates))
+        stats['fetched'] = len(handled)
+        
+        # سفارش متوقف شده زمان‌بندی نمی‌شود مگر به وضعیت نهایی رسیده باشد (حذف)
+        for order_id, _ in due_orders:
+            self.reschedule_order(order_id)
+        
+        self.report_order_cycle(stats, loop.time() - started_at, requests_before)
+    
+    def report_order_cycle(self, stats, duration: float, requests_before: int):
+        """گزارش کار انجام شده در چرخه سفارشات (requests: تعداد درخواست واقعی به پنل)"""
+        stats['duration'] = round(duration, 2)
+        stats['requests'] = self.panel_client.request_count - requests_before
+        self.last_order_cycle_stats = stats
+        logger.info(
+            f"[POLLING] Order cycle: {stats['duration']}s, candidates={stats['candidates']} "
+            f"(scheduled={stats['scheduled']}, listed={stats['listed']}, duplicates={stats['duplicates']}), "
+            f"requests={stats['requests']}, fetched={stats['fetched']}, changed={stats['changed']}, offline={stats['offline']}"
+            + (f", sync={stats['sync']}" if 'sync' in stats else "")
+        )
     
-    async def check_receipt_state_orders(self):
-        """بررسی سفارشات از receipt_state.json"""
+    async def prefetch_orders(self, order_ids):
+        """دریافت دسته‌ای جزئیات سفارشات: {order_id: (کد وضعیت، بدنه)}"""
+        if not order_ids:
+            return {}
         try:
-            import json
-            import os
-            
-            receipt_state_file = os.path.join(os.path.dirname(__file__), 'app/receipt_state.json')
-            if not os.path.exists(receipt_state_file):
-                return
-            
-            with open(receipt_state_file, 'r', encoding='utf-8') as f:
-                receipt_states = json.load(f)
-            
-            for user_id_str, state_data in receipt_states.items():
-                user_id = int(user_id_str)
-                order_id = state_data.get('order_id')
-                
-                if order_id and state_data.get('waiting_for_receipt'):
-                    logger.info(f"🔍 بررسی سفارش {order_id} از receipt_state برای کاربر {user_id}")
-                    await self.check_order_status(order_id, user_id)
-            
-            # بررسی سفارشات مستقیماً از API برای کاربران فعال
-            await self.check_active_user_orders()
-                    
+            return await self.panel_client.get_orders_batch(order_ids, timeout=10, retry=self.retry_policy)
         except Exception as e:
-            logger.error(f"❌ خطا در بررسی سفارشات receipt_state: {e}")
+            logger.warning(f"⚠️ خطا در دریافت دسته‌ای سفارشات: {e}")
+            return {}
     
-    async def check_active_user_orders(self):
-        """بررسی همه سفارشات از API (فقط سفارشات غیر پرداخت شده)"""
+    async def apply_order_snapshot_safe(self, order_id: int, user_id: int, order_data: dict, stats: dict):
+        """مقایسه snapshot با ثبت خطا و شمارش تغییرات در آمار چرخه"""
         try:
-            # دریافت سفارشات در انتظار پرداخت از API
-            api_url = f"{self.panel_api_base_url}/telegram-bot/api/orders?limit=50&status=در انتظار پرداخت"
-            
-            response = requests.get(api_url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('success') and data.get('data'):
-                    orders = data['data']
-                    logger.info(f"🔍 بررسی {len(orders)} سفارش در انتظار پرداخت")
-                    
-                    for order in orders:
-                        order_id = order.get('id')
-                        status = order.get('status')
-                        user_id = order.get('telegram_id') or order.get('user_id')
-                        
-                        if order_id and user_id:
-                            # بررسی تغییر وضعیت
-                            previous_status = self.previous_order_statuses.get(order_id)
-                            if previous_status != status:
-                                logger.info(f"🔄 تغییر وضعیت سفارش {order_id}: {previous_status} -> {status}")
-                                await self.handle_order_status_change(order_id, user_id, status, order)
-                                self.previous_order_statuses[order_id] = status
-                            
+            if await self.apply_order_snapshot(order_id, user_id, order_data):
+                stats['changed'] += 1
         except Exception as e:
-            logger.error(f"❌ خطا در بررسی سفارشات: {e}")
+            logger.error(f"❌ خطا در بررسی وضعیت سفارش {order_id}: {e}")
     
-    async def check_order_status(self, order_id: int, user_id: int):
-        """بررسی وضعیت سفارش (فقط در حالت polling)"""
-        if BotConfig.USE_WEBHOOK:
-            logger.debug(f"🌐 حالت webhook فعال است - بررسی وضعیت سفا��ش {order_id} غیرفعال")
-            return
+    async def apply_order_snapshot(self, order_id: int, user_id: int, order_data: dict) -> bool:
+        """
+        مقایسه snapshot سفارش با وضعیت قبلی و اطلاع‌رسانی تغییر
+        خروجی: True اگر وضعیت تغییر کرده و پردازش شده باشد
+        """
+        current_status = order_data.get('status')
+        logger.debug(f"📊 وضعیت فعلی سفارش {order_id}: {current_status}")
+        
+        # اگر سفارش پرداخت شده، فقط یک بار اطلاع‌رسانی شود
+        if current_status == 'پرداخت شده':
+            if is_order_payment_notified(order_id):
+                logger.debug(f"⚠️ سفارش {order_id} قبلاً پرداخت شده اطلاع‌رسانی شده")
+                self.remember_order_status(order_id, current_status)
+                return False
+            logger.info(f"🎯 سفارش {order_id} برای اولین بار پرداخت شده - ارسال اطلاع‌رسانی")
+            await self.handle_order_status_change(order_id, user_id, current_status, order_data)
+            mark_order_payment_notified(order_id)
+            self.remember_order_status(order_id, current_status)
             
-        for attempt in range(self.connection_retries):
-            try:
-                # بررسی اتصال به پنل
-                if not await self.check_panel_connection():
-                    logger.warning(f"⚠️ پنل در دسترس نیست - استفاده از وضعیت آفلاین برای سفارش {order_id}")
-                    await self.handle_offline_order_status(order_id, user_id)
-                    return
-                
-                # دریافت وضعیت سفارش از API
-                order_url = f"{self.panel_api_base_url}/telegram-bot/api/orders/{order_id}"
-                logger.info(f"🌐 بررسی وضعیت سفارش {order_id}: {order_url}")
-                
-                response = requests.get(order_url, timeout=10)
-                
-                if response.status_code == 200:
-                    order_data = response.json()
-                    logger.info(f"📊 پاسخ API سفارش {order_id}: {order_data}")
-                    
-                    if order_data.get('success'):
-                        current_status = order_data.get('data', {}).get('status')
-                        logger.info(f"📊 وضعیت فعلی سفارش {order_id}: {current_status}")
-                        
-                        # اگر سفارش پرداخت شده، دیگر آن را پیگیری نکن
-                        if current_status == 'پرداخت شده':
-                            if not is_order_payment_notified(order_id):
-                                logger.info(f"🎯 سفارش {order_id} برای اولین بار پرداخت شده - ارسال اطلاع‌رسانی")
-                                await self.handle_order_status_change(order_id, user_id, current_status, order_data.get('data', {}))
-                                mark_order_payment_notified(order_id)
-                                self.previous_order_statuses[order_id] = current_status
-                                
-                                # حذف از لیست pending
-                                from app.state_manager import set_order_status
-                                set_order_status(user_id, order_id, current_status)
-                            else:
-                                logger.debug(f"⚠️ سفارش {order_id} قبلاً پرداخت شده اطلاع‌رسانی شده")
-                            return
-                        
-                        # بررسی تغییر وضعیت برای سایر وضعیت‌ها
-                        previous_status = self.previous_order_statuses.get(order_id)
-                        if previous_status != current_status:
-                            logger.info(f"🔄 تغییر وضعیت سفارش {order_id}: {previous_status} -> {current_status}")
-                            await self.handle_order_status_change(order_id, user_id, current_status, order_data.get('data', {}))
-                            self.previous_order_statuses[order_id] = current_status
-                        else:
-                            logger.debug(f"📊 وضعیت سفارش {order_id} بدون تغییر: {current_status}")
-                    else:
-                        logger.warning(f"⚠️ API سفارش {order_id} موفق نبود: {order_data}")
-                else:
-                    logger.warning(f"⚠️ خطا در دریافت وضعیت سفارش {order_id}: {response.status_code}")
-                
-                # اگر موفق بودیم، از حلقه خارج شویم
-                break
-                
-            except requests.exceptions.ConnectionError as e:
-                logger.warning(f"[BOT] Connection error for order {order_id} (attempt {attempt + 1}/{self.connection_retries}): {e}")
-                if attempt < self.connection_retries - 1:
-                    await asyncio.sleep(self.retry_delay)
-                else:
-                    logger.error(f"[BOT] Failed to check order status for {order_id} after {self.connection_retries} attempts")
-            except Exception as e:
-                logger.error(f"❌ خطا در بررسی وضعیت سفارش {order_id}: {e}")
-                break
+            # حذف از لیست pending
+            from app.state_manager import set_order_status
+            set_order_status(user_id, order_id, current_status)
+            return True
+        
+        # بررسی تغییر وضعیت برای سایر وضعیت‌ها
+        previous_status = self.previous_order_statuses.get(order_id)
+        if previous_status == current_status:
+            self.order_status_seen[order_id] = time.monotonic()
+            logger.debug(f"📊 وضعیت سفارش {order_id} بدون تغییر: {current_status}")
+            return False
+        logger.info(f"🔄 تغییر وضعیت سفارش {order_id}: {previous_status} -> {current_status}")
+        await self.handle_order_status_change(order_id, user_id, current_status, order_data)
+        self.remember_order_status(order_id, current_status)
+        return True
     
     async def handle_offline_order_status(self, order_id: int, user_id: int):
         """مدیریت وضعیت سفارش در حالت آفلاین"""
@@ -464,7 +711,7 @@ class PollingSystem:
                 ]
             ])
             
-            await self.bot.send_message(user_id, message, reply_markup=keyboard)
+            await get_send_queue().send_message(self.bot, user_id, message, reply_markup=keyboard)
             logger.info(f"📢 اطلاع‌رسانی تایید سفارش {order_id} به کاربر {user_id} ارسال شد")
             
         except Exception as e:
@@ -478,7 +725,7 @@ class PollingSystem:
             
             message = f"💳 لطفاً مبلغ {price:,} تومان را به شماره کارت زیر واریز کنید:\n\n💳 {card_number}\n\nپس از واریز، عکس رسید را ارسال کنید."
             
-            await self.bot.send_message(user_id, message)
+            await get_send_queue().send_message(self.bot, user_id, message)
             
             # تنظیم وضعیت انتظار رسید
             from app.handlers.receipt_handlers import set_receipt_waiting_state
@@ -494,7 +741,7 @@ class PollingSystem:
         try:
             message = f"✅ سفارش شما با موفقیت تکمیل شد!\n\nاز استفاده از خدمات ما متشکریم. 😊"
             
-            await self.bot.send_message(user_id, message)
+            await get_send_queue().send_message(self.bot, user_id, message)
             logger.info(f"📢 اطلاع‌رسانی تکمیل سفارش {order_id} به کاربر {user_id} ارسال شد")
             
         except Exception as e:
@@ -504,7 +751,7 @@ class PollingSystem:
         """اطلاع‌رسانی رد سفارش"""
         try:
             message = f"❌ متاسفانه سفارش شما رد شد.\n\nبرای اطلاعات بیشتر با پشتیبانی تماس بگیرید."
-            await self.bot.send_message(user_id, message)
+            await get_send_queue().send_message(self.bot, user_id, message)
             logger.info(f"📢 اطلاع‌رسانی رد سفارش {order_id} به کاربر {user_id} ارسال شد")
             # پاکسازی وضعیت رسید
             from app.state_manager import clear_receipt_state
@@ -516,7 +763,7 @@ class PollingSystem:
         """اطلاع‌رسانی تایید پرداخت به کاربر"""
         try:
             message = f"✅ پرداخت سفارش شماره {order_id} تایید شد!\n\n🎉 سفارش شما نهایی شد و به آدرس شما ارسال خواهد شد.\n\n📦 می‌توانید سفارش جدیدی ثبت کنید."
-            await self.bot.send_message(user_id, message)
+            await get_send_queue().send_message(self.bot, user_id, message)
             logger.info(f"📢 اطلاع‌رسانی تایید پرداخت سفارش {order_id} به کاربر {user_id} ارسال شد")
             
             # پاکسازی وضعیت رسید
@@ -533,10 +780,18 @@ class PollingSystem:
     
     def pause_order_polling(self, order_id: int):
         """متوقف کردن polling برای یک سفارش خاص"""
-        self.paused_orders.add(order_id)
+        self.paused_orders[order_id] = time.monotonic()
+        self.scheduler.pause(('order', order_id))
         logger.info(f"⏸️ Polling برای سفارش {order_id} متوقف شد")
     
-    def resume_order_polling(self, order_id: int):
-        """ادامه polling برای یک سفارش خاص"""
-        self.paused_orders.discard(order_id)
+    def resume_order_polling(self, order_id: int, user_id: int = None):
+        """
+        ادامه polling برای یک سفارش خاص (بلافاصله سررسید می‌شود)
+        user_id: اگر سفارش هنوز در زمان‌بند نباشد، با این کاربر ثبت می‌شود
+        """
+        self.paused_orders.pop(order_id, None)
+        self.finished_orders.pop(order_id, None)
+        key = ('order', order_id)
+        if not self.scheduler.resume(key) and user_id is not None:
+            self.scheduler.add(key, order_id=order_id, user_id=user_id, interval=BotConfig.POLL_HOT_ORDER_INTERVAL)
         logger.info(f"▶️ Polling برای سفارش {order_id} ادامه یافت")
\ No newline at end of file
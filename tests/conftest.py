@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""
+تنظیمات مشترک تست‌ها
+- ذخیره وضعیت در حافظه (بدون ساخت bot_state.db)
+- مسیر ریشه پروژه برای import ماژول‌ها
+"""
+
+import os
+import sys
+
+# پیش از import ماژول‌های پروژه (load_dotenv مقدارهای محیطی موجود را بازنویسی نمی‌کند)
+os.environ["STATE_BACKEND"] = "memory"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
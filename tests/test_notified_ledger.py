@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+تست NotifiedOrdersLedger: log فقط-افزودنی، فشرده‌سازی و مدت نگهداری
+"""
+
+import json
+import time
+
+from app.notified_ledger import NotifiedOrdersLedger
+
+
+def make_ledger(tmp_path, **kwargs):
+    kwargs.setdefault('retention', 3600)
+    kwargs.setdefault('compact_every', 100)
+    return NotifiedOrdersLedger(path=str(tmp_path / 'notified_orders.log'), legacy_files=(), **kwargs)
+
+
+def log_lines(tmp_path):
+    return (tmp_path / 'notified_orders.log').read_text(encoding='utf-8').splitlines()
+
+
+def test_add_appends_and_reloads(tmp_path):
+    ledger = make_ledger(tmp_path)
+    assert ledger.add(1)
+    assert ledger.add('2')
+    assert not ledger.add('1')
+    assert 1 in ledger and '2' in ledger and 3 not in ledger
+    assert len(log_lines(tmp_path)) == 2
+    ledger.close()
+
+    reloaded = make_ledger(tmp_path)
+    assert reloaded.order_ids() == ['1', '2']
+    reloaded.close()
+
+
+def test_compaction_after_appends(tmp_path):
+    ledger = make_ledger(tmp_path, compact_every=3)
+    compactions = ledger.compactions
+    for order_id in range(3):
+        ledger.add(order_id)
+    assert ledger.compactions == compactions + 1
+    assert ledger.appends_since_compact == 0
+    assert len(log_lines(tmp_path)) == 3
+    ledger.add(3)
+    assert len(log_lines(tmp_path)) == 4
+    ledger.close()
+
+
+def test_retention_drops_old_orders(tmp_path):
+    now = time.time()
+    path = tmp_path / 'notified_orders.log'
+    path.write_text(
+        json.dumps({'order_id': 'old', 'ts': now - 7200}) + '\n'
+        + json.dumps({'order_id': 'recent', 'ts': now - 60}) + '\n'
+        + '{"order_id": "partial"',  # خط ناقص (قطع برنامه حین نوشتن)
+        encoding='utf-8',
+    )
+    ledger = make_ledger(tmp_path)
+    assert 'old' not in ledger
+    assert 'recent' in ledger
+    assert log_lines(tmp_path) == [json.dumps({'order_id': 'recent', 'ts': round(now - 60, 3)})]
+
+    # سفارش قدیمی‌تر از مدت نگهداری دوباره قابل اطلاع‌رسانی است
+    assert ledger.add('old')
+    ledger.close()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+تست OrderDraftRegistry: ایندکس‌های وضعیت و شناسه سفارش روی جداول پیش‌نویس
+"""
+
+from app.models import OrderDraft
+from app.order_registry import OrderDraftRegistry
+from app.state_store import MemoryStateStore, StateTable
+
+
+def make_registry():
+    store = MemoryStateStore()
+    mechanic = StateTable('mechanic_orders', store=store, index_field='status', model=OrderDraft)
+    customer = StateTable('customer_orders', store=store, index_field='status', model=OrderDraft)
+    return OrderDraftRegistry([mechanic, customer]), mechanic, customer
+
+
+def test_indexes_follow_draft_changes():
+    registry, mechanic, customer = make_registry()
+    mechanic[1] = OrderDraft(order_id=100, status='pending')
+    customer[2] = OrderDraft(order_id=200, status='در انتظار پرداخت')
+    # پیش‌نویس در حال تکمیل (هنوز ارسال نشده) ایندکس نمی‌شود
+    customer[3] = OrderDraft()
+
+    assert sorted(registry.pending()) == [(100, 1), (200, 2)]
+    assert registry.by_order(200) == ('customer_orders', 2)
+    assert registry.by_status('pending') == {('mechanic_orders', 1)}
+    assert len(registry) == 2
+
+    # تغییر درجای پیش‌نویس در جستجوی بعدی اعمال می‌شود
+    mechanic[1].status = 'approved'
+    assert registry.counts() == {'approved': 1, 'در انتظار پرداخت': 1}
+
+    customer.discard(2)
+    assert registry.by_order(200) is None
+    assert list(registry.pending()) == [(100, 1)]
+
+
+def test_existing_drafts_are_indexed_on_creation():
+    store = MemoryStateStore()
+    table = StateTable('mechanic_orders', store=store, index_field='status', model=OrderDraft)
+    table[1] = OrderDraft(order_id=100, status='pending')
+    registry = OrderDraftRegistry([table])
+    assert list(registry.pending()) == [(100, 1)]
+
+
+def test_terminal_status_removes_draft():
+    registry, mechanic, customer = make_registry()
+    mechanic[1] = OrderDraft(order_id=100, status='pending')
+    customer[2] = OrderDraft(order_id=200, status='pending')
+
+    assert registry.set_status(1, 100, 'پرداخت شده')
+    assert 1 not in mechanic
+    assert registry.by_order(100) is None
+    assert not registry.set_status(9, 900, 'pending')
+
+    # رسیدن به وضعیت نهایی با تغییر درجا
+    customer[2].status = 'completed'
+    assert list(registry.pending()) == []
+    assert registry.clear_terminal() == 1
+    assert 2 not in customer
+    assert len(registry) == 0
+
+
+def test_listeners_receive_new_pending_orders():
+    registry, mechanic, customer = make_registry()
+    pending = []
+    registry.add_listener(lambda order_id, user_id: pending.append((order_id, user_id)))
+    customer[5] = OrderDraft()
+    registry.refresh()
+    assert pending == []
+
+    draft = customer[5]
+    draft.order_id, draft.status = 300, 'pending'
+    registry.refresh()
+    assert pending == [(300, 5)]
+
+    draft.status = 'completed'
+    registry.refresh()
+    assert pending == [(300, 5)]
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+تست PanelClient و OrderSync در برابر پنل جایگزین (app/panel_stub.py)
+- درخواست‌های دسته‌ای و fallback به درخواست‌های تکی
+- همگام‌سازی افزایشی با updated_since
+- درخواست آزمایشی circuit breaker در حالت half_open
+- تلاش مجدد با بودجه زمانی (deadline)
+"""
+
+import asyncio
+import contextlib
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.order_sync import FULL_SCAN_STATUS, OrderSync
+from app.panel_client import NO_RETRY, CircuitBreaker, PanelClient, PanelUnavailableError
+from app.panel_stub import create_panel_stub_app
+from app.retry import RetryPolicy
+
+USERS = {
+    1: {"status": "approved", "role": "mechanic", "commission_percentage": 5},
+    2: {"status": "pending", "role": "customer"},
+    3: {"status": "rejected", "role": "mechanic"},
+}
+
+
+def make_orders():
+    return {
+        10: {"id": 10, "status": FULL_SCAN_STATUS, "telegram_id": 1},
+        11: {"id": 11, "status": "pending", "telegram_id": 2},
+        12: {"id": 12, "status": FULL_SCAN_STATUS, "telegram_id": 3},
+    }
+
+
+@contextlib.asynccontextmanager
+async def running_panel(app: web.Application = None, **stub_options):
+    """اجرای پنل جایگزین روی پورت محلی و یک PanelClient متصل به آن"""
+    app = app if app is not None else create_panel_stub_app(**stub_options)
+    server = TestServer(app)
+    await server.start_server()
+    client = PanelClient(base_url=str(server.make_url("")).rstrip("/"), timeout=5)
+    try:
+        yield app, client
+    finally:
+        await client.close()
+        await server.close()
+
+
+async def unused_url() -> str:
+    """آدرس پورتی که سروری روی آن نیست (خطای اتصال)"""
+    server = TestServer(web.Application())
+    await server.start_server()
+    url = str(server.make_url("")).rstrip("/")
+    await server.close()
+    return url
+
+
+# --- درخواست‌های دسته‌ای ---
+
+
+def test_user_statuses_batch_single_request():
+    async def scenario():
+        async with running_panel(users=USERS) as (app, client):
+            results = await client.get_user_statuses_batch([1, 2, 3, 1])
+            assert app["request_count"] == 1
+            assert client.batch_supported["user_status"] is True
+            assert results[1] == (200, {"success": True, **USERS[1]})
+            assert results[2][1]["status"] == "pending"
+            assert set(results) == {1, 2, 3}
+
+    asyncio.run(scenario())
+
+
+def test_orders_batch_chunks_by_batch_size():
+    async def scenario():
+        async with running_panel(orders=make_orders()) as (app, client):
+            client.batch_size = 2
+            results = await client.get_orders_batch([10, 11, 12, 99])
+            assert app["request_count"] == 2
+            assert results[10] == (200, {"success": True, "data": app["orders"][10]})
+            assert results[99][0] == 404
+
+    asyncio.run(scenario())
+
+
+def test_batch_falls_back_to_single_requests():
+    async def scenario():
+        async with running_panel(users=USERS, orders=make_orders(), batch=False) as (app, client):
+            results = await client.get_orders_batch([10, 11, 12])
+            assert client.batch_supported["orders"] is False
+            assert {order_id: status for order_id, (status, _) in results.items()} == {10: 200, 11: 200, 12: 200}
+            assert results[11][1]["data"]["status"] == "pending"
+            # یک درخواست دسته‌ای رد شده و سه درخواست تکی
+            assert app["request_count"] == 4
+
+            # پس از تشخیص عدم پشتیبانی، endpoint دسته‌ای دوباره امتحان نمی‌شود
+            app["request_count"] = 0
+            await client.get_orders_batch([10, 12])
+            assert app["request_count"] == 2
+
+            users = await client.get_user_statuses_batch([1, 2])
+            assert client.batch_supported["user_status"] is False
+            assert users[1][1]["status"] == "approved"
+
+    asyncio.run(scenario())
+
+
+# --- همگام‌سازی افزایشی سفارشات ---
+
+
+async def collect_pages(sync: OrderSync):
+    orders = []
+    async for page, cursor in sync.pages():
+        orders.extend(order["id"] for order in page)
+        sync.advance(cursor)
+    await sync.commit()
+    return orders
+
+
+def test_order_sync_follows_updated_since_cursor(tmp_path):
+    async def scenario():
+        async with running_panel(orders=make_orders()) as (app, client):
+            state_file = str(tmp_path / "order_sync_state.json")
+            sync = OrderSync(client, state_file=state_file, page_size=2, mode="auto")
+            assert sync.is_baseline
+
+            assert await collect_pages(sync) == [10, 11, 12]
+            assert sync.cursor_supported is True
+            assert sync.last_sync_stats == {"mode": "incremental", "pages": 2, "orders": 3}
+            assert sync.cursor == "3"
+
+            # فقط سفارش تغییر یافته در همگام‌سازی بعدی دریافت می‌شود
+            status, _ = await client.update_order_status(11, "پرداخت شده")
+            assert status == 200
+            assert await collect_pages(sync) == [11]
+            assert await collect_pages(sync) == []
+
+            # cursor ذخیره شده پس از راه‌اندازی مجدد بازیابی می‌شود
+            restored = OrderSync(client, state_file=state_file, page_size=2, mode="auto")
+            assert restored.cursor == sync.cursor
+            assert not restored.is_baseline
+
+    asyncio.run(scenario())
+
+
+def test_order_sync_full_scan_without_cursor_support(tmp_path):
+    async def scenario():
+        async with running_panel(orders=make_orders(), cursor=False) as (app, client):
+            sync = OrderSync(client, state_file=str(tmp_path / "state.json"), page_size=1, mode="auto")
+            assert await collect_pages(sync) == [10, 12]
+            assert sync.cursor_supported is False
+            assert sync.last_sync_stats["mode"] == "full"
+
+    asyncio.run(scenario())
+
+
+# --- circuit breaker ---
+
+
+def test_breaker_half_open_allows_limited_probes(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30, half_open_max_calls=1)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    now[0] += 30
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # تا نتیجه درخواست آزمایشی مشخص نشده، درخواست دیگری ارسال نمی‌شود
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    now[0] += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["transitions"] == {"open": 2, "half_open": 2, "closed": 1}
+
+
+def test_breaker_probe_against_panel():
+    async def scenario():
+        async with running_panel(users=USERS) as (app, client):
+            live_url = client.base_url
+            client.breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.2, half_open_max_calls=1)
+            client.base_url = await unused_url()
+            for _ in range(2):
+                with pytest.raises(aiohttp.ClientConnectionError):
+                    await client.get_user_status(1, retry=NO_RETRY)
+            assert client.breaker.state == CircuitBreaker.OPEN
+
+            # مدار باز: خطای سریع بدون ارسال درخواست
+            sent = client.request_count
+            with pytest.raises(PanelUnavailableError):
+                await client.get_user_status(1, retry=NO_RETRY)
+            assert client.request_count == sent
+
+            # درخواست آزمایشی ناموفق مدار را دوباره باز می‌کند
+            await asyncio.sleep(0.25)
+            with pytest.raises(aiohttp.ClientConnectionError):
+                await client.get_user_status(1, retry=NO_RETRY)
+            assert client.breaker.state == CircuitBreaker.OPEN
+
+            # درخواست آزمایشی موفق (پنل دوباره در دسترس) مدار را می‌بندد
+            client.base_url = live_url
+            await asyncio.sleep(0.25)
+            status, body = await client.get_user_status(1, retry=NO_RETRY)
+            assert (status, body["status"]) == (200, "approved")
+            assert client.breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+# --- تلاش مجدد و بودجه زمانی ---
+
+
+def flaky_panel(failures: int, delay: float = 0):
+    """پنل جایگزین با endpoint هایی که failures بار 503 برمی‌گردانند یا delay ثانیه طول می‌کشند"""
+    app = create_panel_stub_app()
+    attempts = app["attempts"] = {"count": 0}
+
+    async def flaky(request):
+        attempts["count"] += 1
+        if attempts["count"] <= failures:
+            return web.json_response({"success": False}, status=503)
+        return web.json_response({"success": True})
+
+    async def slow(request):
+        attempts["count"] += 1
+        await asyncio.sleep(delay)
+        return web.json_response({"success": True})
+
+    app.router.add_get("/flaky", flaky)
+    app.router.add_route("*", "/slow", slow)
+    return app
+
+
+def fixed_policy(**overrides) -> RetryPolicy:
+    params = {"max_attempts": 10, "base_delay": 0.05, "max_delay": 0.05, "jitter": False}
+    params.update(overrides)
+    return RetryPolicy(**params)
+
+
+def test_retry_until_success():
+    async def scenario():
+        async with running_panel(flaky_panel(failures=2)) as (app, client):
+            status, body = await client.get("/flaky", retry=fixed_policy())
+            assert (status, body) == (200, {"success": True})
+            assert app["attempts"]["count"] == 3
+            assert client.retry_count == 2
+
+    asyncio.run(scenario())
+
+
+def test_retry_stops_at_deadline():
+    async def scenario():
+        async with running_panel(flaky_panel(failures=100)) as (app, client):
+            client.breaker = CircuitBreaker(failure_threshold=100)
+            started = time.monotonic()
+            status, _ = await client.get("/flaky", retry=fixed_policy(deadline=0.3))
+            elapsed = time.monotonic() - started
+            assert status == 503
+            assert 1 < app["attempts"]["count"] < 10
+            assert elapsed < 0.5
+
+    asyncio.run(scenario())
+
+
+def test_deadline_bounds_attempt_timeout():
+    async def scenario():
+        async with running_panel(flaky_panel(failures=0, delay=2)) as (app, client):
+            started = time.monotonic()
+            with pytest.raises(asyncio.TimeoutError):
+                await client.get("/slow", retry=fixed_policy(deadline=0.3))
+            assert time.monotonic() - started < 1
+
+            # درخواست نوشتنی بدون تلاش مجدد هم به بودجه زمانی محدود است
+            started = time.monotonic()
+            with pytest.raises(asyncio.TimeoutError):
+                await client.post("/slow", retry=fixed_policy(deadline=0.3))
+            assert time.monotonic() - started < 1
+            assert app["attempts"]["count"] == 2
+
+    asyncio.run(scenario())
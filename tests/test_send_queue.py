@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+تست SendQueue: ترتیب پیام‌های هر چت، فاصله بین پیام‌های یک چت و تلاش مجدد پس از 429
+"""
+
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+
+
+class FakeBot:
+    """bot جایگزین: متدهای تلگرام را با زمان ارسال ثبت می‌کند"""
+
+    def __init__(self, delay: float = 0, retry_after: dict = None, fail_texts=()):
+        self.delay = delay
+        self.retry_after = dict(retry_after or {})  # {متن: تعداد پاسخ 429}
+        self.fail_texts = set(fail_texts)
+        self.sent = []
+
+    async def __call__(self, method):
+        await asyncio.sleep(self.delay)
+        if self.retry_after.get(method.text):
+            self.retry_after[method.text] -= 1
+            raise TelegramRetryAfter(method=method, message='Too Many Requests', retry_after=0)
+        if method.text in self.fail_texts:
+            raise RuntimeError('chat not found')
+        self.sent.append((method.chat_id, method.text, time.monotonic()))
+        return method.text
+
+
+def test_messages_of_each_chat_keep_order():
+    async def scenario():
+        from app.send_queue import SendQueue
+        queue = SendQueue(rate=1000, chat_interval=0.02, max_retries=3)
+        bot = FakeBot(delay=0.005)
+        futures = [queue.send_message(bot, chat_id, f'{chat_id}-{n}') for n in range(4) for chat_id in (1, 2, 3)]
+        assert await asyncio.gather(*futures) == [f'{chat_id}-{n}' for n in range(4) for chat_id in (1, 2, 3)]
+        for chat_id in (1, 2, 3):
+            sent = [(text, at) for chat, text, at in bot.sent if chat == chat_id]
+            assert [text for text, _ in sent] == [f'{chat_id}-{n}' for n in range(4)]
+            # فاصله حداقل بین دو پیام یک چت
+            assert all(b - a >= 0.015 for (_, a), (_, b) in zip(sent, sent[1:]))
+        assert queue.stats()['sent'] == 12
+        assert queue.depth == 0
+        await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_keeps_chat_order():
+    async def scenario():
+        from app.send_queue import SendQueue
+        queue = SendQueue(rate=1000, chat_interval=0, max_retries=3)
+        bot = FakeBot(retry_after={'first': 2})
+        futures = [queue.send_message(bot, 1, text) for text in ('first', 'second')]
+        await asyncio.gather(*futures)
+        assert [text for _, text, _ in bot.sent] == ['first', 'second']
+        assert queue.stats()['retried'] == 2
+        await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_failure_is_reported_and_queue_continues():
+    async def scenario():
+        from app.send_queue import SendQueue
+        queue = SendQueue(rate=1000, chat_interval=0, max_retries=1)
+        bot = FakeBot(retry_after={'limited': 5}, fail_texts={'broken'})
+        broken = queue.send_message(bot, 1, 'broken')
+        limited = queue.send_message(bot, 1, 'limited')
+        after = queue.send_message(bot, 1, 'after')
+        with pytest.raises(RuntimeError):
+            await broken
+        with pytest.raises(TelegramRetryAfter):
+            await limited
+        assert await after == 'after'
+        assert queue.stats()['failed'] == 2
+        await queue.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+تست StateTable: ذخیره دسته‌ای تغییرات، ایندکس وضعیت، listenerها و بازیابی lazy
+"""
+
+import asyncio
+
+from app.models import OrderDraft
+from app.state_store import MemoryStateStore, StateTable, encode_record
+
+
+class RecordingStore(MemoryStateStore):
+    """store حافظه با ثبت خواندن‌های همزمان (get_sync)"""
+
+    def __init__(self):
+        super().__init__()
+        self.sync_reads = []
+
+    def get_sync(self, kind, key):
+        self.sync_reads.append(key)
+        return super().get_sync(kind, key)
+
+    async def get(self, kind, key):
+        return MemoryStateStore.get_sync(self, kind, key)
+
+
+def stored(store: MemoryStateStore, kind: str):
+    return {key: store.get_sync(kind, key) for key in store.tables.get(kind, {})}
+
+
+def test_changes_are_flushed_in_one_batch():
+    async def scenario():
+        store = MemoryStateStore()
+        table = StateTable('drafts', store=store, flush_delay=0.01)
+        table[1] = {'status': 'pending', 'items': []}
+        table[2] = {'status': 'new'}
+        assert table.dirty
+        assert stored(store, 'drafts') == {}
+
+        await asyncio.sleep(0.05)
+        assert not table.dirty
+        assert stored(store, 'drafts') == {'1': {'status': 'pending', 'items': []}, '2': {'status': 'new'}}
+        assert store.transactions == 1
+
+        # تغییر درجای مقدار خوانده شده با [] ذخیره می‌شود
+        table[1]['items'].append('filter')
+        del table[2]
+        await asyncio.sleep(0.05)
+        assert stored(store, 'drafts') == {'1': {'status': 'pending', 'items': ['filter']}}
+        assert store.transactions == 2
+
+        # خواندن با peek و پیمایش کلید را تغییر یافته علامت نمی‌زند
+        table.peek(1)
+        list(table.items())
+        assert not table.dirty
+        await table.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_reload_restores_values_and_models():
+    store = MemoryStateStore()
+    table = StateTable('orders', store=store, model=OrderDraft)
+    draft = OrderDraft(order_id=7, status='pending')
+    table[5] = draft
+    restored = StateTable('orders', store=store, model=OrderDraft)
+    assert restored[5] == draft
+    assert restored.last_activity(5) is not None
+
+
+def test_status_index_and_listeners():
+    store = MemoryStateStore()
+    table = StateTable('users', store=store, index_field='status')
+    table[1] = {'status': 'pending'}
+    table[2] = {'status': 'approved'}
+    table[3] = {'status': 'pending'}
+    assert table.keys_by('pending') == {1, 3}
+    assert table.index_counts() == {'pending': 2, 'approved': 1}
+
+    changes = []
+    table.add_listener(lambda key, value: changes.append((key, value)))
+    table[1]['status'] = 'approved'
+    table.discard(3)
+    assert table.keys_by('pending') == set()
+    assert sorted(changes, key=lambda change: change[0]) == [(1, {'status': 'approved'}), (3, None)]
+
+
+def test_listeners_without_index_field():
+    store = MemoryStateStore()
+    table = StateTable('registrations', store=store)
+    changes = []
+    table.add_listener(lambda key, value: changes.append(key))
+    table[4] = {'step': 1}
+    table.peek(4)
+    assert changes == []
+    table.refresh_index()
+    assert changes == [4]
+    table.refresh_index()
+    assert changes == [4]
+
+
+def test_lazy_table_restores_on_access():
+    async def scenario():
+        store = RecordingStore()
+        store.apply_sync('drafts', {
+            '1': encode_record({'status': 'pending'}),
+            '2': encode_record({'step': 3}),
+            '3': encode_record({'step': 4}),
+        })
+        table = StateTable('drafts', store=store, index_field='status', lazy=True)
+        # فقط رکوردهای دارای وضعیت در شروع بارگذاری می‌شوند
+        assert table.items() == {1: {'status': 'pending'}}.items()
+        assert len(table) == 3
+        assert 2 in table and 3 in table
+        assert table.keys_by('pending') == {1}
+
+        # بازیابی همزمان با اولین دسترسی
+        assert table.get(2) == {'step': 3}
+        assert table.restored == 1
+        assert store.sync_reads == ['2']
+
+        # بازیابی غیرهمزمان پیش از دسترسی (بدون خواندن همزمان store)
+        await table.preload(3)
+        assert table.peek(3) == {'step': 4}
+        assert table.restored == 2
+        assert store.sync_reads == ['2']
+
+        # حذف کلید بارگذاری نشده بدون خواندن مقدار آن
+        store.apply_sync('drafts', {'4': encode_record({'step': 1})})
+        table.reload()
+        del table[4]
+        assert 4 not in table
+        assert store.sync_reads == ['2']
+
+    asyncio.run(scenario())
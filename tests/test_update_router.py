@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+تست UpdateRouter: انتخاب اولین مسیر منطبق به ترتیب ثبت (متن، دستور، وضعیت کاربر و پیشوند callback)
+"""
+
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+from aiogram.types import Chat, Message, User
+
+from app.update_router import UpdateRouter
+from app.user_context import UserContext
+
+
+async def on_menu(message):
+    return 'menu'
+
+
+async def on_start(message, command):
+    return f'start:{command.args}'
+
+
+async def on_registering(message, user_ctx):
+    return 'registering'
+
+
+async def on_late_text(message):
+    return 'late'
+
+
+async def on_order(callback_query):
+    return 'order'
+
+
+async def on_order_confirm(callback_query):
+    return 'order_confirm'
+
+
+def make_router(registering_users=()):
+    router = UpdateRouter()
+    router.text(on_menu, 'منو')
+    router.command(on_start, 'start')
+    router.message_when(on_registering, lambda message, ctx: ctx.user_id in registering_users)
+    router.text(on_late_text, 'راهنما', 'منو')
+    router.callback(on_order, 'order_')
+    router.callback(on_order_confirm, 'order_confirm_', 'confirm')
+    return router
+
+
+def text_message(text, user_id=1):
+    return SimpleNamespace(text=text, caption=None, from_user=SimpleNamespace(id=user_id))
+
+
+def command_message(text, user_id=1):
+    return Message(
+        message_id=1,
+        date=datetime.datetime.now(),
+        chat=Chat(id=user_id, type='private'),
+        from_user=User(id=user_id, is_bot=False, first_name='test'),
+        text=text,
+    )
+
+
+def resolve(router, message, user_id=1):
+    route, data = asyncio.run(router.resolve_message(message, None, UserContext(user_id)))
+    return route.handler if route is not None else None, data
+
+
+def test_text_routes_by_registration_order():
+    router = make_router(registering_users={1})
+    # مسیر متن ثبت شده پیش از مسیر وضعیت اولویت دارد
+    assert resolve(router, text_message('منو'))[0] is on_menu
+    # مسیر وضعیت ثبت شده پیش از متن بعدی اولویت دارد
+    assert resolve(router, text_message('راهنما'))[0] is on_registering
+    assert resolve(router, text_message('راهنما', user_id=2), user_id=2)[0] is on_late_text
+    assert resolve(router, text_message('متن آزاد', user_id=2), user_id=2) == (None, {})
+
+
+def test_command_route_passes_command_object():
+    router = make_router()
+    handler, data = resolve(router, command_message('/start ref42'))
+    assert handler is on_start
+    assert data['command'].args == 'ref42'
+    assert resolve(router, command_message('/unknown'))[0] is None
+
+
+def test_message_handler_receives_only_its_parameters():
+    async def scenario():
+        router = make_router()
+        route, data = await router.resolve_message(command_message('/start abc'), None, UserContext(1))
+        return await route.call(command_message('/start abc'), {**data, 'bot': None, 'state': None})
+
+    assert asyncio.run(scenario()) == 'start:abc'
+
+
+def test_callback_prefix_resolution():
+    router = make_router()
+
+    def resolve_callback(data):
+        return router.resolve_callback(SimpleNamespace(data=data))
+
+    # اولین پیشوند منطبق به ترتیب ثبت (نه طولانی‌ترین)
+    assert resolve_callback('order_confirm_12').handler is on_order
+    assert resolve_callback('confirm_12').handler is on_order_confirm
+    assert resolve_callback('other') is None
+    assert resolve_callback('') is None
@@ -2,107 +2,87 @@
 # -*- coding: utf-8 -*-
 """
 مدیریت وضعیت کاربران ربات
+وضعیت‌ها در جدول user_statuses در app/state_manager نگهداری می‌شوند (منبع واحد):
+- جستجو بر اساس شناسه کاربر O(1) از حافظه
+- لیست کاربران pending از ایندکس وضعیت (بدون پیمایش همه کاربران)
+- ذخیره افزایشی فقط رکوردهای تغییر یافته در store
 """
 
-import json
 import os
 import logging
 from typing import Dict, List, Tuple, Optional
 
+from app.file_cache import read_json_file
+from app.models import UserStatus
+from app.state_manager import user_statuses, set_user_status as _set_user_status, clear_user_status
+
 # تنظیم لاگر
 logger = logging.getLogger(__name__)
 
-# مسیر فایل ذخیره وضعیت کاربران
+# مسیر فایل قدیمی وضعیت کاربران (فقط برای انتقال یک باره به store)
 USER_STATUS_FILE = os.path.join(os.path.dirname(__file__), 'user_status.json')
 
-def load_user_statuses() -> Dict:
-    """بارگیری وضعیت کاربران از فایل"""
+def import_legacy_user_statuses() -> int:
+    """انتقال یک باره user_status.json قدیمی به جدول وضعیت کاربران"""
+    imported = 0
     try:
-        if os.path.exists(USER_STATUS_FILE):
-            with open(USER_STATUS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        else:
-            return {}
+        statuses = read_json_file(USER_STATUS_FILE)
+        if not statuses:
+            return 0
+        for user_id_str, user_data in statuses.items():
+            user_id = int(user_id_str)
+            if user_id in user_statuses:
+                continue
+            user_statuses[user_id] = UserStatus(user_data.get('type'), user_data.get('status'), user_data.get('updated_at'))
+            imported += 1
+        if imported:
+            logger.info(f"📋 انتقال {imported} وضعیت کاربر از {USER_STATUS_FILE}")
     except Exception as e:
-        logger.error(f"❌ خطا در بارگیری وضعیت کاربران: {e}")
-        return {}
+        logger.error(f"❌ خطا در انتقال وضعیت کاربران: {e}")
+    return imported
 
-def save_user_statuses(statuses: Dict):
-    """ذخیره وضعیت کاربران در فایل"""
-    try:
-        with open(USER_STATUS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(statuses, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        logger.error(f"❌ خطا در ذخیره وضعیت کاربران: {e}")
+import_legacy_user_statuses()
+
+def _as_legacy(user_data: UserStatus) -> Dict:
+    """رکورد با کلید type (سازگار با قالب قبلی این ماژول)"""
+    return {
+        'type': user_data.role,  # 'mechanic' or 'customer'
+        'status': user_data.status,  # 'pending', 'approved', 'rejected'
+        'updated_at': user_data.updated_at,
+    }
 
 def get_user_status(user_id: int) -> Optional[Dict]:
     """دریافت وضعیت یک کاربر"""
-    try:
-        statuses = load_user_statuses()
-        return statuses.get(str(user_id))
-    except Exception as e:
-        logger.error(f"❌ خطا در دریافت وضعیت کاربر {user_id}: {e}")
-        return None
+    user_data = user_statuses.peek(int(user_id))
+    return _as_legacy(user_data) if user_data else None
 
 def set_user_status(user_id: int, user_type: str, status: str):
     """تنظیم وضعیت یک کاربر"""
     try:
-        statuses = load_user_statuses()
-        statuses[str(user_id)] = {
-            'type': user_type,  # 'mechanic' or 'customer'
-            'status': status,   # 'pending', 'approved', 'rejected'
-            'updated_at': str(int(time.time()))
-        }
-        save_user_statuses(statuses)
+        _set_user_status(int(user_id), user_type, status)
         logger.info(f"✅ وضعیت کاربر {user_id} به {user_type}/{status} تغییر کرد")
     except Exception as e:
         logger.error(f"❌ خطا در تنظیم وضعیت کاربر {user_id}: {e}")
 
 def get_pending_users() -> List[Tuple[int, str]]:
     """دریافت لیست کاربران با وضعیت pending"""
-    try:
-        statuses = load_user_statuses()
-        pending_users = []
-        
-        for user_id_str, user_data in statuses.items():
-            if user_data.get('status') == 'pending':
-                user_id = int(user_id_str)
-                user_type = user_data.get('type')
-                pending_users.append((user_id, user_type))
-        
-        return pending_users
-    except Exception as e:
-        logger.error(f"❌ خطا در دریافت کاربران pending: {e}")
-        return []
+    return [
+        (user_id, user_statuses.peek(user_id).role)
+        for user_id in user_statuses.keys_by('pending')
+    ]
 
 def is_user_approved(user_id: int) -> bool:
     """بررسی اینکه آیا کاربر تایید شده است"""
-    try:
-        user_status = get_user_status(user_id)
-        return user_status and user_status.get('status') == 'approved'
-    except Exception as e:
-        logger.error(f"❌ خطا در بررسی تایید کاربر {user_id}: {e}")
-        return False
+    user_data = user_statuses.peek(int(user_id))
+    return user_data is not None and user_data.status == 'approved'
 
 def get_user_type(user_id: int) -> Optional[str]:
     """دریافت نوع کاربر (mechanic یا customer)"""
-    try:
-        user_status = get_user_status(user_id)
-        return user_status.get('type') if user_status else None
-    except Exception as e:
-        logger.error(f"❌ خطا در دریافت نوع کاربر {user_id}: {e}")
-        return None
+    user_data = user_statuses.peek(int(user_id))
+    return user_data.role if user_data else None
 
 def remove_user_status(user_id: int):
     """حذف وضعیت یک کاربر"""
-    try:
-        statuses = load_user_statuses()
-        if str(user_id) in statuses:
-            del statuses[str(user_id)]
-            save_user_statuses(statuses)
-            logger.info(f"✅ وضعیت کاربر {user_id} حذف شد")
-    except Exception as e:
-        logger.error(f"❌ خطا در حذف وضعیت کاربر {user_id}: {e}")
-
-# اضافه کردن import time
-import time
+    if int(user_id) in user_statuses:
+        clear_user_status(int(user_id))
+        logger.info(f"✅ وضعیت کاربر {user_id} حذف شد")